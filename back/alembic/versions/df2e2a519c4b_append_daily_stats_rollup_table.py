@@ -0,0 +1,55 @@
+"""append daily_stats rollup table
+
+Revision ID: df2e2a519c4b
+Revises: ef59aafd5cb2
+Create Date: 2026-10-18 19:05:12.418233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'df2e2a519c4b'
+down_revision: Union[str, Sequence[str], None] = 'ef59aafd5cb2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('orders_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('orders_amount', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('expenses_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('expenses_amount', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('materials_cost', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    # backfill из существующих заказов и расходов
+    op.execute(
+        """
+        INSERT INTO daily_stats (day, orders_count, orders_amount,
+                                 expenses_count, expenses_amount, materials_cost)
+        SELECT day, sum(orders_count), sum(orders_amount),
+               sum(expenses_count), sum(expenses_amount), sum(materials_cost)
+        FROM (
+            SELECT date(created_date) AS day, count(*) AS orders_count,
+                   sum(total_price) AS orders_amount, 0 AS expenses_count,
+                   0 AS expenses_amount, sum(materials_price) AS materials_cost
+            FROM orders GROUP BY date(created_date)
+            UNION ALL
+            SELECT actual_date, 0, 0, count(*), sum(amount), 0
+            FROM expenses WHERE actual_date IS NOT NULL GROUP BY actual_date
+        ) AS combined
+        GROUP BY day
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_stats')
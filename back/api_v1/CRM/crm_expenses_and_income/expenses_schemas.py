@@ -3,6 +3,14 @@ from typing import Optional
 
 from pydantic import BaseModel, Field, NonNegativeFloat, field_validator, NonNegativeInt
 
+from api_v1.utils.projection import (
+    Projection,
+    ProjectionQuerySchema,
+    Shape,
+    ShapeField,
+)
+from core.models import ExpenseModel
+
 
 class NewExpenseSchema(BaseModel):
     expense_type: str
@@ -37,8 +45,32 @@ class ExpenseSchema(BaseModel):
 
     model_config = {"from_attributes": True}
 
+    @staticmethod
+    def dump_orm(expense: ExpenseModel, projection: Projection | None = None) -> dict:
+        return EXPENSE_SHAPE.dump(expense, projection or EXPENSE_SHAPE.full)
+
+
+def _amount_to_uzs(amount: int) -> int:
+    return int(amount / 100) if amount else 0
+
+
+EXPENSE_SHAPE = Shape(
+    model=ExpenseModel,
+    fields={
+        "id": ShapeField("id"),
+        "expense_type": ShapeField("expense_type"),
+        "periodicity": ShapeField("periodicity"),
+        "description": ShapeField("description"),
+        "amount": ShapeField("amount", _amount_to_uzs),
+        "actual_date": ShapeField("actual_date"),
+        "create_at": ShapeField("create_at"),
+    },
+    # actual_date — ключ сортировки страницы
+    required=("id", "actual_date"),
+)
+
 
-class ExpensesFilterSchema(BaseModel):
+class ExpensesFilterSchema(ProjectionQuerySchema):
     skip: Optional[int] = Field(0, ge=0, description="Пропустить записей")
     limit: Optional[int] = Field(12, ge=1, le=1000, description="Лимит на страницу")
 
@@ -1,8 +1,10 @@
 from fastapi import HTTPException, status
-from sqlalchemy import select, func, Result
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
 
+from api_v1.utils.pagination import fetch_page
+from api_v1.utils.projection import ProjectionQuerySchema
+from api_v1.CRM.statistics.daily_stats_service import update_daily_stats
 from api_v1.CRM.crm_expenses_and_income.expenses_CRUD import (
     create_expense,
     get_expense_by_id,
@@ -10,6 +12,7 @@ from api_v1.CRM.crm_expenses_and_income.expenses_CRUD import (
     delete_expense,
 )
 from api_v1.CRM.crm_expenses_and_income.expenses_schemas import (
+    EXPENSE_SHAPE,
     NewExpenseSchema,
     ExpenseSchema,
     ExpensesFilterSchema,
@@ -30,14 +33,21 @@ async def create_expense_service(
         amount=new_expense.amount,
         actual_date=new_expense.actual_date,
     )
+    await update_daily_stats(
+        session,
+        new_expense.actual_date,
+        expenses_count=1,
+        expenses_amount=new_expense.amount,
+    )
     await session.commit()
     return ExpenseSchema.model_validate(new_expense)
 
 
 async def get_all_expenses_service(
         session: AsyncSession, expense_filter: ExpensesFilterSchema
-) -> tuple[list[ExpenseSchema], int, int]:
-    stmt = select(ExpenseModel)
+) -> tuple[list[dict], int, int]:
+    projection = EXPENSE_SHAPE.parse(expense_filter.fields, expense_filter.expand)
+    stmt = select(ExpenseModel).options(*EXPENSE_SHAPE.load_options(projection))
 
     if expense_filter.actual_date_from:
         stmt = stmt.where(ExpenseModel.actual_date >= expense_filter.actual_date_from)
@@ -52,42 +62,46 @@ async def get_all_expenses_service(
         stmt = stmt.where(ExpenseModel.periodicity == expense_filter.periodicity)
 
     if expense_filter.sort_order == "desc":
-        stmt = stmt.order_by(ExpenseModel.actual_date.desc())
+        stmt = stmt.order_by(ExpenseModel.actual_date.desc(), ExpenseModel.id.desc())
     else:
-        stmt = stmt.order_by(ExpenseModel.actual_date.asc())
-
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total_result = await session.execute(count_stmt)
-    total: int = total_result.scalar()
-
-    # Создаем подзапрос
-    subq = stmt.subquery()
-
-    # Создаем алиас для модели в подзапросе
-    expenseAlias = aliased(ExpenseModel, subq)
-
-    # Суммируем amount из подзапроса
-    query_summary = select(func.sum(expenseAlias.amount)).select_from(subq)
-
-    summary_result = await session.execute(query_summary)
-    total_summary_raw = summary_result.scalar() or 0
+        stmt = stmt.order_by(ExpenseModel.actual_date.asc(), ExpenseModel.id.asc())
+
+    # страница, количество и сумма amount одним запросом
+    rows, total, _, total_summary_raw = await fetch_page(
+        session,
+        stmt,
+        expense_filter.skip,
+        expense_filter.limit,
+        summary_column=ExpenseModel.amount,
+    )
     total_summary: int = int(total_summary_raw / 100)
 
-    stmt = stmt.offset(expense_filter.skip).limit(expense_filter.limit)
-
-    result: Result = await session.execute(stmt)
-    expenses = [
-        ExpenseSchema.model_validate(expense) for expense in result.scalars().all()
-    ]
+    expenses = [ExpenseSchema.dump_orm(row[0], projection) for row in rows]
 
     return expenses, total_summary, total
 
 
 async def get_expense_by_id_service(
-        session: AsyncSession, expense_id: int
-) -> ExpenseSchema:
-    expense = await get_expense_by_id(session=session, expense_id=expense_id)
-    return ExpenseSchema.model_validate(expense)
+        session: AsyncSession,
+        expense_id: int,
+        projection: ProjectionQuerySchema | None = None,
+) -> dict:
+    shape = (
+        EXPENSE_SHAPE.full
+        if projection is None
+        else EXPENSE_SHAPE.parse(projection.fields, projection.expand)
+    )
+    expense: ExpenseModel | None = await session.scalar(
+        select(ExpenseModel)
+        .options(*EXPENSE_SHAPE.load_options(shape))
+        .where(ExpenseModel.id == expense_id)
+    )
+    if expense is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"expense with id:{expense_id} not found",
+        )
+    return ExpenseSchema.dump_orm(expense, shape)
 
 
 async def update_expense_service(
@@ -105,6 +119,8 @@ async def update_expense_service(
             detail=f"expense with id:{expense_id} not found",
         )
 
+    old_date, old_amount = expense.actual_date, expense.amount
+
     updated_expense = await partial_update_expense(
         session=session,
         expense=expense,
@@ -115,6 +131,17 @@ async def update_expense_service(
         actual_date=update_data.actual_date,
     )
 
+    if (old_date, old_amount) != (updated_expense.actual_date, updated_expense.amount):
+        await update_daily_stats(
+            session, old_date, expenses_count=-1, expenses_amount=-old_amount
+        )
+        await update_daily_stats(
+            session,
+            updated_expense.actual_date,
+            expenses_count=1,
+            expenses_amount=updated_expense.amount,
+        )
+
     await session.commit()
     return ExpenseSchema.model_validate(updated_expense)
 
@@ -130,6 +157,12 @@ async def delete_expense_service(session: AsyncSession, expense_id: int):
             detail=f"expense with id:{expense_id} not found",
         )
 
+    await update_daily_stats(
+        session,
+        expense.actual_date,
+        expenses_count=-1,
+        expenses_amount=-expense.amount,
+    )
     await delete_expense(session=session, expense=expense)
     await session.commit()
     return {"Message": f"expense {expense_id} deleted!"}
@@ -1,6 +1,7 @@
 from typing import Annotated
 
 from fastapi import APIRouter, status, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import Field
 
 from api_v1.CRM.crm_expenses_and_income.expenses_schemas import (
@@ -16,8 +17,9 @@ from api_v1.CRM.crm_expenses_and_income.expenses_service import (
     update_expense_service,
     delete_expense_service,
 )
-from core.ResponseModel.response_model import PaginatedResponse
-from core.postgres_db import SessionDepPG
+from api_v1.utils.projection import ProjectionQuerySchema
+from core.ResponseModel.response_model import PaginatedResponse, paginated_json
+from core.postgres_db import SessionDepPG, SessionDepRead
 
 router = APIRouter(prefix="/expenses")
 
@@ -35,15 +37,15 @@ async def create_expense_crm(
 
 @router.get("/", response_model=PaginatedResponse[ExpenseSchema])
 async def get_all_expenses_crm(
-        session: SessionDepPG,
+        session: SessionDepRead,
         expense_filters: ExpensesFilterSchema = Depends(),
-):
-    expenses: tuple[list[ExpenseSchema], int, int] = await get_all_expenses_service(
+) -> ORJSONResponse:
+    expenses: tuple[list[dict], int, int] = await get_all_expenses_service(
         session=session,
         expense_filter=expense_filters,
     )
 
-    return PaginatedResponse(
+    return paginated_json(
         items=expenses[0],
         total_summary=expenses[-2],
         total=expenses[-1],
@@ -54,11 +56,15 @@ async def get_all_expenses_crm(
 
 
 @router.get("/{expense_id}", response_model=ExpenseSchema)
-async def get_by_id_expense_crm(session: SessionDepPG, expense_id: ExpenseID):
-    expense: ExpenseSchema = await get_expense_by_id_service(
-        session=session, expense_id=expense_id
+async def get_by_id_expense_crm(
+        session: SessionDepRead,
+        expense_id: ExpenseID,
+        projection: ProjectionQuerySchema = Depends(),
+) -> ORJSONResponse:
+    expense: dict = await get_expense_by_id_service(
+        session=session, expense_id=expense_id, projection=projection
     )
-    return expense
+    return ORJSONResponse(expense)
 
 
 @router.patch("/{expense_id}", response_model=ExpenseSchema)
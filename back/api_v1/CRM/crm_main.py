@@ -17,6 +17,7 @@ from api_v1.CRM.crm_expenses_and_income.expenses_view import (
     router as crm_expense_router,
 )
 from api_v1.CRM.statistics.statistics_view import router as crm_statistics_router
+from api_v1.CRM.crm_search.search_view import router as crm_search_router
 
 router = APIRouter(
     tags=["CRM"],
@@ -31,4 +32,5 @@ router.include_router(order_product_router)
 router.include_router(order_product_material_router)
 router.include_router(order_cost_router)
 router.include_router(crm_expense_router)
-router.include_router(crm_statistics_router)
\ No newline at end of file
+router.include_router(crm_statistics_router)
+router.include_router(crm_search_router)
\ No newline at end of file
@@ -1,21 +1,34 @@
 from fastapi import HTTPException, status
-from sqlalchemy import select, Result, func, delete, or_
+from sqlalchemy import select, Result, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from api_v1.utils.pagination import fetch_page
+from api_v1.CRM.crm_search.search_index import search_index
+from api_v1.CRM.crm_materials.material_forecast_service import invalidate_forecast
+from api_v1.CRM.crm_materials.material_stock_service import (
+    lock_materials_stock,
+    movement,
+    record_movements,
+)
+from api_v1.utils.concurrency import check_version, retry_on_conflict
+from api_v1.utils.projection import ProjectionQuerySchema
+from api_v1.utils.search import normalize_search, search_clause
 from api_v1.CRM.crm_materials.material_CRUD import (
     create_material,
     get_material_by_details,
     get_material_by_id,
+    stock_levels,
 )
 from api_v1.CRM.crm_materials.materials_schemas import (
+    MATERIAL_SHAPE,
     MaterialCreateSchema,
     MaterialSchema,
     MaterialAppendSchema,
     MaterialFilterSchema,
     MaterialPartialUpdateSchema,
 )
-from core.models import Material
+from core.models import Material, MovementKind
 
 
 async def create_material_service(
@@ -37,14 +50,28 @@ async def create_material_service(
     new_material: Material = await create_material(
         session=session, **create_material_schema.model_dump()
     )
+    await session.flush()
+    await record_movements(
+        session,
+        [
+            movement(
+                new_material.id,
+                MovementKind.RECEIPT,
+                new_material.count_left,
+                description="начальный остаток",
+            )
+        ],
+    )
     await session.commit()
+    search_index.add_material(new_material)
+    invalidate_forecast()
     await session.refresh(new_material)
     return MaterialSchema.model_validate(new_material)
 
 
 async def get_materials_service(
         session: AsyncSession, filters: MaterialFilterSchema
-) -> tuple[list[MaterialSchema], int]:
+) -> tuple[list[dict], int]:
     sort_fields = {
         "name": Material.name,
         "material_type": Material.material_type,
@@ -52,60 +79,68 @@ async def get_materials_service(
         "price": Material.pack_price,
     }
 
-    stmt = select(Material)
+    projection = MATERIAL_SHAPE.parse(filters.fields, filters.expand)
+    stmt = select(Material).options(*MATERIAL_SHAPE.load_options(projection))
 
     if filters.material_type:
         stmt = stmt.where(Material.material_type == filters.material_type)
 
-    if filters.search:
-        stmt = stmt.where(
-            or_(
-                Material.name.ilike(f"%{filters.search}%"),
-                Material.name.ilike(f"%{filters.search.replace('е', 'ё')}%"),
-                Material.name.ilike(f"%{filters.search.replace('ё', 'е')}%"),
-                Material.detail.ilike(f"%{filters.search}%"),
-                Material.detail.ilike(f"%{filters.search.replace('е', 'ё')}%"),
-                Material.detail.ilike(f"%{filters.search.replace('ё', 'е')}%"),
-            )
-        )
+    # Поиск по нормализованной search_text, при поиске сначала по релевантности
+    if normalize_search(filters.search):
+        predicate, rank = search_clause(session, Material, filters.search)
+        stmt = stmt.where(predicate)
+        if rank is not None:
+            stmt = stmt.order_by(rank.desc())
 
     sort_field = sort_fields.get(filters.sort_by, Material.id)
 
     if filters.sort_order == "desc":
-        stmt = stmt.order_by(sort_field.desc())
+        stmt = stmt.order_by(sort_field.desc(), Material.id)
     else:
-        stmt = stmt.order_by(sort_field.asc())
-
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total_result = await session.execute(count_stmt)
-    total = total_result.scalar()
-
-    stmt = stmt.offset(filters.skip).limit(filters.limit)
-
-    result: Result = await session.execute(stmt)
-    materials = [
-        MaterialSchema.model_validate(material) for material in result.scalars().all()
-    ]
+        stmt = stmt.order_by(sort_field.asc(), Material.id)
+
+    unfiltered = not (filters.material_type or filters.search)
+    rows, total, _, _ = await fetch_page(
+        session,
+        stmt,
+        filters.skip,
+        filters.limit,
+        estimate_model=Material if unfiltered else None,
+    )
+    materials = [MaterialSchema.dump_orm(row[0], projection) for row in rows]
 
     return materials, total
 
 
 async def get_material_by_id_service(
-        session: AsyncSession, material_id: str
-) -> MaterialSchema:
-    material: Material = await get_material_by_id(
-        session=session, material_id=material_id
+        session: AsyncSession,
+        material_id: str,
+        projection: ProjectionQuerySchema | None = None,
+) -> tuple[dict, int]:
+    shape = (
+        MATERIAL_SHAPE.full
+        if projection is None
+        else MATERIAL_SHAPE.parse(projection.fields, projection.expand)
+    )
+    material: Material | None = await session.scalar(
+        select(Material)
+        .options(*MATERIAL_SHAPE.load_options(shape))
+        .where(Material.id == material_id)
     )
     if material is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Material with id:'{material_id}' not found!",
         )
-    return MaterialSchema.model_validate(material)
+    return MaterialSchema.dump_orm(material, shape), material.version
 
 
+@retry_on_conflict
 async def append_material_service(
-        session: AsyncSession, material_id: str, update_data: MaterialAppendSchema
+        session: AsyncSession,
+        material_id: str,
+        update_data: MaterialAppendSchema,
+        expected_version: int | None = None,
 ) -> MaterialSchema:
     material: Material = await get_material_by_id(
         session=session, material_id=material_id
@@ -114,20 +149,40 @@ async def append_material_service(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Material not found!"
         )
-    if material.count_left + update_data.delta < 0:
+    check_version(material.version, expected_version)
+    # Остаток — по журналу; count_left обновит fold_material_balances
+    if update_data.delta < 0:
+        await lock_materials_stock(session, [material.id])
+    levels = await stock_levels(session, [material.id])
+    on_hand, _ = levels.get(material.id, (0, 0))
+    if on_hand + update_data.delta < 0:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
             detail="cringe",
         )
 
-    material.count_left += update_data.delta
+    await record_movements(
+        session,
+        [
+            movement(
+                material.id,
+                MovementKind.RECEIPT if update_data.delta > 0 else MovementKind.ADJUSTMENT,
+                update_data.delta,
+            )
+        ],
+    )
     await session.commit()
-    await session.refresh(material)
-    return MaterialSchema.model_validate(material)
+    return MaterialSchema.model_validate(material).model_copy(
+        update={"count_left": on_hand + update_data.delta}
+    )
 
 
+@retry_on_conflict
 async def partial_update_service(
-        session: AsyncSession, material_id: str, update_data: MaterialPartialUpdateSchema
+        session: AsyncSession,
+        material_id: str,
+        update_data: MaterialPartialUpdateSchema,
+        expected_version: int | None = None,
 ) -> MaterialSchema:
     material: Material = await get_material_by_id(
         session=session, material_id=material_id
@@ -137,6 +192,7 @@ async def partial_update_service(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Material with id:'{material_id}' not found!",
         )
+    check_version(material.version, expected_version)
 
     to_update: dict = update_data.model_dump(exclude_unset=True)
     # Добавить проверку на пустое обновление
@@ -155,6 +211,8 @@ async def partial_update_service(
         )
 
     await session.commit()
+    search_index.add_material(material)
+    invalidate_forecast()
     await session.refresh(material)
     return MaterialSchema.model_validate(material)
 
@@ -179,3 +237,5 @@ async def delete_material_service(session: AsyncSession, material_id: str):
     stmt = delete(Material).where(Material.id == material_id)
     await session.execute(stmt)
     await session.commit()
+    search_index.remove("material", material_id)
+    invalidate_forecast()
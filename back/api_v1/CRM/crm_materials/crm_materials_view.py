@@ -1,4 +1,8 @@
-from fastapi import APIRouter, status, Depends
+from datetime import datetime
+from typing import Annotated
+
+from fastapi import APIRouter, BackgroundTasks, status, Depends, Header, Response
+from fastapi.responses import ORJSONResponse
 
 from api_v1.CRM.crm_materials.materials_schemas import (
     MaterialCreateSchema,
@@ -6,7 +10,17 @@ from api_v1.CRM.crm_materials.materials_schemas import (
     MaterialAppendSchema,
     MaterialFilterSchema,
     MaterialPartialUpdateSchema,
+    MaterialStockSchema,
+    MaterialForecastFilterSchema,
+    MaterialForecastSchema,
+)
+from api_v1.CRM.crm_materials.material_forecast_service import (
+    get_materials_forecast_service,
 )
+from api_v1.CRM.crm_materials.material_price_service import (
+    propagate_material_price_task,
+)
+from api_v1.CRM.crm_materials.material_stock_service import get_material_stock_service
 from api_v1.CRM.crm_materials.crm_materials_services import (
     create_material_service,
     get_materials_service,
@@ -15,8 +29,10 @@ from api_v1.CRM.crm_materials.crm_materials_services import (
     partial_update_service,
     delete_material_service,
 )
-from core.ResponseModel.response_model import PaginatedResponse
-from core.postgres_db import SessionDepPG
+from api_v1.utils.concurrency import parse_if_match, set_etag
+from api_v1.utils.projection import ProjectionQuerySchema
+from core.ResponseModel.response_model import PaginatedResponse, paginated_json
+from core.postgres_db import SessionDepPG, SessionDepRead, pg_session_factory
 
 router = APIRouter(prefix="/materials")
 
@@ -37,13 +53,13 @@ async def crm_create_material(
 
 @router.get("/", response_model=PaginatedResponse[MaterialSchema])
 async def crm_get_materials(
-    session: SessionDepPG, filters: MaterialFilterSchema = Depends()
-):
-    materials: tuple[list[MaterialSchema], int] = await get_materials_service(
+    session: SessionDepRead, filters: MaterialFilterSchema = Depends()
+) -> ORJSONResponse:
+    materials: tuple[list[dict], int] = await get_materials_service(
         session=session, filters=filters
     )
 
-    return PaginatedResponse(
+    return paginated_json(
         items=materials[0],
         total=materials[-1],
         skip=filters.skip,
@@ -52,14 +68,38 @@ async def crm_get_materials(
     )
 
 
+@router.get("/forecast", response_model=list[MaterialForecastSchema])
+async def crm_get_materials_forecast(
+    session: SessionDepRead, filters: MaterialForecastFilterSchema = Depends()
+) -> list[MaterialForecastSchema]:
+    forecast: list[MaterialForecastSchema] = await get_materials_forecast_service(
+        session=session, filters=filters
+    )
+    return forecast
+
+
 @router.get("/{material_id}", response_model=MaterialSchema)
 async def crm_get_material_by_id(
-    session: SessionDepPG, material_id: str
-) -> MaterialSchema:
-    material: MaterialSchema = await get_material_by_id_service(
-        session=session, material_id=material_id
+    session: SessionDepRead,
+    material_id: str,
+    projection: ProjectionQuerySchema = Depends(),
+) -> ORJSONResponse:
+    material, version = await get_material_by_id_service(
+        session=session, material_id=material_id, projection=projection
     )
-    return material
+    response = ORJSONResponse(material)
+    set_etag(response, version)
+    return response
+
+
+@router.get("/{material_id}/stock", response_model=MaterialStockSchema)
+async def crm_get_material_stock(
+    session: SessionDepRead, material_id: str, at: datetime | None = None
+) -> MaterialStockSchema:
+    stock: MaterialStockSchema = await get_material_stock_service(
+        session=session, material_id=material_id, at=at
+    )
+    return stock
 
 
 @router.patch("/{material_id}/change_count", response_model=MaterialSchema)
@@ -67,10 +107,16 @@ async def crm_material_cnt_change(
     session: SessionDepPG,
     update_data: MaterialAppendSchema,
     material_id: str,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
 ) -> MaterialSchema:
     material: MaterialSchema = await append_material_service(
-        session=session, material_id=material_id, update_data=update_data
+        session=session,
+        material_id=material_id,
+        update_data=update_data,
+        expected_version=parse_if_match(if_match),
     )
+    set_etag(response, material.version)
     return material
 
 
@@ -79,11 +125,23 @@ async def crm_partial_update(
     session: SessionDepPG,
     material_id: str,
     update_data: MaterialPartialUpdateSchema,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    if_match: Annotated[str | None, Header()] = None,
+    propagate_price: bool = False,
 ) -> MaterialSchema:
     material: MaterialSchema = await partial_update_service(
-        session=session, material_id=material_id, update_data=update_data
+        session=session,
+        material_id=material_id,
+        update_data=update_data,
+        expected_version=parse_if_match(if_match),
     )
-
+    # По запросу новая цена единицы уходит в строки открытых заказов после ответа
+    if propagate_price:
+        background_tasks.add_task(
+            propagate_material_price_task, pg_session_factory, material_id
+        )
+    set_etag(response, material.version)
     return material
 
 
@@ -1,7 +1,9 @@
-from sqlalchemy import select, Result
+from collections.abc import Iterable
+
+from sqlalchemy import func, select, union_all, Result
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.models import Material
+from core.models import Material, MaterialBalanceDeltaModel, MaterialBalanceModel
 
 
 async def create_material(
@@ -56,3 +58,36 @@ async def get_material_by_id(session: AsyncSession, material_id) -> Material | N
     result: Result = await session.execute(stmt)
     material: Material = result.scalars().one_or_none()
     return material
+
+
+async def stock_levels(
+    session: AsyncSession, material_ids: Iterable[str] | None = None
+) -> dict[str, tuple[int, int]]:
+    """
+    Текущие (on_hand, reserved) одним запросом: снимок material_balances плюс
+    еще не свернутые дельты. Без material_ids — по всем материалам.
+    """
+    snapshot = select(
+        MaterialBalanceModel.material_id.label("material_id"),
+        MaterialBalanceModel.on_hand.label("on_hand"),
+        MaterialBalanceModel.reserved.label("reserved"),
+    )
+    pending = select(
+        MaterialBalanceDeltaModel.material_id,
+        MaterialBalanceDeltaModel.on_hand_delta,
+        MaterialBalanceDeltaModel.reserved_delta,
+    )
+    if material_ids is not None:
+        material_ids = list(material_ids)
+        if not material_ids:
+            return {}
+        snapshot = snapshot.where(MaterialBalanceModel.material_id.in_(material_ids))
+        pending = pending.where(MaterialBalanceDeltaModel.material_id.in_(material_ids))
+
+    parts = union_all(snapshot, pending).subquery()
+    result = await session.execute(
+        select(
+            parts.c.material_id, func.sum(parts.c.on_hand), func.sum(parts.c.reserved)
+        ).group_by(parts.c.material_id)
+    )
+    return {material_id: (on_hand, reserved) for material_id, on_hand, reserved in result}
@@ -0,0 +1,176 @@
+import time
+from datetime import datetime, timedelta, UTC
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.CRM.crm_materials.material_CRUD import stock_levels
+from api_v1.CRM.crm_materials.materials_schemas import (
+    MaterialForecastFilterSchema,
+    MaterialForecastSchema,
+)
+from core.models import (
+    Material,
+    Order,
+    OrderProductMaterial,
+    OrderProductModel,
+    OrderStatus,
+)
+from core.models.model_materials import MaterialStatus
+
+FORECAST_TTL = 300
+# Дальше этого срока дату окончания не считаем (timedelta переполняет datetime)
+RUN_OUT_HORIZON_DAYS = 36_500
+
+# (window_days, horizon_days) -> (срок годности, результат)
+_forecast_cache: dict[tuple[int, int], tuple[float, list]] = {}
+
+
+def invalidate_forecast():
+    """Сбрасывает прогноз: вызывается при любом движении склада или правке материала."""
+    _forecast_cache.clear()
+
+
+async def _load_forecast_data(session: AsyncSession, since: datetime):
+    materials = (
+        await session.execute(
+            select(
+                Material.id,
+                Material.name,
+                Material.detail,
+                Material.count_in_one_pack,
+                Material.pack_price,
+                Material.one_item_price,
+            )
+            .where(Material.status == MaterialStatus.ACTIVE.value)
+            .order_by(Material.id)
+        )
+    ).all()
+
+    # Остаток и резерв — по журналу (снимок плюс несвернутые дельты), а не
+    # по count_left, который fold_material_balances обновляет с задержкой
+    stock = await stock_levels(session)
+    reserved = {material_id: levels[1] for material_id, levels in stock.items()}
+    materials = [
+        (
+            material_id,
+            name,
+            detail,
+            stock.get(material_id, (0, 0))[0],
+            *prices,
+        )
+        for material_id, name, detail, *prices in materials
+    ]
+
+    consumed = dict(
+        (
+            await session.execute(
+                select(
+                    OrderProductMaterial.material_id,
+                    func.sum(OrderProductMaterial.actual_usage),
+                )
+                .join(
+                    OrderProductModel,
+                    OrderProductModel.id == OrderProductMaterial.order_product_id,
+                )
+                .join(Order, Order.id == OrderProductModel.order_id)
+                .where(
+                    Order.status == OrderStatus.COMPLETED.value,
+                    Order.completed_date >= since,
+                    OrderProductMaterial.material_id.is_not(None),
+                )
+                .group_by(OrderProductMaterial.material_id)
+            )
+        ).all()
+    )
+    return materials, reserved, consumed
+
+
+def _project(
+    materials,
+    reserved: dict,
+    consumed: dict,
+    window_days: int,
+    horizon_days: int,
+    now: datetime,
+) -> list[MaterialForecastSchema]:
+    """Прогноз сразу по всем материалам на массивах NumPy."""
+    if not materials:
+        return []
+
+    ids, names, details, *numbers = zip(*materials)
+    count_left, in_pack, pack_price, item_price = (
+        np.array(column, dtype=np.float64) for column in numbers
+    )
+    reserved_arr = np.array([reserved.get(i) or 0 for i in ids], dtype=np.float64)
+    consumed_arr = np.array([consumed.get(i) or 0 for i in ids], dtype=np.float64)
+
+    available = count_left - reserved_arr
+    daily_usage = consumed_arr / window_days
+
+    # Без истории расхода материал заканчивается, только если не хватает на резерв
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_left = np.where(daily_usage > 0, available / daily_usage, np.inf)
+    days_left = np.where(available <= 0, 0.0, days_left)
+
+    # Нужно на горизонт: резерв + ожидаемый расход минус текущий остаток
+    need = np.maximum(reserved_arr + daily_usage * horizon_days - count_left, 0)
+    has_pack = in_pack > 0
+    packs = np.ceil(need / np.where(has_pack, in_pack, 1))
+    cost = np.where(has_pack, packs * pack_price, packs * item_price)
+
+    # Строки собираем из питоновских списков: индексация numpy-скаляров медленная
+    order = np.argsort(days_left, kind="stable").tolist()
+    finite = np.isfinite(days_left).tolist()
+    days_left, daily_usage = days_left.tolist(), daily_usage.tolist()
+    count_left, reserved_arr = count_left.tolist(), reserved_arr.tolist()
+    available, packs, cost = available.tolist(), packs.tolist(), cost.tolist()
+
+    result = []
+    for index in order:
+        days = days_left[index] if finite[index] else None
+        run_out = days is not None and days <= RUN_OUT_HORIZON_DAYS
+        result.append(
+            MaterialForecastSchema(
+                material_id=ids[index],
+                name=names[index],
+                detail=details[index],
+                count_left=int(count_left[index]),
+                reserved=int(reserved_arr[index]),
+                available=int(available[index]),
+                daily_usage=round(daily_usage[index], 3),
+                days_left=round(days, 1) if days is not None else None,
+                run_out_date=now + timedelta(days=days) if run_out else None,
+                reorder_packs=int(packs[index]),
+                reorder_cost=int(cost[index]),
+            )
+        )
+    return result
+
+
+async def get_materials_forecast_service(
+    session: AsyncSession, filters: MaterialForecastFilterSchema
+) -> list[MaterialForecastSchema]:
+    key = (filters.window_days, filters.horizon_days)
+    cached = _forecast_cache.get(key)
+    if cached is None or cached[0] <= time.monotonic():
+        now = datetime.now(UTC).replace(tzinfo=None)
+        materials, reserved, consumed = await _load_forecast_data(
+            session, since=now - timedelta(days=filters.window_days)
+        )
+        forecast = _project(
+            materials,
+            reserved,
+            consumed,
+            window_days=filters.window_days,
+            horizon_days=filters.horizon_days,
+            now=now,
+        )
+        cached = (time.monotonic() + FORECAST_TTL, forecast)
+        _forecast_cache[key] = cached
+
+    forecast = cached[1]
+    if filters.only_reorder:
+        forecast = [item for item in forecast if item.reorder_packs > 0]
+    return forecast
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import logging
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api_v1.CRM.crm_materials.materials_schemas import MaterialPricePropagationSchema
+from api_v1.CRM.crm_orders.order_CRUD import CLOSED_STATUSES
+from core.models import Material, Order, OrderProductMaterial, OrderProductModel
+
+logger = logging.getLogger(__name__)
+
+# Строк материалов на одну транзакцию: UPDATE не держит таблицу долго
+PROPAGATION_BATCH_SIZE = 1000
+
+
+def _ids(name: str, values: list):
+    # Список id — в тексте запроса, см. комментарий в order_reprice_service
+    return bindparam(name, values, expanding=True, literal_execute=True)
+
+
+async def _propagate_batch(
+    session: AsyncSession, material_id: str, price: int, batch_size: int
+) -> tuple[int, set[str]] | None:
+    """
+    Одна пачка: выбирает строки материала в открытых заказах со старой ценой,
+    блокирует их заказы (как сервисы строк заказа) и обновляет цену одним
+    UPDATE. Возвращает (строк обновлено, id заказов) или None, если строк
+    со старой ценой не осталось.
+    """
+    rows = (
+        await session.execute(
+            select(OrderProductMaterial.id, OrderProductModel.order_id)
+            .join(
+                OrderProductModel,
+                OrderProductModel.id == OrderProductMaterial.order_product_id,
+            )
+            .join(Order, Order.id == OrderProductModel.order_id)
+            .where(
+                OrderProductMaterial.material_id == material_id,
+                OrderProductMaterial.material_price != price,
+                Order.status.not_in(CLOSED_STATUSES),
+            )
+            .order_by(OrderProductMaterial.id)
+            .limit(batch_size)
+        )
+    ).all()
+    if not rows:
+        return None
+
+    locked = set(
+        (
+            await session.scalars(
+                select(Order.id)
+                .where(
+                    Order.id.in_(
+                        _ids("order_ids", sorted({order_id for _, order_id in rows}))
+                    ),
+                    Order.status.not_in(CLOSED_STATUSES),
+                )
+                # Тот же порядок блокировок, что у пересчета заказов
+                .order_by(Order.id)
+                .with_for_update()
+            )
+        ).all()
+    )
+    # Заказ мог закрыться между выборкой и блокировкой: его строки не трогаем
+    row_ids = [row_id for row_id, order_id in rows if order_id in locked]
+    if row_ids:
+        await session.execute(
+            update(OrderProductMaterial)
+            .where(OrderProductMaterial.id.in_(_ids("row_ids", row_ids)))
+            .values(material_price=price)
+            .execution_options(synchronize_session=False)
+        )
+        # Строки заказа изменились: новая версия, старые ETag получат 412
+        await session.execute(
+            update(Order)
+            .where(Order.id.in_(_ids("locked_ids", sorted(locked))))
+            .values(version=Order.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    return len(row_ids), locked
+
+
+async def propagate_material_price_service(
+    session: AsyncSession,
+    material_id: str,
+    batch_size: int = PROPAGATION_BATCH_SIZE,
+) -> MaterialPricePropagationSchema:
+    """
+    Переносит текущую one_item_price материала в material_price строк всех
+    открытых заказов. Пачками по batch_size строк, каждая пачка — своя
+    транзакция. materials_price заказа считается при завершении из этих строк,
+    у открытых заказов он нулевой, поэтому пересчитывать его не нужно.
+    """
+    price = await session.scalar(
+        select(Material.one_item_price).where(Material.id == material_id)
+    )
+    if price is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Material with id:'{material_id}' not found!",
+        )
+
+    rows_updated = batches = 0
+    orders: set[str] = set()
+    while batch := await _propagate_batch(session, material_id, price, batch_size):
+        await session.commit()
+        updated, locked = batch
+        rows_updated += updated
+        orders |= locked
+        batches += 1
+
+    return MaterialPricePropagationSchema(
+        material_id=material_id,
+        material_price=price,
+        rows_updated=rows_updated,
+        orders_affected=len(orders),
+        batches=batches,
+    )
+
+
+async def propagate_material_price_task(
+    session_factory: async_sessionmaker, material_id: str
+):
+    """Фоновая задача после ответа на PATCH материала: своя сессия и лог."""
+    async with session_factory() as session:
+        try:
+            report = await propagate_material_price_service(
+                session=session, material_id=material_id
+            )
+        except Exception:
+            logger.exception("material %s: price propagation failed", material_id)
+            return
+    logger.info(
+        "material %s: price %s propagated to %d rows in %d orders",
+        material_id,
+        report.material_price,
+        report.rows_updated,
+        report.orders_affected,
+    )
+
+
+async def main():
+    from core.postgres_db import pg_session_factory
+
+    parser = argparse.ArgumentParser(
+        description="Перенос цены материала в строки открытых заказов"
+    )
+    parser.add_argument("material_id")
+    parser.add_argument("--batch", type=int, default=PROPAGATION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    async with pg_session_factory() as session:
+        report = await propagate_material_price_service(
+            session=session, material_id=args.material_id, batch_size=args.batch
+        )
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
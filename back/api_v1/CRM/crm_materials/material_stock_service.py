@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime, UTC
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.CRM.crm_materials.material_CRUD import stock_levels
+from api_v1.CRM.crm_materials.material_forecast_service import invalidate_forecast
+from api_v1.CRM.crm_materials.materials_schemas import MaterialStockSchema
+from api_v1.utils.dialect import upsert_insert
+from core.models import (
+    Material,
+    MaterialBalanceDeltaModel,
+    MaterialBalanceModel,
+    MaterialMovementModel,
+    MovementKind,
+    OrderProductMaterial,
+    OrderProductModel,
+)
+from core.models.model_material_movements import MOVEMENT_EFFECT
+
+logger = logging.getLogger(__name__)
+
+# Как часто дельты остатков сворачиваются в material_balances и count_left, с
+BALANCE_FOLD_INTERVAL = float(os.getenv("STOCK_FOLD_INTERVAL", "5"))
+
+
+def movement(
+    material_id: str,
+    kind: MovementKind,
+    quantity: int,
+    order_id: str | None = None,
+    description: str | None = None,
+) -> dict:
+    return {
+        "material_id": material_id,
+        "kind": kind,
+        "quantity": quantity,
+        "order_id": order_id,
+        "description": description,
+    }
+
+
+async def record_movements(session: AsyncSession, movements: list[dict]):
+    """
+    Добавляет движения в журнал и их дельты в material_balance_deltas:
+    два executemany insert, без upsert. Горячую строку material_balances
+    и Material.count_left запись не трогает — их обновляет
+    fold_material_balances, а текущий остаток читается через stock_levels.
+    """
+    now = datetime.now(UTC).replace(tzinfo=None)
+    rows = []
+    balances: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+    for item in movements:
+        if not item["quantity"] or item["material_id"] is None:
+            continue
+        on_hand_sign, reserved_sign = MOVEMENT_EFFECT[item["kind"]]
+        row = {
+            **item,
+            "kind": int(item["kind"]),
+            "on_hand_delta": on_hand_sign * item["quantity"],
+            "reserved_delta": reserved_sign * item["quantity"],
+            "created_date": now,
+        }
+        rows.append(row)
+        balances[row["material_id"]][0] += row["on_hand_delta"]
+        balances[row["material_id"]][1] += row["reserved_delta"]
+
+    if not rows:
+        return
+
+    invalidate_forecast()
+    await session.execute(insert(MaterialMovementModel), rows)
+    await session.execute(
+        insert(MaterialBalanceDeltaModel),
+        [
+            {
+                "material_id": material_id,
+                "on_hand_delta": on_hand,
+                "reserved_delta": reserved,
+            }
+            for material_id, (on_hand, reserved) in balances.items()
+        ],
+    )
+
+
+async def lock_materials_stock(session: AsyncSession, material_ids: Iterable[str]):
+    """
+    Сериализует списания одних и тех же материалов: проверка остатка и запись
+    расхода должны идти по очереди, иначе два заказа уведут склад в минус.
+    На PostgreSQL это advisory-блокировки до конца транзакции (в порядке id,
+    без взаимных блокировок): строки не блокируются, и резервы идут без
+    очереди. В SQLite один писатель, блокировку записи берет пустой UPDATE.
+    """
+    material_ids = sorted(set(material_ids))
+    if not material_ids:
+        return
+    if session.get_bind().dialect.name == "sqlite":
+        await session.execute(
+            update(Material)
+            .where(Material.id.in_(material_ids))
+            .values(version=Material.version)
+            .execution_options(synchronize_session=False)
+        )
+        return
+    await session.execute(
+        text(
+            "SELECT count(pg_advisory_xact_lock(hashtextextended(id, 0))) "
+            "FROM (SELECT unnest(CAST(:ids AS varchar[])) AS id ORDER BY 1) AS ids"
+        ),
+        {"ids": material_ids},
+    )
+
+
+async def fold_material_balances(session: AsyncSession) -> int:
+    """
+    Сворачивает накопленные дельты в material_balances и переносит on_hand
+    в Material.count_left. DELETE ... RETURNING забирает только
+    закоммиченные дельты, поэтому водяной знак не нужен, а параллельный
+    fold просто не найдет уже забранных строк. Коммит — на вызывающем.
+    """
+    deltas = (
+        await session.execute(
+            delete(MaterialBalanceDeltaModel)
+            .returning(
+                MaterialBalanceDeltaModel.material_id,
+                MaterialBalanceDeltaModel.on_hand_delta,
+                MaterialBalanceDeltaModel.reserved_delta,
+            )
+            .execution_options(synchronize_session=False)
+        )
+    ).all()
+    if not deltas:
+        return 0
+
+    balances: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+    for material_id, on_hand, reserved in deltas:
+        balances[material_id][0] += on_hand
+        balances[material_id][1] += reserved
+
+    now = datetime.now(UTC).replace(tzinfo=None)
+    stmt = upsert_insert(session)(MaterialBalanceModel)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MaterialBalanceModel.material_id],
+        set_={
+            "on_hand": MaterialBalanceModel.on_hand + stmt.excluded.on_hand,
+            "reserved": MaterialBalanceModel.reserved + stmt.excluded.reserved,
+            "updated_date": stmt.excluded.updated_date,
+        },
+    )
+    await session.execute(
+        stmt,
+        [
+            {
+                "material_id": material_id,
+                "on_hand": on_hand,
+                "reserved": reserved,
+                "updated_date": now,
+            }
+            for material_id, (on_hand, reserved) in balances.items()
+        ],
+    )
+
+    # count_left — производное от журнала; версию поднимаем вручную, Core
+    # UPDATE идет мимо version_id_col
+    await session.execute(
+        update(Material)
+        .where(
+            Material.id == MaterialBalanceModel.material_id,
+            Material.id.in_(list(balances)),
+            Material.count_left != MaterialBalanceModel.on_hand,
+        )
+        .values(count_left=MaterialBalanceModel.on_hand, version=Material.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return len(balances)
+
+
+async def fold_balances_forever(session_factory, interval: float = BALANCE_FOLD_INTERVAL):
+    """Фоновая задача приложения: fold_material_balances раз в interval секунд."""
+    while True:
+        try:
+            async with session_factory() as session:
+                await fold_material_balances(session)
+                await session.commit()
+        except Exception:
+            logger.exception("material balances fold failed")
+        await asyncio.sleep(interval)
+
+
+def _order_lines_usage(order_id: str, column):
+    return (
+        select(OrderProductMaterial.material_id, func.sum(column))
+        .join(
+            OrderProductModel,
+            OrderProductModel.id == OrderProductMaterial.order_product_id,
+        )
+        .where(
+            OrderProductModel.order_id == order_id,
+            OrderProductMaterial.material_id.is_not(None),
+        )
+        .group_by(OrderProductMaterial.material_id)
+    )
+
+
+async def release_order_reservations(session: AsyncSession, order_id: str):
+    """Снимает весь оставшийся по журналу резерв заказа."""
+    result = await session.execute(
+        select(
+            MaterialMovementModel.material_id,
+            func.sum(MaterialMovementModel.reserved_delta),
+        )
+        .where(MaterialMovementModel.order_id == order_id)
+        .group_by(MaterialMovementModel.material_id)
+    )
+    await record_movements(
+        session,
+        [
+            movement(material_id, MovementKind.RELEASE, reserved, order_id)
+            for material_id, reserved in result
+        ],
+    )
+
+
+async def release_order_materials(
+    session: AsyncSession, order_id: str, usage: dict[str, int]
+):
+    """
+    Снимает резерв заказа по материалам (удаление или уменьшение строки),
+    но не больше, чем по журналу зарезервировано за заказом.
+    """
+    usage = {
+        material_id: quantity
+        for material_id, quantity in usage.items()
+        if material_id is not None and quantity > 0
+    }
+    if not usage:
+        return
+    result = await session.execute(
+        select(
+            MaterialMovementModel.material_id,
+            func.sum(MaterialMovementModel.reserved_delta),
+        )
+        .where(
+            MaterialMovementModel.order_id == order_id,
+            MaterialMovementModel.material_id.in_(list(usage)),
+        )
+        .group_by(MaterialMovementModel.material_id)
+    )
+    reserved = dict(result.all())
+    await record_movements(
+        session,
+        [
+            movement(
+                material_id,
+                MovementKind.RELEASE,
+                max(min(quantity, reserved.get(material_id, 0)), 0),
+                order_id,
+            )
+            for material_id, quantity in usage.items()
+        ],
+    )
+
+
+async def reserve_order_materials(session: AsyncSession, order_id: str):
+    """Резервирует плановый расход (budged_usage) всех строк заказа."""
+    result = await session.execute(
+        _order_lines_usage(order_id, OrderProductMaterial.budged_usage)
+    )
+    await record_movements(
+        session,
+        [
+            movement(material_id, MovementKind.RESERVATION, usage, order_id)
+            for material_id, usage in result
+        ],
+    )
+
+
+async def consume_order_materials(
+    session: AsyncSession, order_id: str, sign: int = 1
+) -> list[str]:
+    """
+    Списывает фактический расход заказа (sign=-1 — возврат при откате).
+    Списание проверяет остаток по журналу под lock_materials_stock: если
+    чего-то не хватает, ничего не пишет и возвращает id этих материалов.
+    """
+    usage = dict(
+        (
+            await session.execute(
+                _order_lines_usage(order_id, OrderProductMaterial.actual_usage)
+            )
+        ).all()
+    )
+    if sign > 0:
+        await lock_materials_stock(session, usage)
+        levels = await stock_levels(session, usage)
+        short = [
+            material_id
+            for material_id, quantity in usage.items()
+            if levels.get(material_id, (0, 0))[0] < quantity
+        ]
+        if short:
+            return short
+
+    await record_movements(
+        session,
+        [
+            movement(material_id, MovementKind.CONSUMPTION, sign * quantity, order_id)
+            for material_id, quantity in usage.items()
+        ],
+    )
+    return []
+
+
+async def get_material_stock_service(
+    session: AsyncSession, material_id: str, at: datetime | None = None
+) -> MaterialStockSchema:
+    """Текущий остаток (снимок плюс несвернутые дельты) или, для даты в прошлом, из журнала."""
+    if await session.get(Material, material_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Material with id:'{material_id}' not found!",
+        )
+
+    if at is None:
+        levels = await stock_levels(session, [material_id])
+        on_hand, reserved = levels.get(material_id, (0, 0))
+    else:
+        result = await session.execute(
+            select(
+                func.coalesce(func.sum(MaterialMovementModel.on_hand_delta), 0),
+                func.coalesce(func.sum(MaterialMovementModel.reserved_delta), 0),
+            ).where(
+                MaterialMovementModel.material_id == material_id,
+                MaterialMovementModel.created_date <= at,
+            )
+        )
+        on_hand, reserved = result.one()
+
+    return MaterialStockSchema(
+        material_id=material_id,
+        on_hand=on_hand,
+        reserved=reserved,
+        available=on_hand - reserved,
+        at=at,
+    )
@@ -10,6 +10,14 @@ from pydantic import (
 )
 from typing import Optional
 
+from api_v1.utils.projection import (
+    Projection,
+    ProjectionQuerySchema,
+    Shape,
+    ShapeField,
+)
+from core.models import Material
+
 
 ## схема на вход
 class MaterialCreateSchema(BaseModel):
@@ -66,6 +74,7 @@ class MaterialSchema(BaseModel):
     one_item_price: int | float
     count_in_one_pack: int
     count_left: int
+    version: int = 1
 
     model_config = {"from_attributes": True}
 
@@ -95,14 +104,100 @@ class MaterialSchema(BaseModel):
     def capitalize_type(cls, name: str):
         return name.capitalize()
 
+    @staticmethod
+    def dump_orm(material: Material, projection: Projection | None = None) -> dict:
+        """Тот же JSON, что model_validate + model_dump, без валидаторов на строку."""
+        return MATERIAL_SHAPE.dump(material, projection or MATERIAL_SHAPE.full)
+
+
+def _price_to_uzs(price: int) -> int:
+    if price == 0:
+        return 0
+    return int(price / 100)
+
+
+MATERIAL_SHAPE = Shape(
+    model=Material,
+    fields={
+        "id": ShapeField("id"),
+        "name": ShapeField("name", str.capitalize),
+        "material_type": ShapeField("material_type", str.capitalize),
+        "detail": ShapeField("detail"),
+        "description": ShapeField("description"),
+        "create_at": ShapeField("create_at"),
+        "status": ShapeField("status"),
+        "pack_price": ShapeField("pack_price", _price_to_uzs),
+        "one_item_price": ShapeField("one_item_price", _price_to_uzs),
+        "count_in_one_pack": ShapeField("count_in_one_pack"),
+        "count_left": ShapeField("count_left"),
+        "version": ShapeField("version"),
+    },
+    required=("id", "version"),
+)
+
 
 ## схема на вход
+class MaterialStockSchema(BaseModel):
+    material_id: str
+    on_hand: int = Field(..., description="На складе")
+    reserved: int = Field(..., description="Зарезервировано под заказы")
+    available: int = Field(..., description="Доступно: на складе минус резерв")
+    at: Optional[datetime] = Field(None, description="Дата среза, если не текущий")
+
+
+class MaterialPricePropagationSchema(BaseModel):
+    material_id: str
+    material_price: int | float = Field(..., description="Цена единицы в UZS")
+    rows_updated: int = Field(..., description="Строк материалов в открытых заказах")
+    orders_affected: int
+    batches: int
+
+    @field_validator("material_price")
+    @classmethod
+    def convert_to_uzs(cls, material_price):
+        return int(material_price / 100)
+
+
+class MaterialForecastFilterSchema(BaseModel):
+    window_days: int = Field(
+        90, ge=7, le=730, description="Период истории расхода, дней"
+    )
+    horizon_days: int = Field(
+        30, ge=1, le=365, description="На сколько дней вперед закупать"
+    )
+    only_reorder: bool = Field(False, description="Только требующие закупки")
+
+
+class MaterialForecastSchema(BaseModel):
+    material_id: str
+    name: str
+    detail: Optional[str] = None
+    count_left: int
+    reserved: int = Field(..., description="План открытых заказов")
+    available: int = Field(..., description="Остаток минус резерв")
+    daily_usage: float = Field(..., description="Средний расход в день")
+    days_left: Optional[float] = Field(None, description="Дней до окончания")
+    run_out_date: Optional[datetime] = Field(None, description="Дата окончания")
+    reorder_packs: int = Field(..., description="Рекомендуемая закупка, упаковок")
+    reorder_cost: int | float = Field(..., description="Стоимость закупки в UZS")
+
+    @field_validator("reorder_cost")
+    @classmethod
+    def convert_to_uzs(cls, reorder_cost):
+        return reorder_cost / 100
+
+    @field_validator("name")
+    @classmethod
+    def capitalize_name(cls, name: str):
+        return name.capitalize()
+
+
 class MaterialAppendSchema(BaseModel):
     delta: int = Field(ge=-9999, le=9999)
 
 
 ## схема на вход
-class MaterialFilterSchema(BaseModel):
+class MaterialFilterSchema(ProjectionQuerySchema):
     # Пагинация
     skip: Optional[int] = Field(0, ge=0, description="Пропустить записей")
     limit: Optional[int] = Field(12, ge=1, le=1000, description="Лимит на страницу")
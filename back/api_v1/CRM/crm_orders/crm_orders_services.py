@@ -1,21 +1,46 @@
 from datetime import datetime, UTC
 
 from fastapi import HTTPException, status
-from sqlalchemy import select, func, Result
+from sqlalchemy import func, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
+from api_v1.CRM.crm_search.search_index import search_index
+from api_v1.CRM.crm_materials.material_stock_service import (
+    consume_order_materials,
+    release_order_reservations,
+    reserve_order_materials,
+)
+from api_v1.CRM.statistics.daily_stats_service import update_daily_stats
+from api_v1.utils.concurrency import check_version, retry_on_conflict
+from api_v1.utils.projection import ProjectionQuerySchema
+from api_v1.utils.pagination import (
+    encode_cursor,
+    decode_cursor,
+    fetch_page,
+)
 from api_v1.CRM.crm_orders.order_CRUD import (
+    CLOSED_STATUSES,
     create_order,
     get_order,
+    get_order_state,
+    increment_order,
 )
 from api_v1.CRM.crm_orders.orders_schemas import (
+    ORDER_SHAPE,
+    ORDER_SUMMARY_SHAPE,
     OrderCreateSchema,
     OrderSchema,
     OrderFilterSchema,
     OrderPartialUpdateSchema,
+    OrderSummarySchema,
+)
+from core.models import (
+    Material,
+    Order,
+    OrderProductModel,
+    OrderProductMaterial,
+    OrderStatus,
 )
-from core.models import Order, OrderProductModel, OrderProductMaterial, OrderStatus
 
 
 async def create_order_service(
@@ -30,31 +55,15 @@ async def create_order_service(
         descriptions=new_order.descriptions,
     )
     session.add(order)
+    await session.flush()
+    await update_daily_stats(session, order.created_date, orders_count=1)
     await session.commit()
+    search_index.add_order(order)
     order = await get_order(session=session, order_id=order.id)
     return OrderSchema.from_orm_with_rels(order)
 
 
-async def get_orders_service(
-    session: AsyncSession, filter_data: OrderFilterSchema
-) -> tuple[list[OrderSchema], int]:
-    sort_filters = {
-        "created_date": Order.created_date,
-        "customer": Order.customer,
-        "status": Order.status,
-    }
-
-    sort_field = sort_filters.get(filter_data.sort_by, Order.created_date)
-    stmt = select(Order).options(
-        selectinload(Order.products_detail).options(
-            selectinload(OrderProductModel.product),
-            selectinload(OrderProductModel.materials).selectinload(
-                OrderProductMaterial.material
-            ),
-        ),
-        selectinload(Order.costs),
-    )
-
+def _filter_orders(stmt, filter_data: OrderFilterSchema):
     if filter_data.created_date_from:
         stmt = stmt.where(Order.created_date >= filter_data.created_date_from)
 
@@ -76,31 +85,155 @@ async def get_orders_service(
     if filter_data.search:
         stmt = stmt.where(Order.id == filter_data.search)
 
-    count_stmt = select(func.count()).select_from(stmt.subquery())
-    total: int = await session.scalar(count_stmt)
+    return stmt
+
 
-    if filter_data.sort_order == "desc":
-        stmt = stmt.order_by(sort_field.desc())
+def _has_filters(filter_data: OrderFilterSchema) -> bool:
+    return any(
+        (
+            filter_data.created_date_from,
+            filter_data.created_date_to,
+            filter_data.customer,
+            filter_data.status is not None,
+            filter_data.used_id,
+            filter_data.client_id,
+            filter_data.search,
+        )
+    )
+
+
+def _sort_orders(stmt, filter_data: OrderFilterSchema):
+    sort_filters = {
+        "created_date": Order.created_date,
+        "customer": Order.customer,
+        "status": Order.status,
+    }
+
+    sort_field = sort_filters.get(filter_data.sort_by, Order.created_date)
+    desc = filter_data.sort_order == "desc"
+
+    # Курсорный режим всегда идет по (created_date, id) и не зависит от глубины
+    if filter_data.cursor:
+        cursor_date, cursor_id = decode_cursor(filter_data.cursor)
+        position = tuple_(Order.created_date, Order.id)
+        if desc:
+            stmt = stmt.where(position < tuple_(cursor_date, cursor_id))
+        else:
+            stmt = stmt.where(position > tuple_(cursor_date, cursor_id))
+        sort_field = Order.created_date
+
+    if desc:
+        stmt = stmt.order_by(sort_field.desc(), Order.id.desc())
     else:
-        stmt = stmt.order_by(sort_field.asc())
+        stmt = stmt.order_by(sort_field.asc(), Order.id.asc())
 
-    result: Result = await session.execute(stmt)
-    orders: list[Order] = list(result.scalars().all())
+    return stmt, sort_field is Order.created_date
 
-    return [OrderSchema.from_orm_with_rels(order) for order in orders], total
 
+async def _fetch_orders_page(
+    session: AsyncSession, stmt, filter_data: OrderFilterSchema
+):
+    """Общая страница для полного и краткого списка заказов."""
+    sorted_stmt, keyset = _sort_orders(stmt, filter_data)
+    estimate_model = None if _has_filters(filter_data) else Order
+
+    if filter_data.cursor:
+        # окно в курсорном режиме видит только строки после курсора: total
+        # считается по запросу без курсора подзапросом в том же SELECT
+        rows, total, has_more, _ = await fetch_page(
+            session,
+            sorted_stmt,
+            0,
+            filter_data.limit,
+            estimate_model=estimate_model,
+            count_stmt=stmt,
+        )
+    else:
+        rows, total, has_more, _ = await fetch_page(
+            session,
+            sorted_stmt,
+            filter_data.skip,
+            filter_data.limit,
+            estimate_model=estimate_model,
+        )
 
-async def get_order_by_id_service(session: AsyncSession, order_id: str) -> OrderSchema:
-    order: Order = await get_order(session=session, order_id=order_id)
+    return rows, total, has_more, keyset
+
+
+async def get_orders_service(
+    session: AsyncSession, filter_data: OrderFilterSchema
+) -> tuple[list[dict], int, bool, str | None]:
+    # Колонки и связи — по fields/expand: без expand материалы не грузятся
+    projection = ORDER_SHAPE.parse(filter_data.fields, filter_data.expand)
+    stmt = select(Order).options(*ORDER_SHAPE.load_options(projection))
+    stmt = _filter_orders(stmt, filter_data)
+
+    rows, total, has_more, keyset = await _fetch_orders_page(
+        session, stmt, filter_data
+    )
+    orders: list[Order] = [row[0] for row in rows]
+
+    next_cursor = None
+    if has_more and keyset:
+        next_cursor = encode_cursor(orders[-1].created_date, orders[-1].id)
+
+    return (
+        [OrderSchema.dump_orm(order, projection) for order in orders],
+        total,
+        has_more,
+        next_cursor,
+    )
+
+
+async def get_orders_summary_service(
+    session: AsyncSession, filter_data: OrderFilterSchema
+) -> tuple[list[dict], int, bool, str | None]:
+    # Только колонки orders, без связей: один запрос на страницу
+    projection = ORDER_SUMMARY_SHAPE.parse(filter_data.fields, filter_data.expand)
+    stmt = select(*ORDER_SUMMARY_SHAPE.columns(projection))
+    stmt = _filter_orders(stmt, filter_data)
+
+    rows, total, has_more, keyset = await _fetch_orders_page(
+        session, stmt, filter_data
+    )
+
+    next_cursor = None
+    if has_more and keyset:
+        next_cursor = encode_cursor(rows[-1].created_date, rows[-1].id)
+
+    return (
+        OrderSummarySchema.dump_rows(rows, projection),
+        total,
+        has_more,
+        next_cursor,
+    )
+
+
+async def get_order_by_id_service(
+    session: AsyncSession,
+    order_id: str,
+    projection: ProjectionQuerySchema | None = None,
+) -> tuple[dict, int]:
+    shape = (
+        ORDER_SHAPE.full
+        if projection is None
+        else ORDER_SHAPE.parse(projection.fields, projection.expand)
+    )
+    order: Order | None = await session.scalar(
+        select(Order)
+        .options(*ORDER_SHAPE.load_options(shape))
+        .where(Order.id == order_id)
+    )
     if order is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"order with id:{order_id} not found",
         )
 
-    return OrderSchema.from_orm_with_rels(order)
+    return OrderSchema.dump_orm(order, shape), order.version
 
 
+@retry_on_conflict
 async def delete_order_service(session: AsyncSession, order_id: str) -> bool:
     order = await session.get(Order, order_id)
     if not order:
@@ -112,100 +245,195 @@ async def delete_order_service(session: AsyncSession, order_id: str) -> bool:
             detail=f"Can not add payment order with status:{order.status}",
         )
 
+    await update_daily_stats(
+        session,
+        order.created_date,
+        orders_count=-1,
+        orders_amount=-order.total_price,
+        materials_cost=-order.materials_price,
+    )
+    await release_order_reservations(session=session, order_id=order_id)
     await session.delete(order)
     await session.commit()
+    search_index.remove("order", order_id)
     return True
 
 
-async def payment_add_service(
-    session: AsyncSession, order_id: str, payment: int | float
-) -> OrderSchema:
-    if payment <= 0:
+async def raise_order_not_updated(
+    session: AsyncSession,
+    order_id: str,
+    action: str,
+    expected_version: int | None = None,
+    check_payment: bool = False,
+):
+    """
+    Атомарный UPDATE не затронул заказ: перечитываем состояние и отвечаем
+    ошибкой по первой не прошедшей проверке.
+    """
+    state = await get_order_state(session=session, order_id=order_id)
+    if state is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"payment is 0 or lower",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"order with id:{order_id} not found",
         )
-    else:
-        payment = payment * 100
 
-    order: Order | None = await get_order(session=session, order_id=order_id)
+    check_version(state.version, expected_version)
 
-    if order is None:
+    if state.status in CLOSED_STATUSES:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order with id:{order_id} not found",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Can not {action} order with status:{state.status}",
         )
 
-    if order.status in [6, 5]:
+    if check_payment:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Can not add payment order with status:{order.status}",
+            detail=f"Wrong payment amount, recommended sum {(state.total_price - state.paid) / 100}",
         )
 
-    if order.paid + payment <= order.total_price:
-        order.paid += payment
+    # Заказ успел измениться между UPDATE и повторным чтением
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"order:{order_id} was modified concurrently, try again",
+    )
+
 
-    else:
+async def payment_add_service(
+    session: AsyncSession,
+    order_id: str,
+    payment: int | float,
+    expected_version: int | None = None,
+) -> OrderSummarySchema:
+    if payment <= 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Wrong payment amount, recommended sum {order.remains / 100}",
+            detail=f"payment is 0 or lower",
         )
+    else:
+        payment = round(payment * 100)
 
-    await session.commit()
-    await session.refresh(order)
-
-    return OrderSchema.from_orm_with_rels(order)
-
+    # Проверки статуса, суммы и версии — в WHERE: одна операция без чтения заказа
+    conditions = [
+        Order.status.not_in(CLOSED_STATUSES),
+        Order.paid + payment <= Order.total_price,
+    ]
+    if expected_version is not None:
+        conditions.append(Order.version == expected_version)
 
-async def order_complete_service(session: AsyncSession, order_id: str):
-    order: Order = await get_order(session=session, order_id=order_id)
+    order = await increment_order(session, order_id, *conditions, paid=payment)
+    if order is None:
+        await raise_order_not_updated(
+            session=session,
+            order_id=order_id,
+            action="add payment",
+            expected_version=expected_version,
+            check_payment=True,
+        )
 
+    await session.commit()
+    return OrderSummarySchema.model_validate(order._mapping)
+
+
+async def _lock_order(session: AsyncSession, order_id: str):
+    result = await session.execute(
+        select(
+            Order.status,
+            Order.total_price,
+            Order.paid,
+            Order.materials_price,
+            Order.created_date,
+            Order.version,
+        )
+        .where(Order.id == order_id)
+        .with_for_update()
+    )
+    order = result.one_or_none()
     if order is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"order with id:{order_id} not found",
         )
+    return order
+
+
+async def order_complete_service(
+    session: AsyncSession, order_id: str, expected_version: int | None = None
+) -> tuple[dict, int]:
+    order = await _lock_order(session=session, order_id=order_id)
+    check_version(order.version, expected_version)
 
     if order.status > 4:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Can not complete order with status:{Order.status}",
+            detail=f"Can not complete order with status:{order.status}",
         )
 
-    if order.remains != 0:
+    remains = order.total_price - order.paid
+    if remains != 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"The order could not be completed, it was not paid {order.remains / 100}",
+            detail=f"The order could not be completed, it was not paid {remains / 100}",
         )
 
-    total_material_price = sum(
-        sum(opm.total_price_actual for opm in op.materials)
-        for op in order.products_detail
-    )
+    # Журнал склада: фактическое списание, остаток проверяется по журналу
+    short = await consume_order_materials(session=session, order_id=order_id)
+    if short:
+        await session.rollback()
+        material = await session.get(Material, short[0])
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"not enough material-{material.name}{material.detail} to order-{order_id}",
+        )
 
-    order.materials_price = total_material_price
-    order.completed_date = datetime.now(UTC).replace(tzinfo=None)
-    order.status = OrderStatus.COMPLETED.value
+    materials_price = (
+        select(
+            func.coalesce(
+                func.sum(
+                    OrderProductMaterial.actual_usage * OrderProductMaterial.material_price
+                ),
+                0,
+            )
+        )
+        .join(
+            OrderProductModel,
+            OrderProductModel.id == OrderProductMaterial.order_product_id,
+        )
+        .where(OrderProductModel.order_id == order_id)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(Order)
+        .where(Order.id == order_id)
+        .values(
+            status=OrderStatus.COMPLETED.value,
+            completed_date=datetime.now(UTC).replace(tzinfo=None),
+            materials_price=materials_price,
+            version=Order.version + 1,
+        )
+        .returning(Order.materials_price, Order.version)
+        .execution_options(synchronize_session=False)
+    )
+    total_material_price, version = result.one()
 
-    for prod in order.products_detail:
-        for mat in prod.materials:
-            if mat.material.count_left - mat.actual_usage >= 0:
-                mat.material.count_left -= mat.actual_usage
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"not enough material-{mat.material.name}{mat.material.detail} to order-{order.id}",
-                )
+    # Списанный заказ больше не держит резерв
+    await release_order_reservations(session=session, order_id=order_id)
 
+    await update_daily_stats(
+        session,
+        order.created_date,
+        materials_cost=total_material_price - order.materials_price,
+    )
     await session.commit()
-    return {"Message": f"Order status changed:{order.status}"}
+    return {"Message": f"Order status changed:{OrderStatus.COMPLETED.value}"}, version
 
 
+@retry_on_conflict
 async def partial_order_update_service(
     session: AsyncSession,
     order_id: str,
     update_data: OrderPartialUpdateSchema,
-):
+    expected_version: int | None = None,
+) -> tuple[dict, int]:
     order: Order = await get_order(session=session, order_id=order_id)
 
     if order is None:
@@ -214,6 +442,8 @@ async def partial_order_update_service(
             detail=f"order with id:{order_id} not found",
         )
 
+    check_version(order.version, expected_version)
+
     if not update_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"no data for update"
@@ -226,30 +456,40 @@ async def partial_order_update_service(
         order.descriptions = update_data.description
 
     await session.commit()
-    return {"Message": f"order:{order_id} updated!"}
+    search_index.add_order(order)
+    return {"Message": f"order:{order_id} updated!"}, order.version
 
 
-async def order_revert_to_created_status_service(session: AsyncSession, order_id: str):
-    order: Order = await get_order(session=session, order_id=order_id)
-
-    if order is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order with id:{order_id} not found",
-        )
+async def order_revert_to_created_status_service(
+    session: AsyncSession, order_id: str, expected_version: int | None = None
+) -> tuple[dict, int]:
+    order = await _lock_order(session=session, order_id=order_id)
+    check_version(order.version, expected_version)
 
     if order.status != 5:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
-    order.status = OrderStatus.CREATED.value
-    order.paid = 0
-    order.materials_price = 0
+    await update_daily_stats(
+        session, order.created_date, materials_cost=-order.materials_price
+    )
 
-    for prod in order.products_detail:
-        for mat in prod.materials:
-            mat.material.count_left += mat.actual_usage
+    version = await session.scalar(
+        update(Order)
+        .where(Order.id == order_id)
+        .values(
+            status=OrderStatus.CREATED.value,
+            paid=0,
+            materials_price=0,
+            version=Order.version + 1,
+        )
+        .returning(Order.version)
+        .execution_options(synchronize_session=False)
+    )
+    # Возврат списанного и повторный резерв: заказ снова открыт
+    await consume_order_materials(session=session, order_id=order_id, sign=-1)
+    await reserve_order_materials(session=session, order_id=order_id)
 
     await session.commit()
-    return {"Message": f"Order status changed:{order.status}"}
+    return {"Message": f"Order status changed:{OrderStatus.CREATED.value}"}, version
@@ -1,22 +1,29 @@
-from fastapi import APIRouter, Depends, status
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Header, Response, status
+from fastapi.responses import ORJSONResponse
 
 from api_v1.CRM.crm_orders.orders_schemas import (
     OrderCreateSchema,
     OrderSchema,
     OrderFilterSchema,
     OrderPartialUpdateSchema,
+    OrderSummarySchema,
 )
 from api_v1.CRM.crm_orders.crm_orders_services import (
     create_order_service,
     get_orders_service,
+    get_orders_summary_service,
     delete_order_service,
     payment_add_service,
     get_order_by_id_service,
     order_complete_service,
     partial_order_update_service, order_revert_to_created_status_service,
 )
-from core import SessionDepPG
-from core.ResponseModel.response_model import PaginatedResponse
+from api_v1.utils.concurrency import parse_if_match, set_etag
+from api_v1.utils.projection import ProjectionQuerySchema
+from core import SessionDepPG, SessionDepRead
+from core.ResponseModel.response_model import PaginatedResponse, paginated_json
 
 router = APIRouter(prefix="/orders")
 
@@ -31,39 +38,69 @@ async def create_order_crm(
 
 @router.get("/", response_model=PaginatedResponse[OrderSchema])
 async def crm_get_orders(
-    session: SessionDepPG, filters: OrderFilterSchema = Depends()
-) -> PaginatedResponse:
-    orders: tuple[list[OrderSchema], int] = await get_orders_service(
+    session: SessionDepRead, filters: OrderFilterSchema = Depends()
+) -> ORJSONResponse:
+    orders, total, has_more, next_cursor = await get_orders_service(
+        session=session, filter_data=filters
+    )
+
+    return paginated_json(
+        items=orders,
+        total=total,
+        skip=filters.skip,
+        limit=filters.limit,
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/summary", response_model=PaginatedResponse[OrderSummarySchema])
+async def crm_get_orders_summary(
+    session: SessionDepRead, filters: OrderFilterSchema = Depends()
+) -> ORJSONResponse:
+    orders, total, has_more, next_cursor = await get_orders_summary_service(
         session=session, filter_data=filters
     )
 
-    return PaginatedResponse(
-        items=orders[0],
-        total=orders[-1],
+    return paginated_json(
+        items=orders,
+        total=total,
         skip=filters.skip,
         limit=filters.limit,
-        has_more=(filters.skip + filters.limit) < orders[-1],
+        has_more=has_more,
+        next_cursor=next_cursor,
     )
 
 
 @router.get("/{order_id}", response_model=OrderSchema)
 async def crm_get_product(
-    session: SessionDepPG,
+    session: SessionDepRead,
     order_id: str,
-) -> OrderSchema:
-    order: OrderSchema = await get_order_by_id_service(
-        session=session, order_id=order_id
+    projection: ProjectionQuerySchema = Depends(),
+) -> ORJSONResponse:
+    order, version = await get_order_by_id_service(
+        session=session, order_id=order_id, projection=projection
     )
-    return order
+    response = ORJSONResponse(order)
+    set_etag(response, version)
+    return response
 
 
 @router.patch("/{order_id}")
 async def crm_order_update(
-    session: SessionDepPG, order_id: str, update_data: OrderPartialUpdateSchema
+    session: SessionDepPG,
+    order_id: str,
+    update_data: OrderPartialUpdateSchema,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
 ):
-    res = await partial_order_update_service(
-        session=session, order_id=order_id, update_data=update_data
+    res, version = await partial_order_update_service(
+        session=session,
+        order_id=order_id,
+        update_data=update_data,
+        expected_version=parse_if_match(if_match),
     )
+    set_etag(response, version)
     return res
 
 
@@ -72,27 +109,51 @@ async def crm_delete_order(session: SessionDepPG, order_id: str):
     await delete_order_service(session=session, order_id=order_id)
 
 
-@router.patch("/append_payment/{order_id}", response_model=OrderSchema)
+@router.patch("/append_payment/{order_id}", response_model=OrderSummarySchema)
 async def crm_append_payment(
     session: SessionDepPG,
     order_id: str,
     payment: int | float,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
 ):
-    order: OrderSchema = await payment_add_service(
+    order: OrderSummarySchema = await payment_add_service(
         session=session,
         order_id=order_id,
         payment=payment,
+        expected_version=parse_if_match(if_match),
     )
+    set_etag(response, order.version)
     return order
 
 
 @router.patch("/order_complete/{order_id}")
-async def crm_order_complete(session: SessionDepPG, order_id: str):
-    res = await order_complete_service(session=session, order_id=order_id)
+async def crm_order_complete(
+    session: SessionDepPG,
+    order_id: str,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    res, version = await order_complete_service(
+        session=session,
+        order_id=order_id,
+        expected_version=parse_if_match(if_match),
+    )
+    set_etag(response, version)
     return res
 
 
 @router.patch("/order_status_revert_to_created/{order_id}")
-async def crm_order_complete(session: SessionDepPG, order_id: str):
-    res = await order_revert_to_created_status_service(session=session, order_id=order_id)
+async def crm_order_complete(
+    session: SessionDepPG,
+    order_id: str,
+    response: Response,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    res, version = await order_revert_to_created_status_service(
+        session=session,
+        order_id=order_id,
+        expected_version=parse_if_match(if_match),
+    )
+    set_etag(response, version)
     return res
@@ -1,4 +1,4 @@
-from sqlalchemy import select, Result
+from sqlalchemy import select, update, Result, Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -9,6 +9,25 @@ from core.models import (
     OrderProductMaterial,
 )
 
+# Заказ с такими статусами больше не меняется
+CLOSED_STATUSES = (OrderStatus.COMPLETED.value, OrderStatus.CANCELED.value)
+
+# Колонки orders без связей: краткий список и RETURNING атомарных обновлений
+ORDER_SUMMARY_COLUMNS = (
+    Order.id,
+    Order.status,
+    Order.customer,
+    Order.total_price,
+    Order.materials_price,
+    Order.paid,
+    Order.created_date,
+    Order.hiring_date,
+    Order.ready_date,
+    Order.completed_date,
+    Order.canceled_date,
+    Order.version,
+)
+
 
 async def create_order(
     session: AsyncSession,
@@ -64,6 +83,58 @@ async def get_order(session: AsyncSession, order_id: str) -> Order | None:
     return order
 
 
+async def increment_order(
+    session: AsyncSession, order_id: str, *conditions, **deltas: int
+) -> Row | None:
+    """
+    Прибавляет дельты к колонкам заказа одним UPDATE ... RETURNING.
+    Бизнес-проверки передаются условиями WHERE: None — заказ не подошел.
+    """
+    stmt = (
+        update(Order)
+        .where(Order.id == order_id, *conditions)
+        .values(
+            **{key: getattr(Order, key) + value for key, value in deltas.items()},
+            version=Order.version + 1,
+        )
+        .returning(*ORDER_SUMMARY_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    result: Result = await session.execute(stmt)
+    return result.one_or_none()
+
+
+async def lock_open_order(session: AsyncSession, order_id: str) -> Row | None:
+    """
+    SELECT ... FOR UPDATE открытого заказа до commit. Строки и расходы заказа
+    читаются после блокировки: разница считается от свежих значений.
+    None — заказа нет или он закрыт.
+    """
+    conditions = (Order.id == order_id, Order.status.not_in(CLOSED_STATUSES))
+    if session.get_bind().dialect.name == "sqlite":
+        # FOR UPDATE в SQLite нет: блокировку записи берет пустой UPDATE
+        stmt = (
+            update(Order)
+            .where(*conditions)
+            .values(version=Order.version)
+            .returning(*ORDER_SUMMARY_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        stmt = select(*ORDER_SUMMARY_COLUMNS).where(*conditions).with_for_update()
+    result: Result = await session.execute(stmt)
+    return result.one_or_none()
+
+
+async def get_order_state(session: AsyncSession, order_id: str) -> Row | None:
+    result: Result = await session.execute(
+        select(Order.status, Order.total_price, Order.paid, Order.version).where(
+            Order.id == order_id
+        )
+    )
+    return result.one_or_none()
+
+
 async def update_order(
     session: AsyncSession,
     order_id,
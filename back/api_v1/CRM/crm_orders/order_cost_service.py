@@ -1,7 +1,14 @@
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
-from api_v1.CRM.crm_orders.order_CRUD import get_order
+from api_v1.CRM.crm_orders.crm_orders_services import raise_order_not_updated
+from api_v1.CRM.crm_orders.order_CRUD import (
+    CLOSED_STATUSES,
+    increment_order,
+    lock_open_order,
+)
+from api_v1.CRM.statistics.daily_stats_service import update_daily_stats
 from api_v1.CRM.crm_orders.orders_schemas import CreateOrderAdditionalCoastSchema
 from core.models import OrderAddCostsModel, Order
 
@@ -11,28 +18,28 @@ async def create_order_cost_service(
     order_id: str,
     new_cost: CreateOrderAdditionalCoastSchema,
 ):
-    order: Order | None = await get_order(session=session, order_id=order_id)
-
+    # Сумма заказа уменьшается атомарно, статус проверяется в WHERE
+    order = await increment_order(
+        session,
+        order_id,
+        Order.status.not_in(CLOSED_STATUSES),
+        total_price=-new_cost.cost,
+    )
     if order is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order with id:{order_id} not found",
+        await raise_order_not_updated(
+            session=session, order_id=order_id, action="append cost to"
         )
 
-    if order.status > 4:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Can append cost to order with status:{Order.status}",
+    session.add(
+        OrderAddCostsModel(
+            order_id=order_id,
+            cost=new_cost.cost,
+            description=new_cost.description,
         )
-
-    order_cost = OrderAddCostsModel(
-        order_id=order_id,
-        cost=new_cost.cost,
-        description=new_cost.description,
     )
-
-    order.total_price -= order_cost.cost
-    session.add(order_cost)
+    await update_daily_stats(
+        session, order.created_date, orders_amount=-new_cost.cost
+    )
     await session.commit()
     return {"Message": "CREATED"}
 
@@ -42,30 +49,43 @@ async def delete_order_cost_service(
     order_id: str,
     order_cost_id: int,
 ):
-    order: Order | None = await get_order(session=session, order_id=order_id)
-
-    if order is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order with id:{order_id} not found",
+    # Расход читается под блокировкой заказа: двойное удаление не вернет
+    # сумму дважды
+    if await lock_open_order(session, order_id) is None:
+        await raise_order_not_updated(
+            session=session, order_id=order_id, action="delete cost from"
         )
+
     order_cost: OrderAddCostsModel | None = await session.get(
         OrderAddCostsModel, order_cost_id
     )
 
-    if order.status > 4:
+    if order_cost is None or order_cost.order_id != order_id:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Can delete cost to order with status:{Order.status}",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"order_cost:{order_cost_id} in order:{order_id} not found",
         )
 
-    if order_cost is None:
+    deleted = await session.execute(
+        delete(OrderAddCostsModel)
+        .where(
+            OrderAddCostsModel.id == order_cost_id,
+            OrderAddCostsModel.order_id == order_id,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if deleted.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"order_cost:{order_cost_id} in order:{order_id} not found",
         )
 
-    await session.delete(order_cost)
-    order.total_price += order_cost.cost
+    order = await increment_order(
+        session,
+        order_id,
+        Order.status.not_in(CLOSED_STATUSES),
+        total_price=order_cost.cost,
+    )
+    await update_daily_stats(session, order.created_date, orders_amount=order_cost.cost)
     await session.commit()
     return {"Message": "DELETED"}
@@ -1,8 +1,8 @@
-from sqlalchemy import select, Result
+from sqlalchemy import insert, select, Result
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.models import OrderProductModel
+from core.models import OrderProductModel, OrderProductMaterial
 
 
 async def create_order_product(
@@ -22,6 +22,24 @@ async def create_order_product(
     return order_product
 
 
+async def create_order_products_bulk(
+    session: AsyncSession, rows: list[dict]
+) -> list[int]:
+    """Вставка строк заказа одним executemany, id возвращаются в порядке rows."""
+    result: Result = await session.execute(
+        insert(OrderProductModel).returning(
+            OrderProductModel.id, sort_by_parameter_order=True
+        ),
+        rows,
+    )
+    return list(result.scalars().all())
+
+
+async def create_order_product_materials_bulk(session: AsyncSession, rows: list[dict]):
+    if rows:
+        await session.execute(insert(OrderProductMaterial), rows)
+
+
 async def get_orders_products(session: AsyncSession) -> list[OrderProductModel]:
     stmt = (
         select(OrderProductModel)
@@ -1,36 +1,74 @@
+from collections import Counter
+
 from pydantic import NonNegativeInt
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
 from api_v1.utils.order_material_calculate import materials_count
-from api_v1.CRM.crm_orders.order_CRUD import get_order
+from api_v1.CRM.crm_materials.material_stock_service import (
+    movement,
+    record_movements,
+    release_order_materials,
+)
+from api_v1.CRM.statistics.daily_stats_service import update_daily_stats
+from api_v1.CRM.crm_orders.crm_orders_services import raise_order_not_updated
+from api_v1.CRM.crm_orders.order_CRUD import (
+    CLOSED_STATUSES,
+    increment_order,
+    lock_open_order,
+)
 from api_v1.CRM.crm_orders.order_product_CRUD import (
     create_order_product,
+    create_order_product_materials_bulk,
+    create_order_products_bulk,
     get_order_product,
 )
 from api_v1.CRM.crm_orders.orders_schemas import OrderItemCreate
-from api_v1.CRM.crm_products.product_CRUD import get_product
-from core.models import Order, Product, OrderProductMaterial, OrderProductModel
+from api_v1.CRM.crm_products.product_CRUD import get_product, get_products_by_ids
+from core.models import (
+    MovementKind,
+    Order,
+    Product,
+    OrderProductMaterial,
+    OrderProductModel,
+)
 
 
-async def create_order_product_service(
-    session: AsyncSession,
-    order_id: str,
-    new_order_product: OrderItemCreate,
-):
-    order: Order = await get_order(session=session, order_id=order_id)
+async def _lock_order_for_change(session: AsyncSession, order_id: str, amount: int):
+    """
+    Прибавляет amount к сумме открытого заказа одним UPDATE. Строка заказа
+    остается заблокированной до commit, поэтому проверки строк заказа ниже
+    не гоняются с параллельными изменениями того же заказа.
+    """
+    order = await increment_order(
+        session,
+        order_id,
+        Order.status.not_in(CLOSED_STATUSES),
+        total_price=amount,
+    )
     if order is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order with id:{order_id} not found",
+        await raise_order_not_updated(
+            session=session, order_id=order_id, action="change"
         )
+    return order
 
-    if order.status in [6, 5]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Can not change order with status:{order.status}",
+
+async def _lock_open_order(session: AsyncSession, order_id: str):
+    """Блокирует открытый заказ до чтения его строк; иначе 404 или 400."""
+    order = await lock_open_order(session, order_id)
+    if order is None:
+        await raise_order_not_updated(
+            session=session, order_id=order_id, action="change"
         )
+    return order
 
+
+async def create_order_product_service(
+    session: AsyncSession,
+    order_id: str,
+    new_order_product: OrderItemCreate,
+):
     product: Product = await get_product(
         session=session, product_id=new_order_product.product_id
     )
@@ -39,10 +77,21 @@ async def create_order_product_service(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"product with id:{new_order_product.product_id} not found",
         )
-    if any(product.id == pd.product_id for pd in order.products_detail):
+
+    product_price = product.give_product_price(new_order_product.quantity)
+    amount = product_price * new_order_product.quantity
+    order = await _lock_order_for_change(session, order_id, amount)
+
+    in_order = await session.scalar(
+        select(OrderProductModel.id).where(
+            OrderProductModel.order_id == order_id,
+            OrderProductModel.product_id == product.id,
+        )
+    )
+    if in_order is not None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail=f"product:{product.id} already in order:{order.id}",
+            detail=f"product:{product.id} already in order:{order_id}",
         )
 
     order_product = await create_order_product(
@@ -50,7 +99,7 @@ async def create_order_product_service(
         order_id=order_id,
         product_id=new_order_product.product_id,
         quantity=new_order_product.quantity,
-        product_price=product.give_product_price(new_order_product.quantity),
+        product_price=product_price,
     )
 
     order_product.materials = [
@@ -68,31 +117,130 @@ async def create_order_product_service(
         )
         for ma in product.material_detail
     ]
-    order.total_price += order_product.product_price * order_product.quantity
     session.add(order_product)
+    await record_movements(
+        session,
+        [
+            movement(
+                mat.material_id, MovementKind.RESERVATION, mat.budged_usage, order_id
+            )
+            for mat in order_product.materials
+        ],
+    )
+    await update_daily_stats(session, order.created_date, orders_amount=amount)
     await session.commit()
     return {"Message": "CREATED!"}
 
 
-async def order_product_count_change_service(
+async def create_order_products_bulk_service(
     session: AsyncSession,
     order_id: str,
-    order_product_id: int,
-    new_count: NonNegativeInt,
+    new_order_products: list[OrderItemCreate],
 ):
-    order: Order = await get_order(session=session, order_id=order_id)
-    if order is None:
+    """
+    Добавляет несколько продуктов в заказ: все продукты одним запросом, цены
+    и расход материалов в памяти, сумма заказа одним UPDATE, вставки
+    executemany, один commit.
+    """
+    duplicates = [
+        product_id
+        for product_id, count in Counter(
+            item.product_id for item in new_order_products
+        ).items()
+        if count > 1
+    ]
+    if duplicates:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"products:{duplicates} repeated in request",
+        )
+
+    product_ids = [item.product_id for item in new_order_products]
+    products = {
+        product.id: product
+        for product in await get_products_by_ids(
+            session=session, product_ids=product_ids
+        )
+    }
+    missing = [product_id for product_id in product_ids if product_id not in products]
+    if missing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order with id:{order_id} not found",
+            detail=f"products with id:{missing} not found",
         )
 
-    if order.status in [6, 5]:
+    order_product_rows = [
+        {
+            "order_id": order_id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "product_price": products[item.product_id].give_product_price(
+                item.quantity
+            ),
+        }
+        for item in new_order_products
+    ]
+    added_amount = sum(
+        row["product_price"] * row["quantity"] for row in order_product_rows
+    )
+    order = await _lock_order_for_change(session, order_id, added_amount)
+
+    in_order = set(
+        (
+            await session.scalars(
+                select(OrderProductModel.product_id).where(
+                    OrderProductModel.order_id == order_id,
+                    OrderProductModel.product_id.in_(product_ids),
+                )
+            )
+        ).all()
+    )
+    if in_order:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Can not change order with status:{order.status}",
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"products:{sorted(in_order)} already in order:{order_id}",
         )
 
+    order_product_ids = await create_order_products_bulk(
+        session=session, rows=order_product_rows
+    )
+
+    material_rows = []
+    for order_product_id, item in zip(order_product_ids, new_order_products):
+        for ma in products[item.product_id].material_detail:
+            usage = materials_count(ma.quantity_in_one_mat_unit, item.quantity)
+            material_rows.append(
+                {
+                    "order_product_id": order_product_id,
+                    "material_id": ma.material_id,
+                    "qty_prod_in_mat": ma.quantity_in_one_mat_unit,
+                    "actual_usage": usage,
+                    "budged_usage": usage,
+                    "material_price": ma.material.one_item_price,
+                }
+            )
+    await create_order_product_materials_bulk(session=session, rows=material_rows)
+    await record_movements(
+        session,
+        [
+            movement(
+                row["material_id"],
+                MovementKind.RESERVATION,
+                row["budged_usage"],
+                order_id,
+            )
+            for row in material_rows
+        ],
+    )
+
+    await update_daily_stats(session, order.created_date, orders_amount=added_amount)
+    await session.commit()
+    return {"Message": "CREATED!", "order_product_ids": order_product_ids}
+
+
+async def _get_order_line(
+    session: AsyncSession, order_id: str, order_product_id: int
+) -> OrderProductModel:
     order_product: OrderProductModel = await get_order_product(
         session=session, order_product_id=order_product_id
     )
@@ -103,15 +251,24 @@ async def order_product_count_change_service(
             detail=f"order_product with id:{order_product_id} not found",
         )
 
-    order_product_id_check = any(
-        order_product_id == op.id for op in order.products_detail
-    )
-
-    if not order_product_id_check:
+    if order_product.order_id != order_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"in order:{order_id} not found order_product:{order_product_id}",
         )
+    return order_product
+
+
+async def order_product_count_change_service(
+    session: AsyncSession,
+    order_id: str,
+    order_product_id: int,
+    new_count: NonNegativeInt,
+):
+    # Разница по строке считается под блокировкой заказа: параллельная правка
+    # той же строки ждет commit и видит уже новое количество
+    await _lock_open_order(session, order_id)
+    order_product = await _get_order_line(session, order_id, order_product_id)
 
     product: Product = await get_product(
         session=session, product_id=order_product.product_id
@@ -122,8 +279,14 @@ async def order_product_count_change_service(
             detail=f"product with id:{order_product.product_id} not found",
         )
 
+    # Сумма заказа меняется на разницу по строке, без пересчета всего заказа
+    new_price = product.give_product_price(new_count)
+    amount = new_price * new_count - order_product.total_price
+    order = await _lock_order_for_change(session, order_id, amount)
+
+    old_budget = {elem.id: elem.budged_usage for elem in order_product.materials}
     order_product.quantity = new_count
-    order_product.product_price = product.give_product_price(new_count)
+    order_product.product_price = new_price
 
     for elem in order_product.materials:  # type: OrderProductMaterial
         elem.actual_usage = materials_count(
@@ -133,8 +296,21 @@ async def order_product_count_change_service(
             elem.qty_prod_in_mat, order_product.quantity
         )
 
+    # Резерв меняется на разницу планового расхода; снятие — не больше,
+    # чем заказ держит по журналу
+    reserve, release = [], Counter()
+    for elem in order_product.materials:
+        diff = elem.budged_usage - old_budget[elem.id]
+        if diff > 0:
+            reserve.append(
+                movement(elem.material_id, MovementKind.RESERVATION, diff, order_id)
+            )
+        else:
+            release[elem.material_id] -= diff
+    await record_movements(session, reserve)
+    await release_order_materials(session, order_id, release)
     session.add(order_product)
-    order.total_price = order.products_price
+    await update_daily_stats(session, order.created_date, orders_amount=amount)
     await session.commit()
     return {"Message": "CHANGED!"}
 
@@ -142,29 +318,33 @@ async def order_product_count_change_service(
 async def order_product_delete_service(
     session: AsyncSession, order_id: str, order_product_id: int
 ):
-    order: Order = await get_order(session=session, order_id=order_id)
-    if order is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order with id:{order_id} not found",
+    await _lock_open_order(session, order_id)
+    order_product = await _get_order_line(session, order_id, order_product_id)
+    # Материалы строки удаляет каскад в базе (passive_deletes)
+    deleted = await session.execute(
+        delete(OrderProductModel)
+        .where(
+            OrderProductModel.id == order_product_id,
+            OrderProductModel.order_id == order_id,
         )
-
-    if order.status in [6, 5]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Can not change order with status:{order.status}",
-        )
-
-    order_product: OrderProductModel = await get_order_product(
-        session=session, order_product_id=order_product_id
+        .execution_options(synchronize_session=False)
     )
-
-    if order_product is None:
+    if deleted.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"order_product with id:{order_product_id} not found",
+            detail=f"in order:{order_id} not found order_product:{order_product_id}",
         )
-    order.total_price -= order_product.total_price
-    await session.delete(order_product)
+    order = await _lock_order_for_change(
+        session, order_id, -order_product.total_price
+    )
+
+    await update_daily_stats(
+        session, order.created_date, orders_amount=-order_product.total_price
+    )
+    # Снимаем резерв строки по журналу заказа: не больше, чем за ним числится
+    release = Counter()
+    for elem in order_product.materials:
+        release[elem.material_id] += elem.budged_usage
+    await release_order_materials(session, order_id, release)
     await session.commit()
-    return {"Message": "order_product deleted!"}
\ No newline at end of file
+    return {"Message": "order_product deleted!"}
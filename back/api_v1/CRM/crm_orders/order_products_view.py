@@ -1,9 +1,12 @@
-from fastapi import APIRouter, status
+from typing import Annotated
+
+from fastapi import APIRouter, Body, status
 from pydantic import NonNegativeInt
 
 from api_v1.CRM.crm_orders.orders_schemas import OrderItemCreate
 from api_v1.CRM.crm_orders.order_products_services import (
     create_order_product_service,
+    create_order_products_bulk_service,
     order_product_count_change_service,
     order_product_delete_service,
 )
@@ -23,6 +26,21 @@ async def create_order_product(
     return res
 
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def create_order_products_bulk(
+    session: SessionDepPG,
+    order_id: str,
+    new_order_products: Annotated[
+        list[OrderItemCreate], Body(min_length=1, max_length=500)
+    ],
+):
+    res = await create_order_products_bulk_service(
+        session=session, order_id=order_id, new_order_products=new_order_products
+    )
+
+    return res
+
+
 @router.patch("/{order_product_id}")
 async def change_product_qty(
     session: SessionDepPG,
@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date
+
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, case, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.CRM.crm_materials.material_stock_service import movement, record_movements
+from api_v1.CRM.crm_orders.order_CRUD import CLOSED_STATUSES
+from api_v1.CRM.crm_orders.orders_schemas import (
+    RepricedOrderSchema,
+    RepriceReportSchema,
+)
+from api_v1.CRM.crm_products.product_CRUD import get_product
+from api_v1.CRM.statistics.daily_stats_service import update_daily_stats_many
+from core.models import (
+    MovementKind,
+    Order,
+    OrderProductMaterial,
+    OrderProductModel,
+)
+from core.models.product_price_table import PriceTable, invalidate_price_table
+
+# Заказов на одну транзакцию: блокировки строк orders держатся недолго
+REPRICE_CHUNK_SIZE = 500
+
+
+def price_case(table: PriceTable, quantity):
+    """SQL-выражение цены по количеству: то же, что PriceTable.price_for."""
+    whens = [
+        (quantity.between(start, end), price)
+        for start, end, price in zip(table.starts, table.ends, table.prices)
+    ]
+    if table.min_start is not None:
+        whens.append((quantity < table.min_start, table.below_price))
+    if not whens:
+        return literal(table.other_price)
+    return case(*whens, else_=table.other_price)
+
+
+def usage_case(qty_prod_in_mat, quantity):
+    """SQL-выражение materials_count: целочисленное деление с округлением вверх."""
+    return case(
+        (qty_prod_in_mat >= quantity, 1),
+        else_=(quantity + qty_prod_in_mat - 1) // qty_prod_in_mat,
+    )
+
+
+async def _open_order_ids(
+    session: AsyncSession, product_id: str, after: str | None, limit: int
+) -> list[str]:
+    stmt = (
+        select(OrderProductModel.order_id)
+        .join(Order, Order.id == OrderProductModel.order_id)
+        .where(
+            OrderProductModel.product_id == product_id,
+            Order.status.not_in(CLOSED_STATUSES),
+        )
+        .group_by(OrderProductModel.order_id)
+        .order_by(OrderProductModel.order_id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(OrderProductModel.order_id > after)
+    return list((await session.scalars(stmt)).all())
+
+
+async def _reprice_chunk(
+    session: AsyncSession,
+    product_id: str,
+    table: PriceTable,
+    bom: dict[str, int],
+    order_ids: list[str],
+) -> list[tuple[str, int, int, int]]:
+    """
+    Пересчитывает строки продукта в заказах чанка по таблице цен и нормам
+    bom (material_id -> сколько продуктов из единицы материала). Меняются
+    только уже существующие материалы строк из bom: строки не добавляются и
+    не удаляются. Сначала блокирует заказы (как сервисы строк заказа), затем
+    считает дельты SELECT'ами и применяет их тремя UPDATE: orders, строки,
+    материалы строк.
+    Возвращает (order_id, строк с новой ценой, дельта в тийинах, материалов).
+    """
+    created = dict(
+        (
+            await session.execute(
+                select(Order.id, Order.created_date)
+                .where(Order.id.in_(order_ids), Order.status.not_in(CLOSED_STATUSES))
+                # Блокировки берутся в порядке выдачи строк: без ORDER BY он
+                # зависит от плана, а с переносом цены материала нужен общий
+                .order_by(Order.id)
+                .with_for_update()
+            )
+        ).all()
+    )
+    if not created:
+        return []
+
+    # id чанка подставляются в текст запроса: для подготовленного выражения
+    # с сотнями параметров Postgres с шестого вызова берет общий план, в разы
+    # медленнее
+    locked_ids = bindparam(
+        "locked_ids", list(created), expanding=True, literal_execute=True
+    )
+    line_filter = (
+        OrderProductModel.product_id == product_id,
+        OrderProductModel.order_id.in_(locked_ids),
+    )
+    new_price = price_case(table, OrderProductModel.quantity)
+
+    price_deltas = {
+        order_id: (lines, amount)
+        for order_id, lines, amount in await session.execute(
+            select(
+                OrderProductModel.order_id,
+                func.count(),
+                func.sum(
+                    (new_price - OrderProductModel.product_price)
+                    * OrderProductModel.quantity
+                ),
+            )
+            .where(*line_filter, OrderProductModel.product_price != new_price)
+            .group_by(OrderProductModel.order_id)
+        )
+    }
+
+    material_deltas: dict[str, dict[str, int]] = defaultdict(dict)
+    materials_changed: dict[str, int] = defaultdict(int)
+    material_values = {}
+    material_filter = ()
+    if bom:
+        # UPDATE ... FROM строк заказа: количество берется join'ом, не подзапросом
+        new_qty = case(bom, value=OrderProductMaterial.material_id)
+        new_budget = usage_case(new_qty, OrderProductModel.quantity)
+        material_filter = (
+            OrderProductMaterial.order_product_id == OrderProductModel.id,
+            *line_filter,
+            OrderProductMaterial.material_id.in_(list(bom)),
+            (OrderProductMaterial.qty_prod_in_mat != new_qty)
+            | (OrderProductMaterial.budged_usage != new_budget),
+        )
+        changed_usage = (
+            select(
+                OrderProductModel.order_id,
+                OrderProductMaterial.material_id,
+                func.count(),
+                func.sum(new_budget - OrderProductMaterial.budged_usage),
+            )
+            .where(*material_filter)
+            .group_by(OrderProductModel.order_id, OrderProductMaterial.material_id)
+        )
+        for order_id, material_id, rows, diff in await session.execute(changed_usage):
+            material_deltas[order_id][material_id] = diff
+            materials_changed[order_id] += rows
+        material_values = {
+            "qty_prod_in_mat": new_qty,
+            "budged_usage": new_budget,
+            # Фактический расход, который не правили вручную, идет за плановым
+            "actual_usage": case(
+                (
+                    OrderProductMaterial.actual_usage
+                    == OrderProductMaterial.budged_usage,
+                    new_budget,
+                ),
+                else_=OrderProductMaterial.actual_usage,
+            ),
+        }
+
+    changed = sorted(set(price_deltas) | set(materials_changed))
+    if not changed:
+        return []
+
+    order_deltas = (
+        select(
+            OrderProductModel.order_id,
+            func.sum(
+                (new_price - OrderProductModel.product_price)
+                * OrderProductModel.quantity
+            ).label("amount"),
+        )
+        .where(*line_filter)
+        .group_by(OrderProductModel.order_id)
+        .subquery()
+    )
+    await session.execute(
+        update(Order)
+        .where(
+            Order.id == order_deltas.c.order_id,
+            Order.id.in_(
+                bindparam("changed_ids", changed, expanding=True, literal_execute=True)
+            ),
+        )
+        .values(
+            total_price=Order.total_price + order_deltas.c.amount,
+            version=Order.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if price_deltas:
+        await session.execute(
+            update(OrderProductModel)
+            .where(*line_filter, OrderProductModel.product_price != new_price)
+            .values(product_price=new_price)
+            .execution_options(synchronize_session=False)
+        )
+    if materials_changed:
+        await session.execute(
+            update(OrderProductMaterial)
+            .where(*material_filter)
+            .values(**material_values)
+            .execution_options(synchronize_session=False)
+        )
+
+    # Резерв склада и daily_stats меняются на разницу, как при правке строки
+    await record_movements(
+        session,
+        [
+            movement(
+                material_id,
+                MovementKind.RESERVATION if diff > 0 else MovementKind.RELEASE,
+                abs(diff),
+                order_id,
+            )
+            for order_id, diffs in material_deltas.items()
+            for material_id, diff in diffs.items()
+        ],
+    )
+    by_day: dict[date, int] = defaultdict(int)
+    for order_id, (_, amount) in price_deltas.items():
+        by_day[created[order_id].date()] += amount
+    await update_daily_stats_many(session, "orders_amount", by_day)
+
+    return [
+        (order_id, *price_deltas.get(order_id, (0, 0)), materials_changed[order_id])
+        for order_id in changed
+    ]
+
+
+async def reprice_open_orders_service(
+    session: AsyncSession,
+    product_id: str,
+    dry_run: bool = False,
+    chunk_size: int = REPRICE_CHUNK_SIZE,
+) -> RepriceReportSchema:
+    """
+    Пересчитывает открытые заказы с продуктом после изменения тиров цены или
+    нормы расхода материала: product_price строк по текущим тирам,
+    qty_prod_in_mat и budged_usage материалов, total_price заказов, резерв
+    склада и daily_stats. Материал, добавленный в состав продукта или
+    удаленный из него, в строках открытых заказов не появляется и не
+    пропадает: новый состав строка получает, если ее удалить и добавить заново.
+    Заказы идут чанками по chunk_size, каждый чанк — своя транзакция;
+    dry_run считает то же самое и откатывает.
+    """
+    product = await get_product(session=session, product_id=product_id)
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with id:'{product_id}' not found!",
+        )
+    # Откат dry_run сбрасывает загруженный продукт: тиры и состав берем заранее
+    invalidate_price_table(product_id)
+    table = product.price_table
+    bom = {
+        detail.material_id: detail.quantity_in_one_mat_unit
+        for detail in product.material_detail
+    }
+
+    checked = 0
+    changed: list[tuple[str, int, int, int]] = []
+    last_id = None
+    while order_ids := await _open_order_ids(session, product_id, last_id, chunk_size):
+        last_id = order_ids[-1]
+        checked += len(order_ids)
+        changed.extend(
+            await _reprice_chunk(session, product_id, table, bom, order_ids)
+        )
+        if dry_run:
+            await session.rollback()
+        else:
+            await session.commit()
+
+    return RepriceReportSchema(
+        product_id=product_id,
+        dry_run=dry_run,
+        orders_checked=checked,
+        orders_changed=len(changed),
+        lines_repriced=sum(lines for _, lines, _, _ in changed),
+        materials_changed=sum(materials for _, _, _, materials in changed),
+        amount_delta=sum(amount for _, _, amount, _ in changed),
+        orders=[
+            RepricedOrderSchema(
+                order_id=order_id,
+                lines_repriced=lines,
+                amount_delta=amount,
+                materials_changed=materials,
+            )
+            for order_id, lines, amount, materials in changed
+        ],
+    )
+
+
+async def main():
+    from core.postgres_db import pg_session_factory
+
+    parser = argparse.ArgumentParser(
+        description="Пересчет открытых заказов по текущим тирам и нормам расхода продукта"
+    )
+    parser.add_argument("product_id")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--chunk", type=int, default=REPRICE_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    async with pg_session_factory() as session:
+        report = await reprice_open_orders_service(
+            session=session,
+            product_id=args.product_id,
+            dry_run=args.dry_run,
+            chunk_size=args.chunk,
+        )
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,8 +3,74 @@ from typing import Optional, List
 
 from pydantic import BaseModel, Field, PositiveInt, field_validator, NonNegativeInt
 
+from api_v1.utils.projection import (
+    Projection,
+    ProjectionQuerySchema,
+    Shape,
+    ShapeField,
+)
 from core.models import Order
-from core.models import OrderProductModel
+from core.models import OrderProductModel, OrderProductMaterial
+
+
+def _to_sum(price: int | None) -> int | None:
+    """Тийины -> сумы так же, как валидаторы схем ниже."""
+    if price is None:
+        return None
+    return int(price / 100)
+
+
+ORDER_SHAPE = Shape(
+    model=Order,
+    fields={
+        "id": ShapeField("id"),
+        "status": ShapeField("status"),
+        "total_price": ShapeField("total_price", _to_sum),
+        "materials_price": ShapeField("materials_price", _to_sum),
+        "customer": ShapeField("customer"),
+        "descriptions": ShapeField("descriptions"),
+        "created_date": ShapeField("created_date"),
+        "hiring_date": ShapeField("hiring_date"),
+        "ready_date": ShapeField("ready_date"),
+        "completed_date": ShapeField("completed_date"),
+        "canceled_date": ShapeField("canceled_date"),
+        "paid": ShapeField("paid", _to_sum),
+        "version": ShapeField("version"),
+        "client_id": ShapeField("client_id"),
+        "user_id": ShapeField("user_id"),
+    },
+    relations={
+        "products_detail": (Order.products_detail, OrderProductModel.product),
+        "products_detail.materials": (
+            OrderProductModel.materials,
+            OrderProductMaterial.material,
+        ),
+        "costs": (Order.costs,),
+    },
+    required=("id", "created_date", "version"),
+)
+
+ORDER_SUMMARY_SHAPE = Shape(
+    model=Order,
+    fields={
+        name: ORDER_SHAPE.fields[name]
+        for name in (
+            "id",
+            "status",
+            "customer",
+            "total_price",
+            "materials_price",
+            "paid",
+            "created_date",
+            "hiring_date",
+            "ready_date",
+            "completed_date",
+            "canceled_date",
+            "version",
+        )
+    },
+    required=("id", "created_date"),
+)
 
 
 class CreateOrderAdditionalCoastSchema(BaseModel):
@@ -137,6 +203,7 @@ class OrderSchema(BaseModel):
     completed_date: Optional[datetime] = None
     canceled_date: Optional[datetime] = None
     paid: int | float
+    version: int = 1
 
     client_id: Optional[str] = None
     user_id: Optional[str] = None
@@ -224,16 +291,116 @@ class OrderSchema(BaseModel):
             paid=order.paid,
             total_price=order.total_price,
             materials_price=order.materials_price,
+            version=order.version,
             products_detail=products_detail,
             client_id=order.client_id,
             user_id=order.user_id,
             costs=costs,
         )
 
+    @staticmethod
+    def dump_orm(order: Order, projection: Projection | None = None) -> dict:
+        """
+        Быстрый путь для чтения: тот же JSON, что from_orm_with_rels + model_dump,
+        но обычными dict без валидаторов pydantic на каждое поле. С проекцией —
+        только запрошенные поля и раскрытые связи.
+        """
+        if projection is None:
+            projection = ORDER_SHAPE.full
+
+        item = ORDER_SHAPE.dump(order, projection)
+        if projection.expanded("products_detail"):
+            with_materials = projection.expanded("products_detail.materials")
+            item["products_detail"] = [
+                _dump_order_line(detail, with_materials)
+                for detail in order.products_detail
+            ]
+        if projection.expanded("costs"):
+            item["costs"] = [
+                {
+                    "id": cost.id,
+                    "order_id": cost.order_id,
+                    "cost": _to_sum(cost.cost),
+                    "description": cost.description,
+                }
+                for cost in order.costs
+            ]
+        return item
+
+
+def _dump_order_line(detail: OrderProductModel, with_materials: bool) -> dict:
+    product = detail.product
+    line = {
+        "id": detail.id,
+        "order_id": detail.order_id,
+        "product_id": None,
+        "product_name": (product.name if product is not None else "Удален").capitalize(),
+        "product_size": product.size if product is not None else "Неизвестно",
+        "product_detail": product.detail if product is not None else "Неизвестно",
+        "product_price": _to_sum(detail.product_price),
+        "quantity": detail.quantity,
+    }
+    if with_materials:
+        line["materials"] = [
+            {
+                "id": mat.id,
+                "order_product_id": mat.order_product_id,
+                "material_id": None,
+                "material_name": (
+                    mat.material.name if mat.material is not None else "Материал удален"
+                ).capitalize(),
+                "material_type": (
+                    mat.material.material_type
+                    if mat.material is not None
+                    else "Неизвестно"
+                ),
+                "qty_prod_in_mat": mat.qty_prod_in_mat,
+                "budged_usage": mat.budged_usage,
+                "actual_usage": mat.actual_usage,
+                "material_price": _to_sum(mat.material_price),
+            }
+            for mat in detail.materials
+        ]
+    return line
+
+
+class OrderSummarySchema(BaseModel):
+    id: str
+    status: int
+    customer: Optional[str] = None
+    total_price: int
+    materials_price: int
+    paid: int
+    created_date: datetime
+    hiring_date: Optional[datetime] = None
+    ready_date: Optional[datetime] = None
+    completed_date: Optional[datetime] = None
+    canceled_date: Optional[datetime] = None
+    version: int = 1
+
+    model_config = {"from_attributes": True}
+
+    @field_validator("total_price", "materials_price", "paid")
+    @classmethod
+    def convert_to_sum(cls, price):
+        if price is None:
+            return None
+        return int(price / 100)
+
+    @staticmethod
+    def dump_rows(rows, projection: Projection | None = None) -> list[dict]:
+        """Строки select(*ORDER_SUMMARY_SHAPE.columns(...)) в dict, деньги в сумах."""
+        if projection is None:
+            projection = ORDER_SUMMARY_SHAPE.full
+        return [ORDER_SUMMARY_SHAPE.dump(row, projection) for row in rows]
 
-class OrderFilterSchema(BaseModel):
+
+class OrderFilterSchema(ProjectionQuerySchema):
     skip: Optional[int] = Field(0, ge=0, description="Пропустить записей")
     limit: Optional[int] = Field(12, ge=1, le=1000, description="Лимит на страницу")
+    cursor: Optional[str] = Field(
+        None, description="Курсор следующей страницы (created_date, id)"
+    )
 
     # Фильтры по датам
     created_date_from: Optional[date] = Field(None, description="Дата создания от")
@@ -254,3 +421,31 @@ class OrderFilterSchema(BaseModel):
 class OrderAppendMaterialsSchema(BaseModel):
     id: NonNegativeInt
     actual_usage: int = Field(ge=0, description="Фактический расход материала")
+
+
+class RepricedOrderSchema(BaseModel):
+    order_id: str
+    lines_repriced: int = Field(description="Строк с новой ценой")
+    materials_changed: int = Field(description="Материалов с новым плановым расходом")
+    amount_delta: int = Field(description="Изменение суммы заказа, сум")
+
+    @field_validator("amount_delta")
+    @classmethod
+    def convert_to_sum(cls, price):
+        return int(price / 100)
+
+
+class RepriceReportSchema(BaseModel):
+    product_id: str
+    dry_run: bool
+    orders_checked: int = Field(description="Открытых заказов с продуктом")
+    orders_changed: int
+    lines_repriced: int
+    materials_changed: int
+    amount_delta: int = Field(description="Изменение суммы всех заказов, сум")
+    orders: list[RepricedOrderSchema]
+
+    @field_validator("amount_delta")
+    @classmethod
+    def convert_to_sum(cls, price):
+        return int(price / 100)
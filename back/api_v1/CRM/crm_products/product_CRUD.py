@@ -36,3 +36,18 @@ async def get_product(session: AsyncSession, product_id) -> Product:
     product: Product | None = result.scalars().one_or_none()
 
     return product
+
+
+async def get_products_by_ids(session: AsyncSession, product_ids) -> list[Product]:
+    stmt = (
+        select(Product)
+        .options(
+            selectinload(Product.material_detail).selectinload(
+                ProductMaterialModel.material
+            ),
+            selectinload(Product.price_tier),
+        )
+        .where(Product.id.in_(product_ids))
+    )
+    result: Result = await session.execute(stmt)
+    return list(result.scalars().all())
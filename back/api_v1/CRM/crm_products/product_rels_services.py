@@ -19,6 +19,7 @@ from api_v1.CRM.crm_products.product_rels_schemas import (
     ProductPriceUpdateSchema,
 )
 from core.models import ProductMaterialModel, Material, Product, ProductPriceTier
+from core.models.product_price_table import invalidate_price_table
 
 
 async def create_product_material_service(
@@ -114,6 +115,7 @@ async def create_product_price_service(
         session=session, product_id=product_id, **price_data.model_dump()
     )
     await session.commit()
+    invalidate_price_table(product_id)
 
 
 async def update_product_price_service(
@@ -133,6 +135,7 @@ async def update_product_price_service(
         session=session, product_price=product_price, **update_data.model_dump()
     )
     await session.commit()
+    invalidate_price_table(product_price.product_id)
 
 
 async def delete_product_price_service(session: AsyncSession, price_id: int):
@@ -148,3 +151,4 @@ async def delete_product_price_service(session: AsyncSession, price_id: int):
 
     await session.delete(product_price)
     await session.commit()
+    invalidate_price_table(product_price.product_id)
@@ -8,6 +8,8 @@ from api_v1.CRM.crm_products.product_rels_schemas import (
     ProductPriceCreateSchema,
     ProductPriceUpdateSchema,
 )
+from api_v1.CRM.crm_orders.order_reprice_service import reprice_open_orders_service
+from api_v1.CRM.crm_orders.orders_schemas import RepriceReportSchema
 from core.postgres_db import SessionDepPG
 
 from api_v1.CRM.crm_products.product_rels_services import (
@@ -85,3 +87,17 @@ async def crm_product_material_delete(
     price_id: int,
 ):
     await delete_product_price_service(session=session, price_id=price_id)
+
+
+@router.post("/reprice/{product_id}", response_model=RepriceReportSchema)
+async def crm_product_reprice_orders(
+    session: SessionDepPG, product_id: str, dry_run: bool = False
+):
+    """
+    Пересчет открытых заказов с продуктом по текущим тирам и норме расхода
+    материалов состава. Материалы, добавленные в состав или удаленные из него,
+    в строки открытых заказов не переносятся.
+    """
+    return await reprice_open_orders_service(
+        session=session, product_id=product_id, dry_run=dry_run
+    )
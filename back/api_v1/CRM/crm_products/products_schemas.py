@@ -9,7 +9,31 @@ from pydantic import (
     ConfigDict,
 )
 
-from core.models import Product
+from api_v1.utils.projection import (
+    Projection,
+    ProjectionQuerySchema,
+    Shape,
+    ShapeField,
+)
+from core.models import Product, ProductMaterialModel
+
+
+PRODUCT_SHAPE = Shape(
+    model=Product,
+    fields={
+        "id": ShapeField("id"),
+        "name": ShapeField("name", str.capitalize),
+        "size": ShapeField("size"),
+        "detail": ShapeField("detail"),
+        "description": ShapeField("description"),
+        "create_at": ShapeField("create_at"),
+        "status": ShapeField("status"),
+    },
+    relations={
+        "material_detail": (Product.material_detail, ProductMaterialModel.material),
+        "price_tier": (Product.price_tier,),
+    },
+)
 
 
 class ProductPriceItemSchema(BaseModel):
@@ -27,6 +51,17 @@ class ProductPriceItemSchema(BaseModel):
         return price / 100
 
 
+class ProductQuoteSchema(BaseModel):
+    quantity: int
+    price: int | float = Field(..., description="Цена за единицу")
+    total: int | float = Field(..., description="Сумма за количество")
+
+    @field_validator("price", "total")
+    @classmethod
+    def convert_price_to_sum(cls, price):
+        return price / 100
+
+
 class ProductCreateSchema(BaseModel):
     name: str = Field(
         ...,
@@ -144,8 +179,41 @@ class ProductSchema(BaseModel):
             price_tier=price_tier,
         )
 
-
-class ProductFilterSchema(BaseModel):
+    @staticmethod
+    def dump_orm(product: Product, projection: Projection | None = None) -> dict:
+        """Тот же JSON, что from_orm_with_materials, но без моделей pydantic."""
+        if projection is None:
+            projection = PRODUCT_SHAPE.full
+
+        item = PRODUCT_SHAPE.dump(product, projection)
+        if projection.expanded("material_detail"):
+            item["material_detail"] = [
+                {
+                    "id": detail.id,
+                    "material_name": detail.material.name.capitalize(),
+                    "material_type": detail.material.material_type.capitalize(),
+                    "material_detail": detail.material.detail,
+                    "product_id": detail.product_id,
+                    "material_id": detail.material_id,
+                    "quantity_in_one_mat_unit": detail.quantity_in_one_mat_unit,
+                }
+                for detail in product.material_detail
+            ]
+        if projection.expanded("price_tier"):
+            item["price_tier"] = [
+                {
+                    "id": price.id,
+                    "start": price.start,
+                    "end": price.end,
+                    "price": price.price / 100 if price.price is not None else None,
+                    "description": price.description,
+                }
+                for price in sorted(product.price_tier, key=lambda x: x.start)
+            ]
+        return item
+
+
+class ProductFilterSchema(ProjectionQuerySchema):
     # Пагинация
     skip: Optional[int] = Field(0, ge=0, description="Пропустить записей")
     limit: Optional[int] = Field(12, ge=1, le=1000, description="Лимит на страницу")
@@ -1,18 +1,24 @@
 from fastapi import HTTPException, status
-from sqlalchemy import select, Result, func, or_
+from sqlalchemy import select, Result
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from api_v1.utils.pagination import fetch_page
+from api_v1.CRM.crm_search.search_index import search_index
+from api_v1.utils.projection import ProjectionQuerySchema
+from api_v1.utils.search import normalize_search, search_clause
 from api_v1.CRM.crm_products.product_CRUD import create_product, get_product
 from api_v1.CRM.crm_products.product_rels_CRUD import create_product_price
 from api_v1.CRM.crm_products.products_schemas import (
+    PRODUCT_SHAPE,
     ProductCreateSchema,
     ProductSchema,
     ProductFilterSchema,
     ProductPartialUpdateSchema,
+    ProductQuoteSchema,
 )
-from core.models.association_product_material import ProductMaterialModel
 from core.models.model_products import Product
+from core.models.product_price_table import invalidate_price_table
 
 
 async def create_product_service(
@@ -42,13 +48,14 @@ async def create_product_service(
     )
 
     await session.commit()
+    search_index.add_product(product)
     await session.refresh(product, ["material_detail"])
     return ProductSchema.from_orm_with_materials(product)
 
 
 async def get_products_service(
         session: AsyncSession, filters: ProductFilterSchema
-) -> tuple[list[ProductSchema], int]:
+) -> tuple[list[dict], int]:
     sort_filters = {
         "name": Product.name,
         "size": Product.size,
@@ -57,13 +64,9 @@ async def get_products_service(
 
     sort_field = sort_filters.get(filters.sort_by, Product.id)
 
-    # 1. Сначала создаем БАЗОВЫЙ запрос с фильтрами
-    base_stmt = select(Product).options(
-        selectinload(Product.material_detail).selectinload(
-            ProductMaterialModel.material
-        ),
-        selectinload(Product.price_tier),
-    )
+    # 1. Сначала создаем БАЗОВЫЙ запрос с фильтрами, колонки и связи по fields/expand
+    projection = PRODUCT_SHAPE.parse(filters.fields, filters.expand)
+    base_stmt = select(Product).options(*PRODUCT_SHAPE.load_options(projection))
 
     if filters.type:
         print(filters.type)
@@ -72,40 +75,31 @@ async def get_products_service(
     if filters.name:
         base_stmt = base_stmt.where(Product.name == filters.name)
 
-    if filters.search:
-        base_stmt = base_stmt.where(
-            or_(
-                Product.name.ilike(f"%{filters.search}%"),
-                Product.name.ilike(f"%{filters.search.replace('е', 'ё')}%"),
-                Product.name.ilike(f"%{filters.search.replace('ё', 'е')}%"),
-                Product.size.ilike(f"%{filters.search}%"),
-                Product.size.ilike(f"%{filters.search.replace('е', 'ё')}%"),
-                Product.size.ilike(f"%{filters.search.replace('ё', 'е')}%"),
-            )
-        )
-
-    # 2. Запрос для подсчета total (только фильтры, без сортировки и пагинации)
-    count_stmt = select(func.count()).select_from(base_stmt.subquery())
-    total: int = await session.scalar(count_stmt)
+    # Поиск по нормализованной search_text (триграммный индекс / FTS5)
+    rank = None
+    if normalize_search(filters.search):
+        predicate, rank = search_clause(session, Product, filters.search)
+        base_stmt = base_stmt.where(predicate)
 
-    # 3. Основной запрос с фильтрами, сортировкой и пагинацией
-    stmt = base_stmt.options(selectinload(Product.material_detail))
+    # 2. Сортировка: при поиске сначала по релевантности
+    if rank is not None:
+        base_stmt = base_stmt.order_by(rank.desc())
 
-    # Сортировка
     if filters.sort_order == "desc":
-        stmt = stmt.order_by(sort_field.desc())
+        stmt = base_stmt.order_by(sort_field.desc(), Product.id)
     else:
-        stmt = stmt.order_by(sort_field.asc())
-
-    # Пагинация
-    stmt = stmt.offset(filters.skip).limit(filters.limit)
-
-    # Выполнение
-    result = await session.execute(stmt)
-    products = [
-        ProductSchema.from_orm_with_materials(product)
-        for product in result.scalars().all()
-    ]
+        stmt = base_stmt.order_by(sort_field.asc(), Product.id)
+
+    # 3. Страница и total одним запросом
+    unfiltered = not (filters.type or filters.name or filters.search)
+    rows, total, _, _ = await fetch_page(
+        session,
+        stmt,
+        filters.skip,
+        filters.limit,
+        estimate_model=Product if unfiltered else None,
+    )
+    products = [ProductSchema.dump_orm(row[0], projection) for row in rows]
 
     return products, total
 
@@ -113,7 +107,32 @@ async def get_products_service(
 async def get_product_by_id_service(
         session: AsyncSession,
         product_id: str,
-) -> ProductSchema:
+        projection: ProjectionQuerySchema | None = None,
+) -> dict:
+    shape = (
+        PRODUCT_SHAPE.full
+        if projection is None
+        else PRODUCT_SHAPE.parse(projection.fields, projection.expand)
+    )
+    product: Product | None = await session.scalar(
+        select(Product)
+        .options(*PRODUCT_SHAPE.load_options(shape))
+        .where(Product.id == product_id)
+    )
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with id:'{product_id}' not found",
+        )
+
+    return ProductSchema.dump_orm(product, shape)
+
+
+async def quote_product_service(
+        session: AsyncSession,
+        product_id: str,
+        quantities: list[int],
+) -> list[ProductQuoteSchema]:
     product: Product = await get_product(session=session, product_id=product_id)
     if product is None:
         raise HTTPException(
@@ -121,7 +140,11 @@ async def get_product_by_id_service(
             detail=f"Product with id:'{product_id}' not found",
         )
 
-    return ProductSchema.from_orm_with_materials(product)
+    prices = product.price_for_quantities(quantities)
+    return [
+        ProductQuoteSchema(quantity=quantity, price=price, total=price * quantity)
+        for quantity, price in zip(quantities, prices)
+    ]
 
 
 async def update_product_partial_service(
@@ -149,6 +172,7 @@ async def update_product_partial_service(
         setattr(product, key, value)
 
     await session.commit()
+    search_index.add_product(product)
     await session.refresh(product)
     return ProductSchema.from_orm_with_materials(product)
 
@@ -173,6 +197,8 @@ async def delete_product_service(session: AsyncSession, product_id: str):
 
     await session.delete(product)
     await session.commit()
+    search_index.remove("product", product_id)
+    invalidate_price_table(product_id)
 
     return {"message": f"Product '{product_id}' and all related data deleted"}
 
@@ -215,6 +241,7 @@ async def copy_product_service(session: AsyncSession, product_id: str):
         )
 
     await session.commit()
+    search_index.add_product(product_copy)
     await session.refresh(product_copy, ["price_tier"])
 
     return ProductSchema.from_orm_with_materials(product_copy)
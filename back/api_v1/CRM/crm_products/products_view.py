@@ -1,10 +1,14 @@
-from fastapi import APIRouter, status, Depends
+from typing import Annotated
+
+from fastapi import APIRouter, status, Depends, Query
+from fastapi.responses import ORJSONResponse
 
 from api_v1.CRM.crm_products.products_schemas import (
     ProductCreateSchema,
     ProductSchema,
     ProductFilterSchema,
     ProductPartialUpdateSchema,
+    ProductQuoteSchema,
 )
 from api_v1.CRM.crm_products.products_services import (
     create_product_service,
@@ -13,9 +17,11 @@ from api_v1.CRM.crm_products.products_services import (
     update_product_partial_service,
     delete_product_service,
     copy_product_service,
+    quote_product_service,
 )
-from core.ResponseModel.response_model import PaginatedResponse
-from core.postgres_db import SessionDepPG
+from api_v1.utils.projection import ProjectionQuerySchema
+from core.ResponseModel.response_model import PaginatedResponse, paginated_json
+from core.postgres_db import SessionDepPG, SessionDepRead
 
 router = APIRouter(prefix="/products")
 
@@ -32,13 +38,13 @@ async def crm_create_product(
 
 @router.get("/", response_model=PaginatedResponse[ProductSchema])
 async def crm_get_products(
-        session: SessionDepPG, filters: ProductFilterSchema = Depends()
-) -> PaginatedResponse:
-    products: tuple[list[ProductSchema], int] = await get_products_service(
+        session: SessionDepRead, filters: ProductFilterSchema = Depends()
+) -> ORJSONResponse:
+    products: tuple[list[dict], int] = await get_products_service(
         session=session, filters=filters
     )
 
-    return PaginatedResponse(
+    return paginated_json(
         items=products[0],
         total=products[-1],
         skip=filters.skip,
@@ -49,12 +55,26 @@ async def crm_get_products(
 
 @router.get("/{product_id}", response_model=ProductSchema)
 async def crm_get_product_by_id(
-        session: SessionDepPG, product_id: str
-) -> ProductSchema:
-    product: ProductSchema = await get_product_by_id_service(
-        session=session, product_id=product_id
+        session: SessionDepRead,
+        product_id: str,
+        projection: ProjectionQuerySchema = Depends(),
+) -> ORJSONResponse:
+    product: dict = await get_product_by_id_service(
+        session=session, product_id=product_id, projection=projection
     )
-    return product
+    return ORJSONResponse(product)
+
+
+@router.get("/{product_id}/quote", response_model=list[ProductQuoteSchema])
+async def crm_quote_product(
+        session: SessionDepRead,
+        product_id: str,
+        quantities: Annotated[list[int], Query(min_length=1, max_length=1000)],
+) -> list[ProductQuoteSchema]:
+    quote: list[ProductQuoteSchema] = await quote_product_service(
+        session=session, product_id=product_id, quantities=quantities
+    )
+    return quote
 
 
 @router.patch("/{product_id}")
@@ -0,0 +1,181 @@
+import heapq
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.utils.search import normalize_search
+from core.models import Material, Order, Product
+
+_TOKEN = re.compile(r"\w+")
+
+# До такого числа кандидатов остальные префиксы проверяются перебором
+FILTER_THRESHOLD = 2000
+# Кэш результатов коротких префиксов (type-ahead повторяет их), сбрасывается записью
+PREFIX_CACHE_SIZE = 256
+
+
+def tokenize(value: str | None) -> list[str]:
+    return _TOKEN.findall(normalize_search(value))
+
+
+@dataclass(slots=True)
+class SearchDocument:
+    kind: str
+    id: str
+    title: str
+    subtitle: str | None
+    tokens: frozenset[str]
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс в памяти процесса: токен -> ключи документов.
+    Префиксы ищутся бинарным поиском по отсортированному словарю токенов.
+    """
+
+    def __init__(self):
+        self._docs: dict[tuple[str, str], SearchDocument] = {}
+        self._postings: dict[str, set[tuple[str, str]]] = {}
+        self._vocabulary: list[str] = []
+        self._vocabulary_dirty = False
+        self._prefix_cache: dict[str, frozenset[tuple[str, str]]] = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def clear(self):
+        self._docs.clear()
+        self._postings.clear()
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self._prefix_cache.clear()
+
+    def upsert(self, kind: str, doc_id: str, title: str, subtitle: str | None, *texts):
+        self.remove(kind, doc_id)
+        self._prefix_cache.clear()
+
+        tokens = frozenset(
+            token for text in (doc_id, title, subtitle, *texts) for token in tokenize(text)
+        )
+        key = (kind, doc_id)
+        self._docs[key] = SearchDocument(kind, doc_id, title, subtitle, tokens)
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                self._vocabulary_dirty = True
+            posting.add(key)
+
+    def remove(self, kind: str, doc_id: str):
+        doc = self._docs.pop((kind, doc_id), None)
+        if doc is None:
+            return
+        self._prefix_cache.clear()
+        for token in doc.tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.discard((kind, doc_id))
+            if not posting:
+                del self._postings[token]
+                self._vocabulary_dirty = True
+
+    def _prefix_matches(self, prefix: str) -> frozenset[tuple[str, str]]:
+        cached = self._prefix_cache.get(prefix)
+        if cached is not None:
+            return cached
+
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+
+        matches: set[tuple[str, str]] = set()
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary):
+            token = self._vocabulary[position]
+            if not token.startswith(prefix):
+                break
+            matches |= self._postings[token]
+            position += 1
+
+        if len(self._prefix_cache) >= PREFIX_CACHE_SIZE:
+            self._prefix_cache.clear()
+        self._prefix_cache[prefix] = frozenset(matches)
+        return self._prefix_cache[prefix]
+
+    def search(
+        self, query: str, limit: int = 20, kinds: set[str] | None = None
+    ) -> list[SearchDocument]:
+        """Все токены запроса должны совпасть как префиксы; точные совпадения выше."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        # Длинный префикс обычно самый избирательный: с него начинаем, а остальные
+        # проверяем по токенам уже найденных документов, если их немного
+        tokens.sort(key=len, reverse=True)
+        found = self._prefix_matches(tokens[0])
+        for prefix in tokens[1:]:
+            if not found:
+                return []
+            if len(found) <= FILTER_THRESHOLD:
+                found = {
+                    key
+                    for key in found
+                    if any(token.startswith(prefix) for token in self._docs[key].tokens)
+                }
+            else:
+                found = found & self._prefix_matches(prefix)
+
+        docs = (self._docs[key] for key in found if kinds is None or key[0] in kinds)
+        query_tokens = set(tokens)
+        return heapq.nsmallest(
+            limit,
+            docs,
+            key=lambda doc: (-len(query_tokens & doc.tokens), doc.title.lower()),
+        )
+
+    # Документы по сущностям
+
+    def add_order(self, order: Order):
+        self.upsert(
+            "order",
+            order.id,
+            order.customer or order.id,
+            order.descriptions,
+        )
+
+    def add_product(self, product: Product):
+        subtitle = " ".join(part for part in (product.size, product.detail) if part)
+        self.upsert("product", product.id, product.name, subtitle or None)
+
+    def add_material(self, material: Material):
+        self.upsert("material", material.id, material.name, material.detail)
+
+    async def build(self, session: AsyncSession):
+        """Полная загрузка индекса, вызывается при старте приложения."""
+        self.clear()
+
+        orders = await session.execute(
+            select(Order.id, Order.customer, Order.descriptions)
+        )
+        for order in orders:
+            self.add_order(order)
+
+        products = await session.execute(
+            select(Product.id, Product.name, Product.size, Product.detail)
+        )
+        for product in products:
+            self.add_product(product)
+
+        materials = await session.execute(
+            select(Material.id, Material.name, Material.detail)
+        )
+        for material in materials:
+            self.add_material(material)
+
+
+search_index = SearchIndex()
@@ -0,0 +1,18 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+SearchKind = Literal["order", "product", "material"]
+
+
+class SearchFilterSchema(BaseModel):
+    q: str = Field(..., min_length=1, description="Строка поиска (префиксы слов)")
+    kind: Optional[SearchKind] = Field(None, description="Искать только в одной сущности")
+    limit: int = Field(20, ge=1, le=100, description="Лимит результатов")
+
+
+class SearchResultSchema(BaseModel):
+    kind: SearchKind
+    id: str
+    title: str
+    subtitle: Optional[str] = None
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+
+from api_v1.CRM.crm_search.search_index import search_index
+from api_v1.CRM.crm_search.search_schemas import SearchFilterSchema, SearchResultSchema
+
+router = APIRouter(prefix="/search")
+
+
+@router.get("/", response_model=list[SearchResultSchema])
+async def crm_search(filters: SearchFilterSchema = Depends()):
+    docs = search_index.search(
+        filters.q,
+        limit=filters.limit,
+        kinds={filters.kind} if filters.kind else None,
+    )
+    return [
+        SearchResultSchema(
+            kind=doc.kind, id=doc.id, title=doc.title, subtitle=doc.subtitle
+        )
+        for doc in docs
+    ]
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+from datetime import date, datetime
+
+from sqlalchemy import delete, func, select, union_all, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.utils.dialect import upsert_insert
+from core.models import DailyStatsModel, Order, ExpenseModel
+
+STATS_COLUMNS = (
+    "orders_count",
+    "orders_amount",
+    "expenses_count",
+    "expenses_amount",
+    "materials_cost",
+)
+
+
+async def update_daily_stats(
+    session: AsyncSession,
+    day: date | datetime | None,
+    **deltas: int,
+):
+    """
+    Прибавляет дельты к строке daily_stats за день (upsert без чтения).
+    Вызывается в той же транзакции, что и изменение заказа или расхода.
+    """
+    if day is None:
+        return
+
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    if isinstance(day, datetime):
+        day = day.date()
+
+    insert = upsert_insert(session)
+    stmt = insert(DailyStatsModel).values(day=day, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStatsModel.day],
+        set_={
+            key: getattr(DailyStatsModel, key) + stmt.excluded[key] for key in deltas
+        },
+    )
+    await session.execute(stmt)
+
+
+async def update_daily_stats_many(
+    session: AsyncSession, column: str, deltas: dict[date, int]
+):
+    """Как update_daily_stats для одной колонки за много дней: один executemany."""
+    rows = [{"day": day, column: value} for day, value in deltas.items() if value]
+    if not rows:
+        return
+
+    insert = upsert_insert(session)
+    stmt = insert(DailyStatsModel)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStatsModel.day],
+        set_={column: getattr(DailyStatsModel, column) + stmt.excluded[column]},
+    )
+    await session.execute(stmt, rows)
+
+
+async def rebuild_daily_stats(
+    session: AsyncSession,
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> int:
+    """Пересчитывает daily_stats из orders и expenses за период (или целиком)."""
+    order_day = func.date(Order.created_date)
+    orders = select(
+        order_day.label("day"),
+        func.count().label("orders_count"),
+        func.sum(Order.total_price).label("orders_amount"),
+        literal(0).label("expenses_count"),
+        literal(0).label("expenses_amount"),
+        func.sum(Order.materials_price).label("materials_cost"),
+    ).group_by(order_day)
+
+    expense_day = ExpenseModel.actual_date
+    expenses = (
+        select(
+            expense_day.label("day"),
+            literal(0).label("orders_count"),
+            literal(0).label("orders_amount"),
+            func.count().label("expenses_count"),
+            func.sum(ExpenseModel.amount).label("expenses_amount"),
+            literal(0).label("materials_cost"),
+        )
+        .where(expense_day.is_not(None))
+        .group_by(expense_day)
+    )
+
+    stats_delete = delete(DailyStatsModel)
+
+    if date_from:
+        orders = orders.where(Order.created_date >= date_from)
+        expenses = expenses.where(expense_day >= date_from)
+        stats_delete = stats_delete.where(DailyStatsModel.day >= date_from)
+
+    if date_to:
+        orders = orders.where(order_day <= date_to)
+        expenses = expenses.where(expense_day <= date_to)
+        stats_delete = stats_delete.where(DailyStatsModel.day <= date_to)
+
+    combined = union_all(orders, expenses).subquery()
+    totals = select(
+        combined.c.day,
+        *(func.sum(combined.c[key]).label(key) for key in STATS_COLUMNS),
+    ).group_by(combined.c.day)
+
+    await session.execute(stats_delete)
+    result = await session.execute(
+        DailyStatsModel.__table__.insert().from_select(
+            ["day", *STATS_COLUMNS], totals
+        )
+    )
+    return result.rowcount
+
+
+async def main():
+    from core.postgres_db import pg_session_factory
+
+    parser = argparse.ArgumentParser(description="Пересчет таблицы daily_stats")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    async with pg_session_factory() as session:
+        rows = await rebuild_daily_stats(
+            session=session, date_from=args.date_from, date_to=args.date_to
+        )
+        await session.commit()
+    print(f"daily_stats rebuilt: {rows} days")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
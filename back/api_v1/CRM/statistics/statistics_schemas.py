@@ -35,3 +35,9 @@ class StatisticsSchema(BaseModel):
 class StatisticsFilterSchema(BaseModel):
     date: date
     statistics_type: Literal["orders", "expenses", "all"]
+
+
+class StatisticsGraphFilterSchema(BaseModel):
+    date_from: date
+    date_to: date
+    granularity: Literal["day", "week", "month", "quarter"] = Field("month")
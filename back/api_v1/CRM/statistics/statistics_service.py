@@ -1,14 +1,26 @@
-from datetime import date, datetime
-
-from sqlalchemy import func, select, Result
+from datetime import date, datetime, time, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    func,
+    or_,
+    select,
+    Result,
+    cast,
+    literal,
+    literal_column,
+    DateTime,
+    Interval,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api_v1.CRM.statistics.statistics_schemas import (
     StatisticsFilterSchema,
+    StatisticsGraphFilterSchema,
     StatisticsSchema,
 )
 from core.ResponseModel.response_model import PaginatedMonthStatistics
-from core.models import Order, ExpenseModel
+from core.models import DailyStatsModel
 
 
 async def crm_get_month_statistics(
@@ -20,8 +32,6 @@ async def crm_get_month_statistics(
     else:
         next_month = date(filters.date.year, filters.date.month + 1, 1)
 
-    items = list()
-
     totals = {
         "total_orders_count": 0,
         "total_expenses_count": 0,
@@ -29,135 +39,48 @@ async def crm_get_month_statistics(
         "total_expenses_amount": 0,
     }
 
-    orders_subq = (
-        select(
-            func.date(Order.created_date).label("date"),
-            func.sum(Order.total_price).label("orders_amount"),
-            func.count().label("orders_count"),
-        )
-        .where(Order.created_date >= start_date, Order.created_date < next_month)
-        .group_by(func.date(Order.created_date))
-        .subquery()
+    # читаем только из daily_stats, стоимость не зависит от размера истории
+    stmt = (
+        select(DailyStatsModel)
+        .where(DailyStatsModel.day >= start_date, DailyStatsModel.day < next_month)
+        .order_by(DailyStatsModel.day)
     )
 
-    expenses_subq = (
-        select(
-            func.date(ExpenseModel.actual_date).label("date"),
-            func.sum(ExpenseModel.amount).label("expenses_amount"),
-            func.count().label("expenses_count"),
-        )
-        .where(
-            ExpenseModel.actual_date >= start_date,
-            ExpenseModel.actual_date < next_month,
-        )
-        .group_by(func.date(ExpenseModel.actual_date))
-        .subquery()
-    )
-
-    if filters.statistics_type == "all":
-        stmt = (
-            select(
-                orders_subq.c.date,
-                func.coalesce(orders_subq.c.orders_amount, 0).label("orders_amount"),
-                func.coalesce(orders_subq.c.orders_count, 0).label("orders_count"),
-                func.coalesce(expenses_subq.c.expenses_amount, 0).label(
-                    "expenses_amount"
-                ),
-                func.coalesce(expenses_subq.c.expenses_count, 0).label(
-                    "expenses_count"
-                ),
-            )
-            .outerjoin(expenses_subq, orders_subq.c.date == expenses_subq.c.date)
-            .order_by(orders_subq.c.date)
-        )
-
-        result: Result = await session.execute(stmt)
-        rows = result.all()  # список Row
-
-        items = [
-            StatisticsSchema.model_validate(
-                dt._mapping
-            )  # _mapping превращает Row в dict
-            for dt in rows
-        ]
-
-        orders_total = await session.execute(
-            select(
-                func.sum(orders_subq.c.orders_amount).label("amount"),
-                func.sum(orders_subq.c.orders_count).label("count"),
-            )
-        )
+    with_orders = filters.statistics_type in ("orders", "all")
+    with_expenses = filters.statistics_type in ("expenses", "all")
 
-        expenses_total = await session.execute(
-            select(
-                func.sum(expenses_subq.c.expenses_amount).label("amount"),
-                func.sum(expenses_subq.c.expenses_count).label("count"),
-            )
+    if filters.statistics_type == "orders":
+        stmt = stmt.where(DailyStatsModel.orders_count > 0)
+    elif filters.statistics_type == "expenses":
+        stmt = stmt.where(DailyStatsModel.expenses_count > 0)
+    else:
+        # дни только с расходами нужны для итогов, но в items, как и раньше,
+        # попадают только дни с заказами
+        stmt = stmt.where(
+            or_(DailyStatsModel.orders_count > 0, DailyStatsModel.expenses_count > 0)
         )
 
-        res_order_total = orders_total.one()
-        totals["total_orders_amount"] = res_order_total.amount or 0
-        totals["total_orders_count"] = res_order_total.count or 0
+    result: Result = await session.execute(stmt)
 
-        res_expenses_total = expenses_total.one()
-        totals["total_expenses_amount"] = res_expenses_total.amount or 0
-        totals["total_expenses_count"] = res_expenses_total.count or 0
+    items = list()
+    for day_stats in result.scalars().all():  # type: DailyStatsModel
+        item = {"date": day_stats.day}
+        listed = not with_orders or day_stats.orders_count > 0
 
-    if filters.statistics_type == "orders":
-        stmt = select(
-            orders_subq.c.date,
-            func.coalesce(orders_subq.c.orders_amount, 0).label("orders_amount"),
-            func.coalesce(orders_subq.c.orders_count, 0).label("orders_count"),
-        ).order_by(orders_subq.c.date)
-
-        result: Result = await session.execute(stmt)
-        rows = result.all()  # список Row
-
-        items = [
-            StatisticsSchema.model_validate(
-                dt._mapping
-            )  # _mapping превращает Row в dict
-            for dt in rows
-        ]
-
-        orders_total = await session.execute(
-            select(
-                func.sum(orders_subq.c.orders_amount).label("amount"),
-                func.sum(orders_subq.c.orders_count).label("count"),
-            )
-        )
+        if with_orders:
+            item["orders_count"] = day_stats.orders_count
+            item["orders_amount"] = day_stats.orders_amount
+            totals["total_orders_count"] += day_stats.orders_count
+            totals["total_orders_amount"] += day_stats.orders_amount
 
-        res_order_total = orders_total.one()
-        totals["total_orders_amount"] = res_order_total.amount or 0
-        totals["total_orders_count"] = res_order_total.count or 0
-
-    if filters.statistics_type == "expenses":
-        stmt = select(
-            expenses_subq.c.date,
-            func.coalesce(expenses_subq.c.expenses_amount, 0).label("expenses_amount"),
-            func.coalesce(expenses_subq.c.expenses_count, 0).label("expenses_count"),
-        ).order_by(expenses_subq.c.date)
-
-        result: Result = await session.execute(stmt)
-        rows = result.all()  # список Row
-
-        items = [
-            StatisticsSchema.model_validate(
-                dt._mapping
-            )  # _mapping превращает Row в dict
-            for dt in rows
-        ]
-
-        expenses_total = await session.execute(
-            select(
-                func.sum(expenses_subq.c.expenses_amount).label("amount"),
-                func.sum(expenses_subq.c.expenses_count).label("count"),
-            )
-        )
+        if with_expenses:
+            item["expenses_count"] = day_stats.expenses_count
+            item["expenses_amount"] = day_stats.expenses_amount
+            totals["total_expenses_count"] += day_stats.expenses_count
+            totals["total_expenses_amount"] += day_stats.expenses_amount
 
-        res_expenses_total = expenses_total.one()
-        totals["total_expenses_amount"] = res_expenses_total.amount or 0
-        totals["total_expenses_count"] = res_expenses_total.count or 0
+        if listed:
+            items.append(StatisticsSchema.model_validate(item))
 
     return PaginatedMonthStatistics(
         items=items,
@@ -168,85 +91,176 @@ async def crm_get_month_statistics(
     )
 
 
-async def crm_get_year_graph(session: AsyncSession):
-    totals = {
-        "total_orders_count": 0,
-        "total_expenses_count": 0,
-        "total_orders_amount": 0,
-        "total_expenses_amount": 0,
-    }
+GRAPH_MAX_PERIODS = 1000
 
-    start = datetime.now()
-    start = start.date().replace(month=start.month + 1)
+GRAPH_STEPS = {
+    "day": "1 day",
+    "week": "1 week",
+    "month": "1 month",
+    "quarter": "3 month",
+}
 
-    items = list()
 
-    for j in range(12):
+def _period_start(value: date, granularity: str) -> date:
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    if granularity == "quarter":
+        return value.replace(month=(value.month - 1) // 3 * 3 + 1, day=1)
+    return value
 
-        if start.month == 1:
-            start = start.replace(year=start.year - 1, month=12, day=1)
-        else:
-            start = start.replace(month=start.month - 1, day=1)
 
-        if start.month == 12:
-            next_month = date(start.year + 1, 1, 1)
-        else:
-            next_month = date(start.year, start.month + 1, 1)
+def _next_period(value: date, granularity: str) -> date:
+    if granularity == "day":
+        return value + timedelta(days=1)
+    if granularity == "week":
+        return value + timedelta(weeks=1)
 
-        orders_subq = (
-            select(
-                func.date(Order.created_date).label("date"),
-                func.sum(Order.total_price).label("orders_amount"),
-                func.count().label("orders_count"),
-            )
-            .where(Order.created_date >= start, Order.created_date < next_month)
-            .group_by(func.date(Order.created_date))
-            .subquery()
+    months = 3 if granularity == "quarter" else 1
+    month = value.month - 1 + months
+    return date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def _periods_count(first: date, last: date, granularity: str) -> int:
+    if granularity == "day":
+        return (last - first).days + 1
+    if granularity == "week":
+        return (last - first).days // 7 + 1
+
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months // (3 if granularity == "quarter" else 1) + 1
+
+
+GRAPH_COLUMNS = ("orders_amount", "orders_count", "expenses_amount", "expenses_count")
+
+
+async def _period_rows_postgres(
+        session: AsyncSession, first: date, last: date, end: date, granularity: str
+) -> list[tuple]:
+    """date_trunc по daily_stats и LEFT JOIN на generate_series периодов."""
+    # granularity приходит из Literal, поэтому безопасно вставлять как литерал;
+    # с bind-параметром Postgres не сопоставит выражение в SELECT и GROUP BY
+    unit = literal_column(f"'{granularity}'")
+    step = cast(literal(GRAPH_STEPS[granularity]), Interval)
+
+    periods = select(
+        func.generate_series(
+            datetime.combine(first, time.min),
+            datetime.combine(last, time.min),
+            step,
+        ).label("period")
+    ).subquery("periods")
+
+    stats_period = func.date_trunc(unit, cast(DailyStatsModel.day, DateTime))
+    stats_subq = (
+        select(
+            stats_period.label("period"),
+            *(
+                func.sum(getattr(DailyStatsModel, column)).label(column)
+                for column in GRAPH_COLUMNS
+            ),
         )
+        .where(DailyStatsModel.day >= first, DailyStatsModel.day < end)
+        .group_by(stats_period)
+        .subquery()
+    )
 
-        expenses_subq = (
-            select(
-                func.date(ExpenseModel.actual_date).label("date"),
-                func.sum(ExpenseModel.amount).label("expenses_amount"),
-                func.count().label("expenses_count"),
-            )
-            .where(
-                ExpenseModel.actual_date >= start,
-                ExpenseModel.actual_date < next_month,
-            )
-            .group_by(func.date(ExpenseModel.actual_date))
-            .subquery()
+    stmt = (
+        select(
+            periods.c.period,
+            *(
+                func.coalesce(stats_subq.c[column], 0).label(column)
+                for column in GRAPH_COLUMNS
+            ),
         )
+        .outerjoin(stats_subq, stats_subq.c.period == periods.c.period)
+        .order_by(periods.c.period)
+    )
 
-        orders_total = await session.execute(
-            select(
-                func.sum(orders_subq.c.orders_amount).label("amount"),
-                func.sum(orders_subq.c.orders_count).label("count"),
-            )
+    result: Result = await session.execute(stmt)
+    return [(row[0].date(), *row[1:]) for row in result.all()]
+
+
+async def _period_rows_portable(
+        session: AsyncSession, first: date, last: date, end: date, granularity: str
+) -> list[tuple]:
+    """
+    Для SQLite (нет date_trunc и generate_series): строки daily_stats за
+    диапазон одним запросом, периоды и пустые периоды собираются в Python.
+    """
+    result: Result = await session.execute(
+        select(
+            DailyStatsModel.day,
+            *(getattr(DailyStatsModel, column) for column in GRAPH_COLUMNS),
+        ).where(DailyStatsModel.day >= first, DailyStatsModel.day < end)
+    )
+
+    sums: dict[date, list[int]] = {}
+    period = first
+    while period <= last:
+        sums[period] = [0] * len(GRAPH_COLUMNS)
+        period = _next_period(period, granularity)
+
+    for day, *values in result.all():
+        bucket = sums[_period_start(day, granularity)]
+        for index, value in enumerate(values):
+            bucket[index] += value
+
+    return [(period, *values) for period, values in sums.items()]
+
+
+async def crm_get_period_graph(
+        session: AsyncSession, filters: StatisticsGraphFilterSchema
+) -> PaginatedMonthStatistics:
+    """
+    Заказы и расходы по периодам одним запросом по daily_stats, пустые
+    периоды тоже попадают в ответ. На Postgres группирует база, на SQLite
+    периоды собираются в Python.
+    """
+    granularity = filters.granularity
+    if filters.date_from > filters.date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from is greater than date_to",
         )
 
-        expenses_total = await session.execute(
-            select(
-                func.sum(expenses_subq.c.expenses_amount).label("amount"),
-                func.sum(expenses_subq.c.expenses_count).label("count"),
-            )
+    first = _period_start(filters.date_from, granularity)
+    last = _period_start(filters.date_to, granularity)
+    end = _next_period(last, granularity)
+
+    if _periods_count(first, last, granularity) > GRAPH_MAX_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"too many periods, max {GRAPH_MAX_PERIODS}",
         )
 
-        res_order_total = orders_total.one()
-        res_expenses_total = expenses_total.one()
+    if session.get_bind().dialect.name == "postgresql":
+        rows = await _period_rows_postgres(session, first, last, end, granularity)
+    else:
+        rows = await _period_rows_portable(session, first, last, end, granularity)
+
+    items = list()
+    totals = {
+        "total_orders_count": 0,
+        "total_expenses_count": 0,
+        "total_orders_amount": 0,
+        "total_expenses_amount": 0,
+    }
 
-        totals["total_orders_count"] += res_order_total.count or 0
-        totals["total_expenses_count"] += res_expenses_total.count or 0
-        totals["total_orders_amount"] += res_order_total.amount or 0
-        totals["total_expenses_amount"] += res_expenses_total.amount or 0
+    for period, orders_amount, orders_count, expenses_amount, expenses_count in rows:
+        totals["total_orders_count"] += orders_count
+        totals["total_expenses_count"] += expenses_count
+        totals["total_orders_amount"] += orders_amount
+        totals["total_expenses_amount"] += expenses_amount
 
         items.append(
             StatisticsSchema(
-                date=start,
-                orders_count=res_order_total.count or 0,
-                orders_amount=res_order_total.amount or 0,
-                expenses_count=res_expenses_total.count or 0,
-                expenses_amount=res_expenses_total.amount or 0,
+                date=period,
+                orders_count=orders_count,
+                orders_amount=orders_amount,
+                expenses_count=expenses_count,
+                expenses_amount=expenses_amount,
             )
         )
 
@@ -257,3 +271,19 @@ async def crm_get_year_graph(session: AsyncSession):
         total_expenses_count=totals["total_expenses_count"],
         total_expenses_amount=int(totals["total_expenses_amount"] / 100),
     )
+
+
+async def crm_get_year_graph(session: AsyncSession):
+    # последние 12 месяцев, текущий месяц первым
+    today = datetime.now().date()
+    month = today.month - 1 - 11
+    date_from = date(today.year + month // 12, month % 12 + 1, 1)
+
+    result = await crm_get_period_graph(
+        session=session,
+        filters=StatisticsGraphFilterSchema(
+            date_from=date_from, date_to=today, granularity="month"
+        ),
+    )
+    result.items.reverse()
+    return result
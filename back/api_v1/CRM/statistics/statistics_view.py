@@ -2,21 +2,23 @@ from fastapi import APIRouter, Depends
 
 from api_v1.CRM.statistics.statistics_schemas import (
     StatisticsFilterSchema,
+    StatisticsGraphFilterSchema,
     StatisticsSchema,
 )
 from api_v1.CRM.statistics.statistics_service import (
     crm_get_month_statistics,
     crm_get_year_graph,
+    crm_get_period_graph,
 )
 from core.ResponseModel.response_model import PaginatedMonthStatistics
-from core.postgres_db import SessionDepPG
+from core.postgres_db import SessionDepRead
 
 router = APIRouter(prefix="/statistics")
 
 
 @router.get("/month", response_model=PaginatedMonthStatistics[StatisticsSchema])
 async def get_month_statistics(
-        session: SessionDepPG, filters_data: StatisticsFilterSchema = Depends()
+        session: SessionDepRead, filters_data: StatisticsFilterSchema = Depends()
 ):
     result: PaginatedMonthStatistics = await crm_get_month_statistics(
         session=session, filters=filters_data
@@ -26,6 +28,16 @@ async def get_month_statistics(
 
 
 @router.get("/graphs", response_model=PaginatedMonthStatistics[StatisticsSchema])
-async def get_statistics_graphs(session: SessionDepPG):
+async def get_statistics_graphs(session: SessionDepRead):
     result: PaginatedMonthStatistics = await crm_get_year_graph(session=session)
     return result
+
+
+@router.get("/period", response_model=PaginatedMonthStatistics[StatisticsSchema])
+async def get_statistics_period(
+        session: SessionDepRead, filters_data: StatisticsGraphFilterSchema = Depends()
+):
+    result: PaginatedMonthStatistics = await crm_get_period_graph(
+        session=session, filters=filters_data
+    )
+    return result
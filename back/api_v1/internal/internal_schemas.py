@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+
+
+class PoolStatsSchema(BaseModel):
+    pool_size: int = Field(description="Постоянных соединений в пуле")
+    checked_out: int = Field(description="Соединений выдано запросам")
+    checked_in: int = Field(description="Свободных соединений в пуле")
+    overflow: int = Field(description="Соединений сверх pool_size")
+    waiting: int = Field(description="Запросов сейчас ждут соединение")
+    max_waiting: int = Field(description="Наибольшая очередь ожидания с запуска")
+    checkouts: int = Field(description="Выдач соединения с запуска")
+    timeouts: int = Field(description="Выдач, упавших по pool_timeout")
+    checkout_ms_avg: float
+    checkout_ms_p50: float
+    checkout_ms_p95: float
+    checkout_ms_p99: float
+    checkout_ms_max: float
+    connects: int = Field(description="Открыто соединений к базе")
+    closes: int = Field(description="Закрыто соединений (recycle, ошибки, dispose)")
+    connection_age_s_min: float
+    connection_age_s_avg: float
+    connection_age_s_max: float
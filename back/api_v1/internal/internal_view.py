@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, status
+
+from api_v1.internal.internal_schemas import PoolStatsSchema
+from core.postgres_db import pool_stats, replica_engine
+
+router = APIRouter(tags=["internal"], prefix="/internal")
+
+
+@router.get("/db_pool", response_model=PoolStatsSchema)
+async def get_db_pool_stats():
+    """Насыщение пула: очередь ожидания, время выдачи соединения, возраст соединений."""
+    return pool_stats()
+
+
+@router.get("/db_pool/replica", response_model=PoolStatsSchema)
+async def get_db_replica_pool_stats():
+    if replica_engine is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="DATABASE_REPLICA_URL is not configured",
+        )
+    return pool_stats(replica=True)
@@ -1,3 +1,4 @@
-__all__ = ("materials_count",)
+__all__ = ("materials_count", "encode_cursor", "decode_cursor")
 
 from api_v1.utils.order_material_calculate import materials_count
+from api_v1.utils.pagination import encode_cursor, decode_cursor
@@ -0,0 +1,74 @@
+import asyncio
+import random
+from functools import wraps
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy.orm.exc import StaleDataError
+
+# Сколько раз сервис перечитывает строку и повторяет запись при конфликте версий
+CONFLICT_RETRIES = 5
+# Случайная пауза перед повтором (сек), растет с номером попытки
+CONFLICT_BACKOFF = 0.01
+
+
+def make_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def set_etag(response: Response, version: int):
+    response.headers["ETag"] = make_etag(version)
+
+
+def parse_if_match(if_match: str | None) -> int | None:
+    """Версия из заголовка If-Match; None — заголовка нет или указан '*'."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"invalid If-Match header: {if_match}",
+        )
+
+
+def check_version(current: int, expected: int | None):
+    """412, если клиент правит не ту версию, которую видел."""
+    if expected is not None and current != expected:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"version mismatch: expected {expected}, current {current}",
+        )
+
+
+def retry_on_conflict(func):
+    """
+    Повторяет сервис при конфликте версий (StaleDataError): откатывает
+    транзакцию и выполняет чтение-изменение-запись заново на свежих данных.
+    С If-Match (expected_version) повтор бессмысленен — сразу 412.
+    Сервис должен вызываться с session= в аргументах.
+    """
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        session = kwargs["session"]
+        for attempt in range(CONFLICT_RETRIES):
+            try:
+                return await func(*args, **kwargs)
+            except StaleDataError:
+                await session.rollback()
+                if kwargs.get("expected_version") is not None:
+                    raise HTTPException(
+                        status_code=status.HTTP_412_PRECONDITION_FAILED,
+                        detail="resource was modified concurrently",
+                    )
+                await asyncio.sleep(random.uniform(0, CONFLICT_BACKOFF * (attempt + 1)))
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="resource is being modified concurrently, try again",
+        )
+
+    return wrapper
@@ -0,0 +1,10 @@
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def upsert_insert(session: AsyncSession):
+    """insert() с on_conflict_do_update для диалекта текущей сессии."""
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite_insert
+    return pg_insert
@@ -0,0 +1,140 @@
+import base64
+import json
+import time
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import Row, Select, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import Base
+
+# Таблицы меньше порога считаются точно (окном в запросе страницы), для
+# больших берем оценку pg_class. Решение по таблице кэшируется на TTL
+ESTIMATE_COUNT_THRESHOLD = 100_000
+ESTIMATE_COUNT_TTL = 60
+
+_estimate_cache: dict[str, tuple[float, int | None]] = {}
+
+
+def encode_cursor(created_date: datetime, row_id: str) -> str:
+    """Кодирует позицию (created_date, id) в непрозрачный курсор."""
+    raw = json.dumps({"d": created_date.isoformat(), "id": row_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(raw["d"]), str(raw["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="invalid cursor",
+        )
+
+
+async def count_rows(session: AsyncSession, stmt: Select) -> int:
+    count_stmt = select(func.count()).select_from(stmt.order_by(None).subquery())
+    return await session.scalar(count_stmt) or 0
+
+
+async def estimate_count(session: AsyncSession, model: type[Base]) -> int | None:
+    """
+    Оценка pg_class для большой таблицы. None — таблица меньше порога или
+    база не Postgres: total считается точно в запросе страницы. Ответ
+    кэшируется на ESTIMATE_COUNT_TTL, так что обычно запроса нет вовсе.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+
+    table = model.__tablename__
+    cached = _estimate_cache.get(table)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    estimate = await session.scalar(
+        text(
+            "SELECT reltuples::bigint FROM pg_class "
+            "WHERE oid = CAST(:t AS regclass)"
+        ),
+        {"t": table},
+    )
+    if estimate is not None and estimate < ESTIMATE_COUNT_THRESHOLD:
+        estimate = None
+    _estimate_cache[table] = (time.monotonic() + ESTIMATE_COUNT_TTL, estimate)
+    return estimate
+
+
+async def fetch_page(
+    session: AsyncSession,
+    stmt: Select,
+    skip: int,
+    limit: int,
+    summary_column=None,
+    estimate_model: type[Base] | None = None,
+    with_total: bool = True,
+    count_stmt: Select | None = None,
+) -> tuple[list[Row], int | None, bool, int | None]:
+    """
+    Страница, total и сумма за один запрос через count(*) OVER () / sum() OVER ().
+
+    stmt — уже отфильтрованный и отсортированный запрос без offset/limit.
+    estimate_model передается для листингов без фильтров: для большой таблицы
+    total берется из estimate_count и окно не нужно. count_stmt — запрос, по
+    которому считать total вместо stmt (курсорный режим: stmt видит только
+    строки после курсора); считается подзапросом в том же SELECT.
+    Возвращает (rows, total, has_more, summary), строки — Row, где первым
+    элементом идет сущность или колонки исходного stmt.
+    """
+    estimate = None
+    if with_total and estimate_model is not None and summary_column is None:
+        estimate = await estimate_count(session, estimate_model)
+    use_window = with_total and estimate is None
+
+    page_stmt = stmt
+    if use_window:
+        if count_stmt is None:
+            total_column = func.count().over()
+        else:
+            total_column = (
+                select(func.count())
+                .select_from(count_stmt.order_by(None).subquery())
+                .scalar_subquery()
+            )
+        page_stmt = page_stmt.add_columns(total_column.label("page_total"))
+    if summary_column is not None:
+        page_stmt = page_stmt.add_columns(
+            func.sum(summary_column).over().label("page_summary")
+        )
+
+    # limit + 1 строка показывает, есть ли следующая страница
+    page_stmt = page_stmt.offset(skip).limit(limit + 1)
+    rows = list((await session.execute(page_stmt)).all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    total = None
+    summary = None
+    if rows:
+        if use_window:
+            total = rows[0].page_total
+        if summary_column is not None:
+            summary = rows[0].page_summary or 0
+
+    if with_total and total is None:
+        if estimate is not None:
+            total = estimate
+        else:
+            # пустая страница (skip за концом): окно ничего не вернуло
+            total = await count_rows(session, stmt if count_stmt is None else count_stmt)
+
+    if summary_column is not None and not rows:
+        subq = stmt.order_by(None).subquery()
+        summary = await session.scalar(
+            select(func.sum(subq.c[summary_column.key])).select_from(subq)
+        )
+        summary = summary or 0
+
+    return rows, total, has_more, summary
@@ -0,0 +1,128 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import load_only, selectinload
+
+
+class ProjectionQuerySchema(BaseModel):
+    """Параметры fields/expand, общие для всех ручек чтения CRM."""
+
+    fields: Optional[str] = Field(
+        None, description="Поля через запятую, например id,status,total_price"
+    )
+    expand: Optional[str] = Field(
+        None,
+        description="Связи через запятую, вложенные через точку: "
+        "products_detail.materials,costs",
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class ShapeField:
+    """Поле ответа: атрибут модели (или колонка строки) и перевод значения."""
+
+    attr: str
+    convert: Callable[[Any], Any] | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class Projection:
+    fields: tuple[str, ...]
+    expand: frozenset[str]
+
+    def expanded(self, path: str) -> bool:
+        return path in self.expand
+
+
+def _split(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+@dataclass(frozen=True)
+class Shape:
+    """
+    Форма ответа ресурса: скалярные поля и связи, которые можно раскрыть.
+    relations: путь -> (связь, *связи many-to-one, которые грузятся вместе
+    с ней для вывода строки). Родитель вложенного пути — путь без последней
+    части, раскрытие потомка раскрывает и родителя.
+    """
+
+    model: type
+    fields: dict[str, ShapeField]
+    relations: dict[str, tuple] = field(default_factory=dict)
+    # колонки, которые грузятся всегда: ключ, курсор, версия для ETag
+    required: tuple[str, ...] = ("id",)
+
+    @property
+    def full(self) -> Projection:
+        return Projection(tuple(self.fields), frozenset(self.relations))
+
+    def parse(self, fields: str | None, expand: str | None) -> Projection:
+        """
+        Без параметров — полная форма как раньше. fields без expand — только
+        перечисленные поля без связей; expand без fields — все поля и
+        перечисленные связи.
+        """
+        if fields is None and expand is None:
+            return self.full
+
+        if fields is None:
+            names = tuple(self.fields)
+        else:
+            names = tuple(_split(fields))
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"unknown fields:{unknown}, allowed:{list(self.fields)}",
+                )
+            # порядок полей как в полной форме
+            names = tuple(name for name in self.fields if name in names)
+
+        paths = set()
+        for path in _split(expand or ""):
+            if path not in self.relations:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"unknown expand:{path}, allowed:{list(self.relations)}",
+                )
+            parts = path.split(".")
+            paths.update(".".join(parts[: i + 1]) for i in range(len(parts)))
+
+        return Projection(names, frozenset(paths))
+
+    def columns(self, projection: Projection) -> list:
+        attrs = dict.fromkeys(
+            [*self.required, *(self.fields[name].attr for name in projection.fields)]
+        )
+        return [getattr(self.model, attr) for attr in attrs]
+
+    def load_options(self, projection: Projection) -> list:
+        """load_only по запрошенным полям и selectinload только раскрытых связей."""
+        options = [load_only(*self.columns(projection))]
+        for path in sorted(projection.expand):
+            parts = path.split(".")
+            loader = None
+            for i in range(len(parts)):
+                relation = self.relations[".".join(parts[: i + 1])][0]
+                loader = (
+                    selectinload(relation)
+                    if loader is None
+                    else loader.selectinload(relation)
+                )
+            extras = self.relations[path][1:]
+            if extras:
+                loader = loader.options(*(selectinload(extra) for extra in extras))
+            options.append(loader)
+        return options
+
+    def dump(self, obj, projection: Projection) -> dict:
+        """Скалярные поля объекта ORM или строки select по проекции."""
+        item = {}
+        for name in projection.fields:
+            spec = self.fields[name]
+            value = getattr(obj, spec.attr)
+            item[name] = spec.convert(value) if spec.convert is not None else value
+        return item
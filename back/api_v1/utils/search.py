@@ -0,0 +1,65 @@
+import re
+
+from sqlalchemy import func, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.models import Base
+
+_SPACES = re.compile(r"\s+")
+# Длина триграммы: более короткий запрос FTS5 trigram не находит
+TRIGRAM = 3
+
+
+def normalize_search(value: str | None) -> str:
+    """Та же нормализация, что и у колонки search_text: регистр, ё -> е, пробелы."""
+    if not value:
+        return ""
+    return _SPACES.sub(" ", value.lower().replace("ё", "е")).strip()
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _case_variants(value: str) -> list[str]:
+    """Все варианты регистра короткой строки: LIKE в SQLite не сворачивает кириллицу."""
+    variants = [""]
+    for char in value:
+        cases = {char.lower(), char.upper()}
+        variants = [variant + case for variant in variants for case in cases]
+    return variants
+
+
+def search_clause(session: AsyncSession, model: type[Base], value: str):
+    """
+    Условие поиска по model.search_text и выражение для ранжирования.
+
+    Postgres: LIKE '%q%' по нормализованной колонке обслуживает GIN-индекс
+    gin_trgm_ops, ранг — word_similarity. SQLite: та же подстрока через MATCH
+    по FTS5-таблице <table>_fts с токенизатором trigram, без ранга. Запрос
+    короче трех символов триграмм не дает — тогда LIKE по колонке во всех
+    вариантах регистра (lower() в SQLite не трогает кириллицу в search_text).
+    Возвращает (predicate, rank | None).
+    """
+    query = normalize_search(value)
+
+    if session.get_bind().dialect.name == "sqlite":
+        if len(query) < TRIGRAM:
+            predicate = or_(
+                *(
+                    model.search_text.like(f"%{_escape_like(variant)}%", escape="\\")
+                    for variant in _case_variants(query)
+                )
+            )
+            return predicate, None
+
+        match = '"' + query.replace('"', '""') + '"'
+        fts = f"{model.__tablename__}_fts"
+        matched = select(literal_column("rowid")).select_from(text(fts)).where(
+            text(f"{fts} MATCH :search_match").bindparams(search_match=match)
+        )
+        return literal_column(f"{model.__tablename__}.rowid").in_(matched), None
+
+    predicate = model.search_text.like(f"%{_escape_like(query)}%", escape="\\")
+    rank = func.word_similarity(query, model.search_text)
+    return predicate, rank
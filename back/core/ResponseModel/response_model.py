@@ -1,5 +1,6 @@
 from typing import Generic, TypeVar, List, Optional
 
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, computed_field, Field
 
 T = TypeVar("T")
@@ -12,6 +13,7 @@ class PaginatedResponse(BaseModel, Generic[T]):
     skip: int
     limit: int
     has_more: bool
+    next_cursor: Optional[str] = Field(None)
 
     @computed_field
     @property
@@ -24,6 +26,34 @@ class PaginatedResponse(BaseModel, Generic[T]):
         return (self.skip // self.limit) + 1
 
 
+def paginated_json(
+    items: list[dict],
+    total: int,
+    skip: int,
+    limit: int,
+    has_more: bool,
+    next_cursor: str | None = None,
+    total_summary: int | None = None,
+) -> ORJSONResponse:
+    """
+    Ответ в формате PaginatedResponse из готовых dict: orjson и без повторной
+    валидации по response_model.
+    """
+    return ORJSONResponse(
+        {
+            "items": items,
+            "total_summary": total_summary,
+            "total": total,
+            "skip": skip,
+            "limit": limit,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+            "total_pages": (total + limit - 1) // limit,
+            "current_page": (skip // limit) + 1,
+        }
+    )
+
+
 class PaginatedMonthStatistics(BaseModel, Generic[T]):
     items: List[T]
     total_orders_count: int = Field(0)
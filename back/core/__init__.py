@@ -3,11 +3,19 @@ __all__ = (
     "sqlite_session_factory",
     "sqlite_url",
     "SessionDepPG",
+    "SessionDepRead",
     "postgres_url",
     "pg_session_factory",
+    "pg_read_session_factory",
     "tg_bot"
 )
 
 from .sqlite_db import SessionDepSQLITE, sqlite_session_factory, sqlite_url
-from .postgres_db import SessionDepPG, postgres_url, pg_session_factory
+from .postgres_db import (
+    SessionDepPG,
+    SessionDepRead,
+    postgres_url,
+    pg_session_factory,
+    pg_read_session_factory,
+)
 from core.tg_bot import tg_bot
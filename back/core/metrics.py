@@ -0,0 +1,172 @@
+import time
+from bisect import bisect_left
+
+from core.query_counter import current_query_stats, start_query_stats
+
+# Границы корзин гистограмм: секунды ответа и байты тела
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+# Запросы, не попавшие ни в один маршрут, — одной меткой, чтобы не плодить ряды
+UNMATCHED_ROUTE = "unmatched"
+# Какие поля снимка пула (core.pool_metrics) отдавать и как
+POOL_GAUGES = (
+    "pool_size",
+    "checked_out",
+    "checked_in",
+    "overflow",
+    "waiting",
+    "checkout_ms_p95",
+    "connection_age_s_max",
+)
+POOL_COUNTERS = ("checkouts", "timeouts", "connects", "closes")
+
+
+class Histogram:
+    """Корзины, сумма и количество; обновляется без блокировок из event loop."""
+
+    __slots__ = ("bounds", "buckets", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteStats:
+    __slots__ = ("latency", "size", "statuses", "db_time", "db_queries")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statuses: dict[int, int] = {}
+        self.db_time = 0.0
+        self.db_queries = 0
+
+
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        # (method, route) -> RouteStats
+        self.routes: dict[tuple[str, str], RouteStats] = {}
+
+    def route(self, method: str, route: str) -> RouteStats:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats()
+        return stats
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """
+    Чистый ASGI middleware: время ответа, размер тела, статусы, время в базе
+    и число запросов к ней по шаблону маршрута (/crm/orders/{order_id}).
+    Все обновления — в одном потоке event loop, без блокировок.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        db_stats = current_query_stats() or start_query_stats()
+        db_count, db_time = db_stats.count, db_stats.duration
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.in_flight -= 1
+            # маршрут FastAPI записывает в scope при сопоставлении
+            route = scope.get("route")
+            stats = metrics.route(
+                scope["method"],
+                getattr(route, "path_format", None) or UNMATCHED_ROUTE,
+            )
+            stats.latency.observe(elapsed)
+            stats.size.observe(size)
+            stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+            stats.db_queries += db_stats.count - db_count
+            stats.db_time += db_stats.duration - db_time
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*histogram.bounds, "+Inf"), histogram.buckets):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def render_metrics(pool: dict | None = None) -> str:
+    """Текстовый формат Prometheus (exposition format 0.0.4)."""
+    lines = [
+        "# HELP http_requests_in_flight Requests being processed",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {metrics.in_flight}",
+    ]
+    # снимок: маршрут может добавиться во время обхода
+    routes = list(metrics.routes.items())
+
+    sections = (
+        ("http_request_duration_seconds", "histogram", "Request latency"),
+        ("http_response_size_bytes", "histogram", "Response body size"),
+        ("http_responses_total", "counter", "Responses by status"),
+        ("db_query_duration_seconds_total", "counter", "Time spent in DB"),
+        ("db_queries_total", "counter", "DB statements executed"),
+    )
+    for name, kind, help_text in sections:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (method, route), stats in routes:
+            labels = _labels(method=method, route=route)
+            if name == "http_request_duration_seconds":
+                lines.extend(_histogram_lines(name, stats.latency, labels))
+            elif name == "http_response_size_bytes":
+                lines.extend(_histogram_lines(name, stats.size, labels))
+            elif name == "http_responses_total":
+                for code, count in list(stats.statuses.items()):
+                    lines.append(f'{name}{{{labels},status="{code}"}} {count}')
+            elif name == "db_query_duration_seconds_total":
+                lines.append(f"{name}{{{labels}}} {stats.db_time}")
+            else:
+                lines.append(f"{name}{{{labels}}} {stats.db_queries}")
+
+    if pool is not None:
+        for key in POOL_GAUGES:
+            lines.append(f"# TYPE db_pool_{key} gauge")
+            lines.append(f"db_pool_{key} {pool[key]}")
+        for key in POOL_COUNTERS:
+            lines.append(f"# TYPE db_pool_{key}_total counter")
+            lines.append(f"db_pool_{key}_total {pool[key]}")
+    return "\n".join(lines) + "\n"
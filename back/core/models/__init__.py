@@ -15,6 +15,11 @@ __all__ = (
     "ProductPriceTier",
     "OrderAddCostsModel",
     "ExpenseModel",
+    "DailyStatsModel",
+    "MaterialMovementModel",
+    "MaterialBalanceDeltaModel",
+    "MaterialBalanceModel",
+    "MovementKind",
 )
 
 from .base import Base
@@ -35,3 +40,10 @@ from .assotiation_product_price_tier import ProductPriceTier
 from .association_order_add_costs import OrderAddCostsModel
 
 from .model_expenses import ExpenseModel
+from .model_daily_stats import DailyStatsModel
+from .model_material_movements import (
+    MaterialMovementModel,
+    MaterialBalanceDeltaModel,
+    MaterialBalanceModel,
+    MovementKind,
+)
@@ -12,7 +12,7 @@ class OrderAddCostsModel(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     order_id: Mapped[str] = mapped_column(
-        ForeignKey("orders.id", ondelete="cascade"),
+        ForeignKey("orders.id", ondelete="cascade"), index=True
     )
     cost: Mapped[int]
     description: Mapped[str]
@@ -17,8 +17,12 @@ class OrderProductModel(Base):
     __tablename__ = "order_product_association"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    order_id: Mapped[str] = mapped_column(ForeignKey("orders.id", ondelete="cascade"))
-    product_id: Mapped[str] = mapped_column(ForeignKey("products.id"), nullable=True)
+    order_id: Mapped[str] = mapped_column(
+        ForeignKey("orders.id", ondelete="cascade"), index=True
+    )
+    product_id: Mapped[str] = mapped_column(
+        ForeignKey("products.id"), nullable=True, index=True
+    )
 
     product_price: Mapped[int] = mapped_column(default=0, server_default="0")
     quantity: Mapped[int] = mapped_column(default=1, server_default="1")
@@ -15,11 +15,13 @@ class OrderProductMaterial(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     order_product_id: Mapped[int] = mapped_column(
-        ForeignKey("order_product_association.id", ondelete="cascade")
+        ForeignKey("order_product_association.id", ondelete="cascade"),
+        index=True,
     )
     material_id: Mapped[str] = mapped_column(
         ForeignKey("materials.id", ondelete="cascade"),
         nullable=True,
+        index=True,
     )
 
     qty_prod_in_mat: Mapped[int] = mapped_column(default=0, server_default="0")
@@ -25,7 +25,7 @@ class ProductMaterialModel(Base):
         ForeignKey("products.id", ondelete="cascade")
     )
     material_id: Mapped[str] = mapped_column(
-        ForeignKey("materials.id", ondelete="cascade")
+        ForeignKey("materials.id", ondelete="cascade"), index=True
     )
     quantity_in_one_mat_unit: Mapped[int] = mapped_column(default=1, server_default="1")
 
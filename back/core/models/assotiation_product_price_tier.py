@@ -15,7 +15,7 @@ class ProductPriceTier(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     product_id: Mapped[int] = mapped_column(
-        ForeignKey("products.id", ondelete="cascade")
+        ForeignKey("products.id", ondelete="cascade"), index=True
     )
 
     start: Mapped[int]
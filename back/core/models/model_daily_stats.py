@@ -0,0 +1,22 @@
+from datetime import date
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.models.base import Base
+
+
+class DailyStatsModel(Base):
+    __tablename__ = "daily_stats"
+
+    day: Mapped[date] = mapped_column(primary_key=True)
+    orders_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    orders_amount: Mapped[int] = mapped_column(default=0, server_default="0")
+    expenses_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    expenses_amount: Mapped[int] = mapped_column(default=0, server_default="0")
+    materials_cost: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(day={self.day})"
+
+    def __repr__(self):
+        return str(self)
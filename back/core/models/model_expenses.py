@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, UTC, date
 
@@ -6,6 +7,9 @@ from core.models.base import Base
 
 class ExpenseModel(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_actual_date_expense_type", "actual_date", "expense_type"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     expense_type: Mapped[str]
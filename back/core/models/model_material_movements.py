@@ -0,0 +1,107 @@
+import enum
+from datetime import datetime, UTC
+
+from sqlalchemy import ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.models.base import Base
+
+
+class MovementKind(enum.IntEnum):
+    RECEIPT = 1  # приход, on_hand +
+    CONSUMPTION = 2  # списание в заказ, on_hand - (отрицательное — возврат)
+    RESERVATION = 3  # резерв под заказ, reserved +
+    RELEASE = 4  # снятие резерва, reserved -
+    ADJUSTMENT = 5  # корректировка/начальный остаток, on_hand +-
+
+
+# Влияние движения на (on_hand, reserved) при quantity = 1
+MOVEMENT_EFFECT = {
+    MovementKind.RECEIPT: (1, 0),
+    MovementKind.CONSUMPTION: (-1, 0),
+    MovementKind.RESERVATION: (0, 1),
+    MovementKind.RELEASE: (0, -1),
+    MovementKind.ADJUSTMENT: (1, 0),
+}
+
+
+class MaterialMovementModel(Base):
+    """Журнал движений материала, строки только добавляются."""
+
+    __tablename__ = "material_movements"
+    __table_args__ = (
+        Index(
+            "ix_material_movements_material_id_created_date",
+            "material_id",
+            "created_date",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    material_id: Mapped[str] = mapped_column(
+        ForeignKey("materials.id", ondelete="cascade")
+    )
+    order_id: Mapped[str | None] = mapped_column(
+        ForeignKey("orders.id", ondelete="set null"), index=True
+    )
+    kind: Mapped[int]
+    quantity: Mapped[int]
+    on_hand_delta: Mapped[int] = mapped_column(default=0, server_default="0")
+    reserved_delta: Mapped[int] = mapped_column(default=0, server_default="0")
+    description: Mapped[str | None]
+    created_date: Mapped[datetime] = mapped_column(
+        default=lambda: datetime.now(UTC).replace(tzinfo=None)
+    )
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(id={self.id})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class MaterialBalanceDeltaModel(Base):
+    """
+    Дельты остатка, еще не свернутые в material_balances. Запись движения
+    только добавляет сюда строку, сворачивает их fold_material_balances.
+    """
+
+    __tablename__ = "material_balance_deltas"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    material_id: Mapped[str] = mapped_column(
+        ForeignKey("materials.id", ondelete="cascade"), index=True
+    )
+    on_hand_delta: Mapped[int] = mapped_column(default=0, server_default="0")
+    reserved_delta: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(id={self.id})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class MaterialBalanceModel(Base):
+    """Свернутый остаток материала: журнал до последнего fold_material_balances."""
+
+    __tablename__ = "material_balances"
+
+    material_id: Mapped[str] = mapped_column(
+        ForeignKey("materials.id", ondelete="cascade"), primary_key=True
+    )
+    on_hand: Mapped[int] = mapped_column(default=0, server_default="0")
+    reserved: Mapped[int] = mapped_column(default=0, server_default="0")
+    updated_date: Mapped[datetime] = mapped_column(
+        default=lambda: datetime.now(UTC).replace(tzinfo=None)
+    )
+
+    @property
+    def available(self):
+        return self.on_hand - self.reserved
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(material_id={self.material_id})"
+
+    def __repr__(self):
+        return str(self)
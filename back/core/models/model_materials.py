@@ -1,8 +1,10 @@
+from sqlalchemy import Index
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 from uuid import uuid4
 from datetime import datetime, UTC
 
 from core.models.base import Base
+from core.models.search_text import search_text_computed, sqlite_fts_mirror
 
 from typing import TYPE_CHECKING
 import enum
@@ -19,12 +21,23 @@ class MaterialStatus(enum.IntEnum):
 
 class Material(Base):
     __tablename__ = "materials"
+    __table_args__ = (
+        Index(
+            "ix_materials_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[str] = mapped_column(primary_key=True, default=lambda: uuid4().hex)
-    name: Mapped[str] = mapped_column(nullable=False)
-    material_type: Mapped[str]
+    name: Mapped[str] = mapped_column(nullable=False, index=True)
+    material_type: Mapped[str] = mapped_column(index=True)
     detail: Mapped[str | None]
     description: Mapped[str | None]
+    search_text: Mapped[str | None] = mapped_column(
+        search_text_computed("name", "detail")
+    )
 
     create_at: Mapped[datetime] = mapped_column(default=datetime.now(UTC).replace(tzinfo=None))
     status: Mapped[int] = mapped_column(default=MaterialStatus.ACTIVE.value)
@@ -33,6 +46,9 @@ class Material(Base):
     one_item_price: Mapped[int] = mapped_column(nullable=False)
     count_in_one_pack: Mapped[int] = mapped_column(nullable=False)
     count_left: Mapped[int] = mapped_column(nullable=False)
+    # Версия строки для оптимистичной блокировки
+    version: Mapped[int] = mapped_column(nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
 
     # many_to_many
     products_with_material: Mapped[list["ProductMaterialModel"]] = relationship(
@@ -48,3 +64,6 @@ class Material(Base):
 
     def __repr__(self):
         return str(self)
+
+
+sqlite_fts_mirror(Material.__table__)
@@ -1,7 +1,7 @@
 import enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 from uuid import uuid4
 from datetime import datetime, UTC
@@ -26,6 +26,9 @@ class OrderStatus(enum.IntEnum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_status_created_date", "status", "created_date"),
+    )
 
     id: Mapped[str] = mapped_column(primary_key=True, default=lambda: uuid4().hex)
     status: Mapped[int] = mapped_column(
@@ -33,20 +36,27 @@ class Order(Base):
     )
     total_price: Mapped[int] = mapped_column(default=0, server_default="0")
     materials_price: Mapped[int] = mapped_column(default=0, server_default="0")
-    customer: Mapped[str | None] = mapped_column(nullable=True)
+    customer: Mapped[str | None] = mapped_column(nullable=True, index=True)
     descriptions: Mapped[str | None] = mapped_column(nullable=True)
     created_date: Mapped[datetime] = mapped_column(
-        nullable=False, default=lambda: datetime.now(UTC).replace(tzinfo=None)
+        nullable=False,
+        default=lambda: datetime.now(UTC).replace(tzinfo=None),
+        index=True,
     )
     hiring_date: Mapped[datetime | None] = mapped_column(nullable=True)
     ready_date: Mapped[datetime | None] = mapped_column(nullable=True)
     completed_date: Mapped[datetime | None] = mapped_column(nullable=True)
     canceled_date: Mapped[datetime | None] = mapped_column(nullable=True)
     paid: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Версия строки: UPDATE идет с WHERE version=..., конфликт -> StaleDataError
+    version: Mapped[int] = mapped_column(nullable=False, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
 
     ## relationships one_to_one
-    client_id: Mapped[str | None] = mapped_column(ForeignKey("clients.id"))
-    user_id: Mapped[str | None] = mapped_column(ForeignKey("users.id"))
+    client_id: Mapped[str | None] = mapped_column(
+        ForeignKey("clients.id"), index=True
+    )
+    user_id: Mapped[str | None] = mapped_column(ForeignKey("users.id"), index=True)
     user: Mapped["User"] = relationship("User", back_populates="orders")
 
     ## relationships one_to_many
@@ -1,11 +1,18 @@
 import enum
 from datetime import datetime, UTC
-from typing import TYPE_CHECKING
+from typing import Iterable, TYPE_CHECKING
 from uuid import uuid4
 
+from sqlalchemy import Index, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core.models.base import Base
+from core.models.product_price_table import (
+    PriceTable,
+    get_price_table,
+    price_table_generation,
+)
+from core.models.search_text import search_text_computed, sqlite_fts_mirror
 
 if TYPE_CHECKING:
     from core.models.association_product_material import ProductMaterialModel
@@ -20,12 +27,23 @@ class ProductStatus(enum.IntEnum):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index(
+            "ix_products_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+    )
 
     id: Mapped[str] = mapped_column(primary_key=True, default=lambda: uuid4().hex)
-    name: Mapped[str]
+    name: Mapped[str] = mapped_column(index=True)
     size: Mapped[str]
     detail: Mapped[str | None]
     description: Mapped[str | None]
+    search_text: Mapped[str | None] = mapped_column(
+        search_text_computed("name", "size", "detail")
+    )
 
     create_at: Mapped[datetime] = mapped_column(
         default=lambda: datetime.now(UTC).replace(tzinfo=None)
@@ -54,21 +72,33 @@ class Product(Base):
     def __repr__(self):
         return str(self)
 
+    @property
+    def price_table(self) -> PriceTable:
+        # Таблица запоминается на экземпляре до правки тиров или expire;
+        # при первом обращении price_tier должен быть загружен
+        memo = self.__dict__.get("_price_table_memo")
+        generation = price_table_generation()
+        if memo is None or memo[0] != generation:
+            memo = (generation, get_price_table(self.id, lambda: self.price_tier))
+            self.__dict__["_price_table_memo"] = memo
+        return memo[1]
+
     def give_product_price(self, quantity: int) -> int:
         """Возвращает цену (число) для указанного количества."""
-        if not self.price_tier:
-            return 0
-
-        # Ищем подходящий price_tier
-        for price_tier in self.price_tier:
-            if quantity in price_tier:  # использует contains
-                return price_tier.price  # ← возвращаем число!
-
-        # Если не нашли подходящий диапазон, берем минимальную цену
-        if self.price_tier:
-            starts = (sp.start for sp in self.price_tier)
-            if quantity < min(starts):
-                return max(self.price_tier).price
-            return min(self.price_tier).price  # ← .price!
-
-        return 0
+        return self.price_table.price_for(quantity)
+
+    def price_for_quantities(self, quantities: Iterable[int]) -> list[int]:
+        """Цены для списка количеств за один проход по таблице тиров."""
+        return self.price_table.prices_for(quantities)
+
+
+sqlite_fts_mirror(Product.__table__)
+
+
+def _forget_price_table(target: Product, *args):
+    # Тиры перечитываются из базы: запомненная таблица могла устареть
+    target.__dict__.pop("_price_table_memo", None)
+
+
+event.listen(Product, "expire", _forget_price_table)
+event.listen(Product, "refresh", _forget_price_table)
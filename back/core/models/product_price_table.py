@@ -0,0 +1,106 @@
+from bisect import bisect_right
+from typing import Callable, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core.models.assotiation_product_price_tier import ProductPriceTier
+
+
+class PriceTable:
+    """
+    Тиры цены продукта, скомпилированные в непересекающиеся интервалы.
+    starts/ends/prices — параллельные отсортированные списки для bisect.
+    """
+
+    __slots__ = ("starts", "ends", "prices", "min_start", "below_price", "other_price")
+
+    def __init__(self, tiers: list["ProductPriceTier"]):
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.prices: list[int] = []
+
+        if not tiers:
+            self.min_start = None
+            self.below_price = self.other_price = 0
+            return
+
+        # Как и раньше: при пересечении побеждает первый подходящий тир
+        bounds = sorted({t.start for t in tiers} | {t.end + 1 for t in tiers})
+        for low, high in zip(bounds, bounds[1:]):
+            tier = next(
+                (t for t in tiers if t.start <= low and high - 1 <= t.end), None
+            )
+            if tier is None:
+                continue
+            if self.prices and self.ends[-1] == low - 1 and self.prices[-1] == tier.price:
+                self.ends[-1] = high - 1
+                continue
+            self.starts.append(low)
+            self.ends.append(high - 1)
+            self.prices.append(tier.price)
+
+        # Вне диапазонов: меньше минимального start — максимальная цена, иначе минимальная
+        self.min_start = min(t.start for t in tiers)
+        self.below_price = max(t.price for t in tiers)
+        self.other_price = min(t.price for t in tiers)
+
+    def price_for(self, quantity: int) -> int:
+        position = bisect_right(self.starts, quantity) - 1
+        if position >= 0 and quantity <= self.ends[position]:
+            return self.prices[position]
+        if self.min_start is not None and quantity < self.min_start:
+            return self.below_price
+        return self.other_price
+
+    def prices_for(self, quantities: Iterable[int]) -> list[int]:
+        price_for = self.price_for
+        return [price_for(quantity) for quantity in quantities]
+
+
+# Скомпилированные таблицы по product_id на процесс вместе с отпечатком тиров,
+# из которых собраны. Сброс из CRUD тиров только освобождает память:
+# актуальность проверяет отпечаток
+_price_tables: dict[str, tuple[tuple, PriceTable]] = {}
+
+# Номер сброса: таблица, запомненная на экземпляре продукта, действует до
+# следующего invalidate_price_table в процессе
+_generation = 0
+
+
+def tiers_fingerprint(tiers: Iterable["ProductPriceTier"]) -> tuple:
+    """(id, start, end, price) тиров в порядке загрузки: порядок влияет на цену."""
+    return tuple((t.id, t.start, t.end, t.price) for t in tiers)
+
+
+def get_price_table(
+    product_id: str | None, load_tiers: Callable[[], list["ProductPriceTier"]]
+) -> PriceTable:
+    """
+    Таблица из кэша отдается, только если тиры в сессии вызывающего совпадают
+    с теми, из которых она собрана. Сессия со старыми тирами (открытая до
+    правки, с реплики или в другом процессе) получает свою таблицу и не
+    выдает ее запросам, которые видят новые тиры.
+    """
+    tiers = list(load_tiers())
+    fingerprint = tiers_fingerprint(tiers)
+    cached = _price_tables.get(product_id) if product_id else None
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    table = PriceTable(tiers)
+    if product_id:
+        _price_tables[product_id] = (fingerprint, table)
+    return table
+
+
+def price_table_generation() -> int:
+    return _generation
+
+
+def invalidate_price_table(product_id: str | None = None):
+    """Сбрасывает таблицу продукта, без аргумента — все таблицы."""
+    global _generation
+    _generation += 1
+    if product_id is None:
+        _price_tables.clear()
+    else:
+        _price_tables.pop(product_id, None)
@@ -0,0 +1,44 @@
+from sqlalchemy import Computed, DDL, Table, event
+
+
+def search_text_computed(*columns: str) -> Computed:
+    """
+    Нормализованная строка поиска: колонки через пробел, нижний регистр, ё -> е.
+    lower() в SQLite сворачивает только ASCII, поэтому Ё заменяется отдельно;
+    в Postgres после lower() его уже нет, и значение то же.
+    """
+    joined = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    return Computed(
+        f"replace(replace(lower({joined}), 'ё', 'е'), 'Ё', 'е')", persisted=True
+    )
+
+
+def sqlite_fts_mirror(table: Table, column: str = "search_text"):
+    """
+    В SQLite вместо pg_trgm держим FTS5-таблицу <table>_fts на триггерах.
+    Токенизатор trigram: MATCH ищет подстроку без учета регистра, как
+    LIKE '%q%' по триграммному индексу в Postgres.
+    """
+    name = table.name
+    fts = f"{name}_fts"
+    statements = (
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content='{name}', "
+        f"content_rowid='rowid', tokenize='trigram')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {name} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.rowid, old.{column}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.rowid, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column}); END",
+    )
+    for statement in statements:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+    event.listen(
+        table,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {fts}").execute_if(dialect="sqlite"),
+    )
@@ -0,0 +1,111 @@
+import time
+from collections import deque
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Сколько последних выдач соединения держим для перцентилей
+LATENCY_WINDOW = 1000
+
+
+class PoolMetrics:
+    """Счетчики пула: ожидание соединения, очередь ожидающих и возраст соединений."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.connects = 0
+        self.closes = 0
+        # connection_record -> monotonic время открытия соединения
+        self.opened_at: dict[int, float] = {}
+
+    def observe_checkout(self, seconds: float):
+        self.checkouts += 1
+        self.latency_total += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.latencies.append(seconds)
+
+    def snapshot(self, pool) -> dict:
+        now = time.monotonic()
+        ages = [now - opened for opened in self.opened_at.values()]
+        recent = sorted(self.latencies)
+
+        def percentile(q: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000
+
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "checkout_ms_avg": (
+                self.latency_total / self.checkouts * 1000 if self.checkouts else 0.0
+            ),
+            "checkout_ms_p50": percentile(0.5),
+            "checkout_ms_p95": percentile(0.95),
+            "checkout_ms_p99": percentile(0.99),
+            "checkout_ms_max": self.latency_max * 1000,
+            "connects": self.connects,
+            "closes": self.closes,
+            "connection_age_s_min": min(ages, default=0.0),
+            "connection_age_s_avg": sum(ages) / len(ages) if ages else 0.0,
+            "connection_age_s_max": max(ages, default=0.0),
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул asyncpg, который замеряет время выдачи соединения (ожидание в очереди,
+    открытие нового, pre-ping) и число запросов, ждущих соединение.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+        # при recreate() слушатели уже скопированы из старого пула
+        if "_dispatch" not in kwargs:
+            _listen(self, self.metrics)
+
+    def recreate(self):
+        # dispose() пересоздает пул — метрики переносим в новый
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        metrics = self.metrics
+        metrics.waiting += 1
+        metrics.max_waiting = max(metrics.max_waiting, metrics.waiting)
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.waiting -= 1
+        metrics.observe_checkout(time.perf_counter() - start)
+        return connection
+
+
+def _listen(pool: InstrumentedQueuePool, metrics: PoolMetrics):
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+        metrics.opened_at[id(connection_record)] = time.monotonic()
+
+    @event.listens_for(pool, "close")
+    def on_close(dbapi_connection, connection_record):
+        metrics.closes += 1
+        metrics.opened_at.pop(id(connection_record), None)
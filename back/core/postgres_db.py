@@ -1,22 +1,142 @@
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
-from fastapi import Depends
+from fastapi import Depends, Request
 from typing import Annotated
 import os
+import time
+
+from core.pool_metrics import InstrumentedQueuePool
+from core.query_counter import instrument_engine
 
 #PostgreSQL async URL
 postgres_url = os.getenv("DATABASE_URL")
+# Необязательная реплика для чтения; без нее чтение идет в основную базу
+replica_url = os.getenv("DATABASE_REPLICA_URL")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Настройки пула и драйвера из окружения (см. .env.example)
+POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+# Соединение старше стольких секунд переоткрывается; -1 — не переоткрывать
+POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# Кэш подготовленных выражений asyncpg и адаптера SQLAlchemy; 0 — выключить
+# (нужно за pgbouncer в режиме transaction)
+STATEMENT_CACHE_SIZE = _env_int("DB_STATEMENT_CACHE_SIZE", 100)
+PREPARED_STATEMENT_CACHE_SIZE = _env_int("DB_PREPARED_STATEMENT_CACHE_SIZE", 100)
+# statement_timeout на стороне сервера, мс; 0 — без ограничения
+STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 30000)
+# Сколько секунд после записи клиент читает из основной базы, а не с реплики
+REPLICA_PIN_SECONDS = _env_int("DB_REPLICA_PIN_SECONDS", 5)
+PIN_PRIMARY_COOKIE = "db_primary_until"
+
+
+def engine_options(url: str) -> dict:
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "statement_cache_size": STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": PREPARED_STATEMENT_CACHE_SIZE,
+            "server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)},
+        }
+    return options
+
 
 engine = create_async_engine(
     postgres_url,
     # echo=True,  # ← ВКЛЮЧИ ЭТО
-    # pool_pre_ping=True
+    **engine_options(postgres_url),
 )
 
 
 pg_session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
+replica_engine = (
+    create_async_engine(replica_url, **engine_options(replica_url))
+    if replica_url
+    else None
+)
+instrument_engine(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+
+pg_read_session_factory = (
+    async_sessionmaker(replica_engine, expire_on_commit=False)
+    if replica_engine is not None
+    else pg_session_factory
+)
+
 async def get_session():
     async with pg_session_factory() as session:
         yield session
 
-SessionDepPG = Annotated[AsyncSession, Depends(get_session)]
\ No newline at end of file
+SessionDepPG = Annotated[AsyncSession, Depends(get_session)]
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    pinned_until = request.cookies.get(PIN_PRIMARY_COOKIE)
+    try:
+        return pinned_until is not None and float(pinned_until) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_session(request: Request):
+    """
+    Сессия для сервисов только на чтение: реплика, если она настроена и клиент
+    недавно ничего не записывал, иначе основная база (реплика может отставать).
+    """
+    factory = (
+        pg_session_factory
+        if is_pinned_to_primary(request)
+        else pg_read_session_factory
+    )
+    async with factory() as session:
+        yield session
+
+SessionDepRead = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+async def pin_primary_after_write(request: Request, call_next):
+    """
+    Middleware: после успешного изменяющего запроса клиент на
+    REPLICA_PIN_SECONDS читает из основной базы и видит свою запись.
+    """
+    response = await call_next(request)
+    if (
+        replica_engine is not None
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+    ):
+        response.set_cookie(
+            PIN_PRIMARY_COOKIE,
+            str(time.time() + REPLICA_PIN_SECONDS),
+            max_age=REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
+def pool_stats(replica: bool = False) -> dict:
+    target = replica_engine if replica and replica_engine is not None else engine
+    return target.pool.metrics.snapshot(target.pool)
@@ -0,0 +1,114 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Одинаковый запрос столько раз за запрос к API — вероятный N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", 5))
+# Сколько самых частых выражений показывать в логе
+TOP_SHAPES = 3
+
+# $1::VARCHAR (asyncpg), ? (sqlite), %(name)s; списки IN сворачиваются в один ?
+_param = r"(?:\$\d+(?:::\w+(?:\[\])?)?|\?|%\(\w+\)s)"
+_placeholders = re.compile(rf"{_param}(?:\s*,\s*{_param})*")
+_spaces = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Текст запроса без параметров: IN ($1, $2, $3) и IN ($1) — одна форма."""
+    return _placeholders.sub("?", _spaces.sub(" ", statement)).strip()
+
+
+class QueryStats:
+    """Запросы к базе в рамках одного запроса к API."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter[str] = Counter()
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.duration += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common(TOP_SHAPES)
+            if count >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+# Вызываются после каждого запроса к API со статистикой (плагин pytest бюджета)
+request_observers: list[Callable[[Request, QueryStats], None]] = []
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def start_query_stats() -> QueryStats:
+    """Начинает счет запросов в текущем контексте (запрос API, тест, скрипт)."""
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Подписывает движок на события курсора; контекст greenlet'а берется из asyncio."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.add(statement, time.perf_counter() - start)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+async def query_counter_middleware(request: Request, call_next):
+    """
+    Считает запросы к базе и время в базе на запрос к API: заголовок
+    Server-Timing и предупреждение в лог, если одно выражение повторяется.
+    """
+    stats = start_query_stats()
+    response = await call_next(request)
+    response.headers.append("Server-Timing", stats.server_timing())
+    for observer in request_observers:
+        observer(request, stats)
+
+    repeated = stats.repeated()
+    if repeated:
+        logger.warning(
+            "%s %s: %d queries, %.1f ms, repeated: %s",
+            request.method,
+            request.url.path,
+            stats.count,
+            stats.duration * 1000,
+            "; ".join(f"{count}x {shape[:200]}" for shape, count in repeated),
+        )
+    return response
@@ -1,13 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from api_v1.CRM.crm_main import router as crm_router
 from api_v1.backup_maker.backup_view import router as backup_router
+from api_v1.internal.internal_view import router as internal_router
+from api_v1.CRM.crm_search.search_index import search_index
+from api_v1.CRM.crm_materials.material_stock_service import fold_balances_forever
+from core.metrics import MetricsMiddleware, render_metrics
+from core.postgres_db import pg_session_factory, pin_primary_after_write, pool_stats
+from core.query_counter import query_counter_middleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Индекс поиска строится один раз, дальше его обновляют сервисы записи
+    async with pg_session_factory() as session:
+        await search_index.build(session)
+    # Дельты склада сворачиваются в остатки и count_left в фоне
+    folder = asyncio.create_task(fold_balances_forever(pg_session_factory))
+    yield
+    folder.cancel()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(crm_router)
 app.include_router(backup_router)
+app.include_router(internal_router)
 
 
 # CORS настройки
@@ -16,6 +38,10 @@ origins = [
     "http://localhost:3000",
 ]
 
+app.add_middleware(MetricsMiddleware)
+app.middleware("http")(pin_primary_after_write)
+app.middleware("http")(query_counter_middleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -31,4 +57,12 @@ def read_root():
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(
+        render_metrics(pool=pool_stats()),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -0,0 +1,181 @@
+"""
+Проверка индексов: прогоняет основные запросы сервисов, делает EXPLAIN
+каждого SQL и падает (exit 1), если на большой таблице остался Seq Scan
+с фильтром, который отбирает малую долю строк. Работает только с
+PostgreSQL (EXPLAIN FORMAT JSON, pg_class): на другой базе выходит с кодом 2.
+В CI запускается на засеянной базе (.github/workflows/index-advisor.yml).
+
+Запуск из back/ против заполненной базы:
+    python -m tools.index_advisor [--min-rows 10000] [--max-selectivity 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from datetime import date, timedelta
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.CRM.crm_expenses_and_income.expenses_schemas import ExpensesFilterSchema
+from api_v1.CRM.crm_expenses_and_income.expenses_service import (
+    get_all_expenses_service,
+)
+from api_v1.CRM.crm_materials.crm_materials_services import get_materials_service
+from api_v1.CRM.crm_materials.materials_schemas import MaterialFilterSchema
+from api_v1.CRM.crm_orders.crm_orders_services import (
+    get_orders_service,
+    get_orders_summary_service,
+)
+from api_v1.CRM.crm_orders.order_CRUD import get_order
+from api_v1.CRM.crm_orders.orders_schemas import OrderFilterSchema
+from api_v1.CRM.crm_products.product_CRUD import get_product
+from api_v1.CRM.crm_products.products_schemas import ProductFilterSchema
+from api_v1.CRM.crm_products.products_services import get_products_service
+from api_v1.CRM.statistics.statistics_schemas import (
+    StatisticsFilterSchema,
+    StatisticsGraphFilterSchema,
+)
+from api_v1.CRM.statistics.statistics_service import (
+    crm_get_month_statistics,
+    crm_get_period_graph,
+)
+from core.models import Order, Product, Material, ExpenseModel
+from core.postgres_db import engine, pg_session_factory
+
+
+async def run_scenarios(session: AsyncSession):
+    """Основные запросы списков, карточек и статистики с типичными фильтрами."""
+    order: Order | None = await session.scalar(select(Order).limit(1))
+    product_id = await session.scalar(select(Product.id).limit(1))
+    material_type = await session.scalar(select(Material.material_type).limit(1))
+    expense_type = await session.scalar(select(ExpenseModel.expense_type).limit(1))
+    month_ago = date.today() - timedelta(days=30)
+
+    await get_orders_service(session, OrderFilterSchema())
+    await get_orders_service(session, OrderFilterSchema(status=5))
+    await get_orders_service(
+        session, OrderFilterSchema(created_date_from=month_ago, sort_order="desc")
+    )
+    await get_orders_summary_service(session, OrderFilterSchema(limit=100))
+
+    if order is not None:
+        await get_orders_service(session, OrderFilterSchema(customer=order.customer))
+        await get_orders_service(session, OrderFilterSchema(search=order.id))
+        if order.client_id:
+            await get_orders_service(
+                session, OrderFilterSchema(client_id=order.client_id)
+            )
+        await get_order(session=session, order_id=order.id)
+
+    await get_products_service(session, ProductFilterSchema())
+    if product_id is not None:
+        await get_product(session=session, product_id=product_id)
+
+    await get_materials_service(session, MaterialFilterSchema())
+    if material_type is not None:
+        await get_materials_service(
+            session, MaterialFilterSchema(material_type=material_type)
+        )
+
+    await get_all_expenses_service(
+        session, ExpensesFilterSchema(actual_date_from=month_ago)
+    )
+    if expense_type is not None:
+        await get_all_expenses_service(
+            session,
+            ExpensesFilterSchema(actual_date_from=month_ago, expense_type=expense_type),
+        )
+
+    await crm_get_month_statistics(
+        session, StatisticsFilterSchema(date=date.today(), statistics_type="all")
+    )
+    await crm_get_period_graph(
+        session,
+        StatisticsGraphFilterSchema(
+            date_from=date.today() - timedelta(days=365),
+            date_to=date.today(),
+            granularity="month",
+        ),
+    )
+
+
+def seq_scans(plan: dict):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN-проверка индексов")
+    parser.add_argument("--min-rows", type=int, default=10_000)
+    parser.add_argument("--max-selectivity", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print(
+            f"index_advisor: нужен PostgreSQL, а DATABASE_URL указывает на "
+            f"{engine.dialect.name} (EXPLAIN FORMAT JSON и pg_class есть только в нем)",
+            file=sys.stderr,
+        )
+        return 2
+
+    statements: list[tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with pg_session_factory() as session:
+            await run_scenarios(session)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    failures = 0
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'")
+        )
+        table_rows = {name: rows for name, rows in result.all()}
+
+        seen = set()
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + statement, parameters
+            )
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+
+            for node in seq_scans(plan[0]["Plan"]):
+                table = node["Relation Name"]
+                rows = table_rows.get(table, 0)
+                if rows < args.min_rows or "Filter" not in node:
+                    continue
+
+                selectivity = node["Plan Rows"] / rows
+                if selectivity > args.max_selectivity:
+                    continue
+
+                failures += 1
+                print(f"SEQ SCAN {table} ({int(rows)} rows), filter: {node['Filter']}")
+                print(f"    {' '.join(statement.split())[:300]}")
+
+    print(f"checked {len(seen)} statements, {failures} seq scans on large tables")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,446 @@
+"""
+Нагрузочный прогон CRM API в процессе: httpx.AsyncClient поверх ASGI
+приложения, без сети. Каждый воркер крутит сценарии: чтение (списки с
+фильтрами и проекциями, карточки, котировки, склад, статистика, поиск) и,
+с долей --write-ratio, полный цикл записи (материал -> продукт с составом
+и тирами -> заказ со строками, оплатой, завершением и откатом -> удаление).
+
+По каждому маршруту печатаются p50/p95/p99, ошибки и запросов к базе на
+запрос (из заголовка Server-Timing). --save пишет результат в JSON,
+--compare сравнивает с сохраненным и завершается с кодом 1, если p95 или
+число запросов к базе выросли больше допустимого.
+
+Запуск из back/ против заполненной базы (python -m tools.seed_data):
+    python -m tools.load_bench [--iterations 50] [--concurrency 8]
+        [--write-ratio 0.2] [--save bench.json] [--compare baseline.json]
+        [--max-regression 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import httpx
+from sqlalchemy import func, select
+
+import main
+from core.models import ExpenseModel, Material, Order, Product
+from core.postgres_db import pg_session_factory
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class Bench:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.queries: dict[str, list[int]] = defaultdict(list)
+        self.errors: Counter[str] = Counter()
+
+    async def call(self, method: str, route: str, *, path: dict | None = None, **kwargs):
+        """Запрос к маршруту route (шаблон FastAPI), path — значения параметров пути."""
+        url = route.format(**path) if path else route
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        key = f"{method} {route}"
+        self.latencies[key].append(time.perf_counter() - start)
+        match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+        if match:
+            self.queries[key].append(int(match.group(1)))
+        if response.status_code >= 400:
+            self.errors[key] += 1
+        return response
+
+    def report(self) -> dict:
+        result = {}
+        for key in sorted(self.latencies):
+            latencies = self.latencies[key]
+            queries = self.queries.get(key) or [0]
+            result[key] = {
+                "n": len(latencies),
+                "errors": self.errors[key],
+                "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+                "queries": round(sum(queries) / len(queries), 1),
+            }
+        return result
+
+
+def body(response: httpx.Response) -> dict | None:
+    """JSON успешного ответа; None, если ответ с ошибкой (она уже учтена в errors)."""
+    return response.json() if response.status_code < 400 else None
+
+
+async def sample_ids(limit: int = 200) -> dict[str, list]:
+    async with pg_session_factory() as session:
+
+        async def ids(column) -> list:
+            return list(
+                await session.scalars(select(column).order_by(func.random()).limit(limit))
+            )
+
+        return {
+            "orders": await ids(Order.id),
+            "products": await ids(Product.id),
+            "materials": await ids(Material.id),
+            "expenses": await ids(ExpenseModel.id),
+        }
+
+
+async def read_flow(bench: Bench, ids: dict, rng: random.Random):
+    call = bench.call
+    await call("GET", "/crm/orders/", params={"limit": 20})
+    await call("GET", "/crm/orders/", params={"limit": 20, "status": rng.randint(0, 6)})
+    await call("GET", "/crm/orders/", params={"limit": 50, "fields": "id,status,total_price"})
+    await call("GET", "/crm/orders/summary", params={"limit": 50})
+    if ids["orders"]:
+        await call("GET", "/crm/orders/{order_id}", path={"order_id": rng.choice(ids["orders"])})
+
+    await call("GET", "/crm/products/", params={"limit": 20})
+    if ids["products"]:
+        product_id = rng.choice(ids["products"])
+        await call("GET", "/crm/products/{product_id}", path={"product_id": product_id})
+        await call(
+            "GET",
+            "/crm/products/{product_id}/quote",
+            path={"product_id": product_id},
+            params={"quantities": [1, 50, 150, 1500]},
+        )
+
+    await call("GET", "/crm/materials/", params={"limit": 20})
+    await call("GET", "/crm/materials/forecast")
+    if ids["materials"]:
+        material_id = rng.choice(ids["materials"])
+        await call("GET", "/crm/materials/{material_id}", path={"material_id": material_id})
+        await call(
+            "GET", "/crm/materials/{material_id}/stock", path={"material_id": material_id}
+        )
+
+    await call("GET", "/crm/expenses/", params={"limit": 20})
+    if ids["expenses"]:
+        await call(
+            "GET", "/crm/expenses/{expense_id}", path={"expense_id": rng.choice(ids["expenses"])}
+        )
+
+    today = date.today()
+    await call(
+        "GET", "/crm/statistics/month", params={"date": today, "statistics_type": "all"}
+    )
+    await call("GET", "/crm/statistics/graphs")
+    await call(
+        "GET",
+        "/crm/statistics/period",
+        params={"date_from": today - timedelta(days=365), "date_to": today},
+    )
+    await call("GET", "/crm/search/", params={"q": rng.choice(("стол", "мат", "клиент"))})
+
+
+async def write_flow(bench: Bench, ids: dict, rng: random.Random):
+    """
+    Полный цикл записи на своих объектах; удаляет все, что создал. Если
+    создание или чтение не удалось, сценарий обрывается: ошибка уже в отчете,
+    а брошенные объекты с уникальными именами не мешают следующим прогонам.
+    """
+    call = bench.call
+    # Продукт с тем же именем — 409: у каждого цикла свои имена
+    tag = uuid.uuid4().hex[:8]
+
+    material = body(
+        await call(
+            "POST",
+            "/crm/materials/",
+            json={
+                "name": f"bench material {tag}",
+                "material_type": "bench",
+                "pack_price": 100,
+                "count_in_one_pack": 10,
+                "count_left": 100_000,
+            },
+        )
+    )
+    if material is None:
+        return
+    material_id = material["id"]
+    mat = {"material_id": material_id}
+    await call("PATCH", "/crm/materials/{material_id}/change_count", path=mat, json={"delta": 10})
+    await call("PATCH", "/crm/materials/{material_id}", path=mat, json={"description": "bench"})
+
+    product = body(
+        await call("POST", "/crm/products/", json={"name": f"bench product {tag}", "size": "1x1"})
+    )
+    if product is None:
+        return
+    product_id = product["id"]
+    prod = {"product_id": product_id}
+    await call(
+        "POST",
+        "/crm/product_rels/material/{product_id}",
+        path=prod,
+        json={"material_id": material_id, "quantity_in_one_mat_unit": 3},
+    )
+    await call(
+        "POST",
+        "/crm/product_rels/price/{product_id}",
+        path=prod,
+        json={"start": 1, "end": 100_000, "price": 100},
+    )
+    product = body(await call("GET", "/crm/products/{product_id}", path=prod))
+    if product is None or not product["material_detail"] or not product["price_tier"]:
+        return
+    product_material_id = product["material_detail"][0]["id"]
+    price_id = product["price_tier"][0]["id"]
+    await call(
+        "PATCH",
+        "/crm/product_rels/material/{product_material_id}",
+        path={"product_material_id": product_material_id},
+        params={"quantity_in_one_mat_unit": 4},
+    )
+    await call(
+        "PATCH", "/crm/product_rels/price/{price_id}", path={"price_id": price_id}, json={"price": 120}
+    )
+    await call("POST", "/crm/product_rels/reprice/{product_id}", path=prod, params={"dry_run": True})
+    await call("PATCH", "/crm/products/{product_id}", path=prod, json={"description": "bench"})
+    copy = body(await call("POST", "/crm/products/{product_id}/copy", path=prod))
+    if copy is None:
+        return
+    copy_id = copy["id"]
+
+    created = body(await call("POST", "/crm/orders/", json={"customer": "bench"}))
+    if created is None:
+        return
+    order_id = created["id"]
+    order = {"order_id": order_id}
+    await call(
+        "POST",
+        "/crm/orders/{order_id}/order_products/",
+        path=order,
+        json={"product_id": product_id, "quantity": 5},
+    )
+    await call(
+        "POST",
+        "/crm/orders/{order_id}/order_products/bulk",
+        path=order,
+        json=[{"product_id": copy_id, "quantity": 3}],
+    )
+    detail = body(await call("GET", "/crm/orders/{order_id}", path=order))
+    if detail is None or not detail["products_detail"]:
+        return
+    line = detail["products_detail"][0]
+    line_path = {"order_id": order_id, "order_product_id": line["id"]}
+    await call(
+        "PATCH",
+        "/crm/orders/{order_id}/order_products/{order_product_id}",
+        path=line_path,
+        params={"new_count": 7},
+    )
+    if line["materials"]:
+        await call(
+            "PATCH",
+            "/crm/{order_id}/{order_product_id}/{order_product_material_id}",
+            path={**line_path, "order_product_material_id": line["materials"][0]["id"]},
+            params={"actual_usage": 3},
+        )
+
+    await call(
+        "PATCH",
+        "/crm/materials/{material_id}",
+        path=mat,
+        params={"propagate_price": True},
+        json={"pack_price": 120},
+    )
+    await call("POST", "/crm/{order_id}/costs/", path=order, json={"cost": 1, "description": "bench"})
+    costs = body(
+        await call("GET", "/crm/orders/{order_id}", path=order, params={"expand": "costs", "fields": "id"})
+    )
+    if costs and costs["costs"]:
+        await call(
+            "DELETE",
+            "/crm/{order_id}/costs/{order_cost_id}",
+            path={**order, "order_cost_id": costs["costs"][0]["id"]},
+        )
+    await call(
+        "PATCH", "/crm/product_rels/price/{price_id}", path={"price_id": price_id}, json={"price": 110}
+    )
+    await call("POST", "/crm/product_rels/reprice/{product_id}", path=prod)
+    await call("PATCH", "/crm/orders/{order_id}", path=order, json={"description": "bench"})
+
+    state = body(
+        await call(
+            "GET",
+            "/crm/orders/{order_id}",
+            path=order,
+            params={"fields": "total_price,paid,descriptions"},
+        )
+    )
+    # PATCH отвечает только сообщением: что описание сменилось, видно по GET
+    if state is not None and state["descriptions"] != "bench":
+        bench.errors["PATCH /crm/orders/{order_id}"] += 1
+    if state is not None:
+        await call(
+            "PATCH",
+            "/crm/orders/append_payment/{order_id}",
+            path=order,
+            params={"payment": state["total_price"] - state["paid"]},
+        )
+    await call("PATCH", "/crm/orders/order_complete/{order_id}", path=order)
+    await call("PATCH", "/crm/orders/order_status_revert_to_created/{order_id}", path=order)
+    await call("DELETE", "/crm/orders/{order_id}/order_products/{order_product_id}", path=line_path)
+    await call("DELETE", "/crm/orders/{order_id}", path=order)
+
+    await call(
+        "DELETE",
+        "/crm/product_rels/material/{product_material_id}",
+        path={"product_material_id": product_material_id},
+    )
+    await call("DELETE", "/crm/product_rels/price/{price_id}", path={"price_id": price_id})
+    await call("DELETE", "/crm/products/{product_id}", path={"product_id": copy_id})
+    await call("DELETE", "/crm/products/{product_id}", path=prod)
+    await call("DELETE", "/crm/materials/{material_id}", path=mat)
+
+    expense = body(
+        await call(
+            "POST",
+            "/crm/expenses/",
+            json={
+                "expense_type": "bench",
+                "periodicity": "once",
+                "amount": 10,
+                "actual_date": date.today().isoformat(),
+            },
+        )
+    )
+    if expense is None:
+        return
+    exp = {"expense_id": expense["id"]}
+    await call("GET", "/crm/expenses/{expense_id}", path=exp)
+    await call("PATCH", "/crm/expenses/{expense_id}", path=exp, json={"amount": 20})
+    await call("DELETE", "/crm/expenses/{expense_id}", path=exp)
+
+
+async def worker(bench: Bench, ids: dict, iterations: int, write_ratio: float, seed: int):
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        if rng.random() < write_ratio:
+            await write_flow(bench, ids, rng)
+        else:
+            await read_flow(bench, ids, rng)
+
+
+def print_report(report: dict, baseline: dict | None):
+    header = f"{'route':<72} {'n':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}"
+    print(header + ("   p95 vs base" if baseline else ""))
+    for key, row in report.items():
+        line = (
+            f"{key:<72} {row['n']:>5} {row['errors']:>4} {row['p50_ms']:>8.2f}"
+            f" {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['queries']:>6.1f}"
+        )
+        base = (baseline or {}).get(key)
+        if base and base["p95_ms"]:
+            line += f"   {row['p95_ms'] / base['p95_ms'] - 1:+7.0%}"
+        print(line)
+
+
+def regressions(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    found = []
+    for key, row in report.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if base["p95_ms"] and row["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            found.append(f"{key}: p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+        # средние плавают от ветвлений сценария; лишний запрос целиком — сигнал N+1
+        if row["queries"] - base["queries"] >= 1:
+            found.append(f"{key}: queries {base['queries']} -> {row['queries']}")
+    return found
+
+
+async def main_async():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон CRM API")
+    parser.add_argument("--iterations", type=int, default=50, help="сценариев на воркер")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="сохранить результат в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["routes"]
+
+    app = main.app
+    async with app.router.lifespan_context(app):
+        ids = await sample_ids()
+        # 500 считаются ошибкой маршрута, а не роняют прогон
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            bench = Bench(client)
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    worker(bench, ids, args.iterations, args.write_ratio, args.seed + index)
+                    for index in range(args.concurrency)
+                )
+            )
+            elapsed = time.perf_counter() - started
+
+    report = bench.report()
+    print_report(report, baseline)
+    total = sum(row["n"] for row in report.values())
+    errors = sum(row["errors"] for row in report.values())
+    print(f"\n{total} requests, {errors} errors, {elapsed:.1f}s, {total / elapsed:.0f} req/s")
+
+    covered = {key for key in report}
+    missing = [
+        f"{method} {route.path}"
+        for route in app.routes
+        if route.path.startswith("/crm")
+        for method in getattr(route, "methods", ())
+        if f"{method} {route.path}" not in covered
+    ]
+    if missing:
+        print("not covered: " + ", ".join(missing))
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(
+                {
+                    "meta": {
+                        "date": date.today().isoformat(),
+                        "dialect": pg_session_factory.kw["bind"].dialect.name,
+                        "iterations": args.iterations,
+                        "concurrency": args.concurrency,
+                        "write_ratio": args.write_ratio,
+                        "elapsed_s": round(elapsed, 2),
+                    },
+                    "routes": report,
+                },
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if baseline is not None:
+        found = regressions(report, baseline, args.max_regression)
+        if found:
+            print("regressions:\n  " + "\n  ".join(found))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,328 @@
+"""
+Микробенчмарки горячих функций моделей и схем: цена продукта по тирам,
+materials_count, Order.products_price (sum через __radd__), Cart.total_price,
+OrderSchema.from_orm_with_rels и ProductSchema.from_orm_with_materials.
+
+Графы объектов собираются в памяти (без базы) трех размеров: small, medium
+и large — число строк заказа, материалов в строке, тиров и позиций корзины.
+Время — timeit с автоподбором числа вызовов, лучший и медиана из --repeat
+серий; память — tracemalloc за один вызов: пик и число живых блоков.
+--save пишет результат в JSON, --compare сравнивает с сохраненным и
+завершается с кодом 1, если медиана или пик памяти выросли больше допустимого.
+
+Запуск из back/ (DATABASE_URL нужен только для импорта core, соединения нет):
+    python -m tools.model_bench [--repeat 7] [--only order] [--save bench.json]
+        [--compare baseline.json] [--max-regression 0.2]
+"""
+
+import argparse
+import gc
+import json
+import random
+import statistics
+import sys
+import timeit
+import tracemalloc
+from datetime import date, datetime
+
+from api_v1.CRM.crm_orders.orders_schemas import OrderSchema
+from api_v1.CRM.crm_products.products_schemas import ProductSchema
+from api_v1.utils.order_material_calculate import materials_count
+from core.models import (
+    Cart,
+    CartProductModel,
+    Material,
+    Order,
+    OrderAddCostsModel,
+    OrderProductMaterial,
+    OrderProductModel,
+    Product,
+    ProductMaterialModel,
+    ProductPriceTier,
+)
+from core.models.product_price_table import invalidate_price_table
+
+# Размер графа: строк заказа, материалов на строку, тиров, позиций корзины, доп. расходов
+SIZES = {
+    "small": {"lines": 1, "materials": 2, "tiers": 2, "cart": 1, "costs": 0},
+    "medium": {"lines": 10, "materials": 5, "tiers": 4, "cart": 10, "costs": 2},
+    "large": {"lines": 100, "materials": 10, "tiers": 8, "cart": 100, "costs": 10},
+}
+# Количества, по которым считается цена: внутри тиров, на границах и вне их
+QUANTITIES = (1, 9, 10, 49, 50, 99, 100, 499, 500, 10_000)
+CREATED = datetime(2026, 1, 1, 9, 0)
+
+
+class GraphFactory:
+    """Несохраненные модели с заполненными связями; id задаются вручную."""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.next_id = 0
+
+    def id(self) -> int:
+        self.next_id += 1
+        return self.next_id
+
+    def material(self) -> Material:
+        index = self.id()
+        return Material(
+            id=f"m{index}",
+            name=f"материал {index}",
+            material_type="бумага",
+            detail="a4",
+            pack_price=50_000,
+            one_item_price=100,
+            count_in_one_pack=500,
+            count_left=1000,
+            version=1,
+        )
+
+    def product(self, tiers: int, materials: int) -> Product:
+        product = Product(
+            id=f"p{self.id()}",
+            name="визитка",
+            size="90x50",
+            detail="мелованная",
+            description=None,
+            create_at=CREATED,
+            status=1,
+        )
+        # Тиры идут подряд: 1-9, 10-49, 50-99, ... с убывающей ценой
+        bounds = [1, 10, 50, 100, 500, 1000, 5000, 10_000, 50_000][: tiers + 1]
+        product.price_tier = [
+            ProductPriceTier(
+                id=self.id(),
+                product_id=product.id,
+                start=start,
+                end=end - 1,
+                price=(tiers - position) * 1000,
+                description=None,
+            )
+            for position, (start, end) in enumerate(zip(bounds, bounds[1:]))
+        ]
+        product.material_detail = [
+            ProductMaterialModel(
+                id=self.id(),
+                product_id=product.id,
+                material=material,
+                material_id=material.id,
+                quantity_in_one_mat_unit=self.rng.randint(1, 20),
+            )
+            for material in (self.material() for _ in range(materials))
+        ]
+        return product
+
+    def order(self, size: dict) -> Order:
+        order = Order(
+            id=f"o{self.id()}",
+            status=2,
+            total_price=0,
+            materials_price=0,
+            customer="клиент",
+            descriptions=None,
+            created_date=CREATED,
+            paid=0,
+            version=1,
+        )
+        for _ in range(size["lines"]):
+            product = self.product(size["tiers"], size["materials"])
+            quantity = self.rng.choice(QUANTITIES)
+            line = OrderProductModel(
+                id=self.id(),
+                order_id=order.id,
+                product=product,
+                product_id=product.id,
+                product_price=product.give_product_price(quantity),
+                quantity=quantity,
+            )
+            line.materials = [
+                OrderProductMaterial(
+                    id=self.id(),
+                    order_product_id=line.id,
+                    material=detail.material,
+                    material_id=detail.material_id,
+                    qty_prod_in_mat=detail.quantity_in_one_mat_unit,
+                    material_price=detail.material.one_item_price,
+                    budged_usage=materials_count(detail.quantity_in_one_mat_unit, quantity),
+                    actual_usage=0,
+                )
+                for detail in product.material_detail
+            ]
+            order.products_detail.append(line)
+        order.costs = [
+            OrderAddCostsModel(
+                id=self.id(), order_id=order.id, cost=10_000, description="доставка"
+            )
+            for _ in range(size["costs"])
+        ]
+        order.total_price = order.products_price
+        return order
+
+    def cart(self, items: int) -> Cart:
+        cart = Cart(id=f"c{self.id()}")
+        cart.products = [
+            CartProductModel(
+                id=self.id(),
+                cart_id=cart.id,
+                product_id=f"p{index}",
+                quantity=self.rng.choice(QUANTITIES),
+                product_price=self.rng.randint(1, 100) * 100,
+            )
+            for index in range(items)
+        ]
+        return cart
+
+
+def build_cases(size_name: str, factory: GraphFactory) -> dict:
+    """Имя случая -> вызов без аргументов на готовом графе."""
+    size = SIZES[size_name]
+    order = factory.order(size)
+    product = factory.product(size["tiers"], size["materials"])
+    cart = factory.cart(size["cart"])
+    pairs = [
+        (factory.rng.randint(1, 50), factory.rng.choice(QUANTITIES))
+        for _ in range(size["lines"] * size["materials"])
+    ]
+
+    def price_cold():
+        # Первый расчет после изменения тиров: таблица компилируется заново
+        invalidate_price_table(product.id)
+        return [product.give_product_price(quantity) for quantity in QUANTITIES]
+
+    return {
+        f"product.give_product_price[{size_name}]": lambda: [
+            product.give_product_price(quantity) for quantity in QUANTITIES
+        ],
+        f"product.give_product_price.cold[{size_name}]": price_cold,
+        f"utils.materials_count[{size_name}]": lambda: [
+            materials_count(in_one, quantity) for in_one, quantity in pairs
+        ],
+        f"order.products_price[{size_name}]": lambda: order.products_price,
+        f"cart.total_price[{size_name}]": lambda: cart.total_price,
+        f"OrderSchema.from_orm_with_rels[{size_name}]": lambda: OrderSchema.from_orm_with_rels(
+            order
+        ),
+        f"ProductSchema.from_orm_with_materials[{size_name}]": lambda: ProductSchema.from_orm_with_materials(
+            product
+        ),
+    }
+
+
+def measure_time(func, repeat: int) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "best_us": round(min(runs), 3),
+        "median_us": round(statistics.median(runs), 3),
+        "calls": number,
+    }
+
+
+def measure_memory(func) -> dict:
+    func()  # прогрев: кэши и ленивые атрибуты не считаются
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        blocks_before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.reset_peak()
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks_after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        "peak_kb": round((peak - before) / 1024, 2),
+        "retained_kb": round((current - before) / 1024, 2),
+        "blocks": blocks_after - blocks_before,
+    }
+
+
+def print_report(report: dict, baseline: dict | None):
+    header = f"{'case':<52} {'best us':>11} {'median us':>11} {'peak KB':>9} {'blocks':>7}"
+    print(header + ("   median vs base" if baseline else ""))
+    for key, row in report.items():
+        line = (
+            f"{key:<52} {row['best_us']:>11.2f} {row['median_us']:>11.2f}"
+            f" {row['peak_kb']:>9.2f} {row['blocks']:>7}"
+        )
+        base = (baseline or {}).get(key)
+        if base and base["median_us"]:
+            line += f"   {row['median_us'] / base['median_us'] - 1:+7.0%}"
+        print(line)
+
+
+def regressions(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    found = []
+    for key, row in report.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if base["median_us"] and row["median_us"] > base["median_us"] * (1 + max_regression):
+            found.append(f"{key}: median {base['median_us']} -> {row['median_us']} us")
+        # пик памяти детерминирован, кроме мелочи от аллокатора
+        if row["peak_kb"] > base["peak_kb"] * (1 + max_regression) + 1:
+            found.append(f"{key}: peak {base['peak_kb']} -> {row['peak_kb']} KB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки моделей и схем")
+    parser.add_argument("--repeat", type=int, default=7, help="серий замера времени")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=list(SIZES))
+    parser.add_argument("--only", help="только случаи, в имени которых есть подстрока")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="сохранить результат в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["cases"]
+
+    factory = GraphFactory(args.seed)
+    # собственные аллокации tracemalloc и снимков вычитаются из каждого случая
+    overhead = measure_memory(lambda: None)
+    report = {}
+    for size_name in args.sizes:
+        for name, func in build_cases(size_name, factory).items():
+            if args.only and args.only not in name:
+                continue
+            memory = measure_memory(func)
+            report[name] = measure_time(func, args.repeat) | {
+                key: round(memory[key] - overhead[key], 2) for key in memory
+            }
+
+    print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(
+                {
+                    "meta": {
+                        "date": date.today().isoformat(),
+                        "python": sys.version.split()[0],
+                        "repeat": args.repeat,
+                        "seed": args.seed,
+                    },
+                    "cases": report,
+                },
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+    if baseline is not None:
+        found = regressions(report, baseline, args.max_regression)
+        if found:
+            print("regressions:\n  " + "\n  ".join(found))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Плагин pytest: бюджет запросов к базе на один запрос к API.
+
+    @pytest.mark.query_budget(6)
+    def test_orders_list(client): ...
+
+Тест падает, если хоть один запрос к API за время теста сделал больше
+запросов к базе, чем указано; в сообщении — самые частые выражения.
+--query-budget=N задает бюджет для тестов без маркера.
+
+Подключение из back/:
+    python -m pytest -p tools.pytest_query_budget
+"""
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--query-budget",
+        type=int,
+        default=None,
+        help="бюджет запросов к базе на запрос к API для тестов без маркера",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(n): не больше n запросов к базе на один запрос к API",
+    )
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker("query_budget")
+    budget = marker.args[0] if marker else item.config.getoption("query_budget")
+    if budget is None:
+        return (yield)
+
+    # импорт core поднимает движок — только когда бюджет действительно нужен
+    from core.query_counter import QueryStats, request_observers
+
+    over_budget: list[str] = []
+
+    def observe(api_request, stats: QueryStats):
+        if stats.count > budget:
+            shapes = "\n".join(
+                f"    {count}x {shape[:200]}"
+                for shape, count in stats.shapes.most_common(3)
+            )
+            over_budget.append(
+                f"{api_request.method} {api_request.url.path}: "
+                f"{stats.count} queries > {budget}\n{shapes}"
+            )
+
+    request_observers.append(observe)
+    try:
+        result = yield
+    finally:
+        request_observers.remove(observe)
+
+    if over_budget:
+        pytest.fail("query budget exceeded:\n" + "\n".join(over_budget), pytrace=False)
+    return result
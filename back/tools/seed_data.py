@@ -0,0 +1,484 @@
+"""
+Генератор синтетических данных CRM: материалы, продукты с составом
+(product_material_association) и тирами цен, заказы со строками, расходом
+материалов и доп. расходами, расходы. Объем — от 10k до 1M заказов.
+
+Журнал склада заполняется так же, как его бэкфиллит миграция 5d1e8a2b7c40:
+резерв открытых заказов, списание завершенных и начальный остаток, при
+котором on_hand по журналу равен count_left; material_balances — уже
+свернутый снимок журнала.
+
+В Postgres строки заливаются через COPY (asyncpg copy_records_to_table),
+в SQLite — executemany. Первичные ключи строк связей назначаются заранее,
+после заливки сдвигаются последовательности и пересчитывается daily_stats.
+
+Запуск из back/ (база берется из DATABASE_URL):
+    python -m tools.seed_data --orders 100000 [--materials 300] [--products 1000]
+        [--expenses 20000] [--days 730] [--batch 5000] [--seed 1]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, UTC
+
+from sqlalchemy import Table, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_v1.CRM.statistics.daily_stats_service import rebuild_daily_stats
+from api_v1.utils.order_material_calculate import materials_count
+from core.models import (
+    ExpenseModel,
+    Material,
+    MaterialBalanceModel,
+    MaterialMovementModel,
+    MovementKind,
+    Order,
+    OrderAddCostsModel,
+    OrderProductMaterial,
+    OrderProductModel,
+    OrderStatus,
+    Product,
+    ProductMaterialModel,
+    ProductPriceTier,
+)
+from core.models.model_material_movements import MOVEMENT_EFFECT
+from core.postgres_db import pg_session_factory
+
+MATERIAL_TYPES = ("дерево", "металл", "ткань", "пластик", "краска", "фурнитура")
+PRODUCT_NAMES = ("стол", "стул", "шкаф", "полка", "тумба", "кровать", "диван")
+COST_NAMES = ("доставка", "сборка", "упаковка", "подъем на этаж")
+EXPENSE_TYPES = ("аренда", "зарплата", "коммунальные", "реклама", "закупка")
+PERIODICITIES = ("once", "daily", "monthly", "yearly")
+
+# Суммы в тийинах лежат в int4 (orders, daily_stats): цены и количества
+# подобраны так, чтобы дневной итог при 1M заказов за 2 года не переполнялся
+MAX_QUANTITY = 100
+
+# Доли статусов заказов
+STATUS_WEIGHTS = {
+    OrderStatus.CREATED: 20,
+    OrderStatus.IN_PROGRESS: 15,
+    OrderStatus.READY: 10,
+    OrderStatus.SHIPPED: 5,
+    OrderStatus.COMPLETED: 45,
+    OrderStatus.CANCELED: 5,
+}
+
+
+class Seeder:
+    def __init__(self, session: AsyncSession, rng: random.Random, days: int):
+        self.session = session
+        self.rng = rng
+        self.now = datetime.now(UTC).replace(tzinfo=None)
+        self.days = days
+        self.is_postgres = session.get_bind().dialect.name == "postgresql"
+        self.next_ids: dict[str, int] = {}
+        # Итоги журнала по материалам: списано завершенными, в резерве у открытых
+        self.consumed: dict[str, int] = defaultdict(int)
+        self.reserved: dict[str, int] = defaultdict(int)
+
+    def uuid(self) -> str:
+        return f"{self.rng.getrandbits(128):032x}"
+
+    def random_date(self) -> datetime:
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    async def reserve_ids(self, table: Table, count: int) -> int:
+        """Первый id блока из count строк таблицы с целочисленным ключом."""
+        if table.name not in self.next_ids:
+            current = await self.session.scalar(
+                select(func.coalesce(func.max(table.c.id), 0))
+            )
+            self.next_ids[table.name] = current + 1
+        first = self.next_ids[table.name]
+        self.next_ids[table.name] += count
+        return first
+
+    async def copy(self, table: Table, columns: tuple[str, ...], rows: list[tuple]):
+        if not rows:
+            return
+        if self.is_postgres:
+            connection = await self.session.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                table.name, records=rows, columns=columns
+            )
+        else:
+            await self.session.execute(
+                insert(table), [dict(zip(columns, row)) for row in rows]
+            )
+
+    async def fix_sequences(self):
+        if not self.is_postgres:
+            return
+        for name in self.next_ids:
+            await self.session.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                    f"(SELECT max(id) FROM {name}))"
+                )
+            )
+
+    async def seed_materials(self, count: int) -> list[tuple]:
+        rows = []
+        for index in range(count):
+            in_pack = self.rng.choice((1, 5, 10, 20, 50, 100))
+            item_price = self.rng.randint(1, 50) * 100
+            rows.append(
+                (
+                    self.uuid(),
+                    f"материал {index}",
+                    self.rng.choice(MATERIAL_TYPES),
+                    f"{self.rng.randint(1, 50)} мм",
+                    None,
+                    self.random_date(),
+                    1,
+                    item_price * in_pack,
+                    item_price,
+                    in_pack,
+                    self.rng.randint(1_000, 1_000_000),
+                )
+            )
+        await self.copy(
+            Material.__table__,
+            (
+                "id",
+                "name",
+                "material_type",
+                "detail",
+                "description",
+                "create_at",
+                "status",
+                "pack_price",
+                "one_item_price",
+                "count_in_one_pack",
+                "count_left",
+            ),
+            rows,
+        )
+        return rows
+
+    async def copy_movements(self, movements: list[tuple]):
+        """movements: (material_id, order_id, kind, quantity, created_date)."""
+        first = await self.reserve_ids(MaterialMovementModel.__table__, len(movements))
+        rows = []
+        for index, (material_id, order_id, kind, quantity, created) in enumerate(
+            movements
+        ):
+            on_hand_sign, reserved_sign = MOVEMENT_EFFECT[kind]
+            rows.append(
+                (
+                    first + index,
+                    material_id,
+                    order_id,
+                    int(kind),
+                    quantity,
+                    on_hand_sign * quantity,
+                    reserved_sign * quantity,
+                    "seed",
+                    created,
+                )
+            )
+        await self.copy(
+            MaterialMovementModel.__table__,
+            (
+                "id",
+                "material_id",
+                "order_id",
+                "kind",
+                "quantity",
+                "on_hand_delta",
+                "reserved_delta",
+                "description",
+                "created_date",
+            ),
+            rows,
+        )
+
+    async def seed_stock(self, materials: list[tuple]):
+        """
+        Начальный остаток (корректировка до всей истории) = count_left плюс все
+        списанное заказами, и свернутый снимок material_balances по журналу.
+        """
+        opened = self.now - timedelta(days=self.days, seconds=1)
+        await self.copy_movements(
+            [
+                (
+                    material[0],
+                    None,
+                    MovementKind.ADJUSTMENT,
+                    material[-1] + self.consumed[material[0]],
+                    opened,
+                )
+                for material in materials
+            ]
+        )
+        await self.copy(
+            MaterialBalanceModel.__table__,
+            ("material_id", "on_hand", "reserved", "updated_date"),
+            [
+                (material[0], material[-1], self.reserved[material[0]], self.now)
+                for material in materials
+            ],
+        )
+
+    async def seed_products(self, count: int, materials: list[tuple]) -> dict:
+        """Продукты с 1-5 материалами в составе и 2-3 тирами цены."""
+        products, boms, tiers = [], [], []
+        catalog = {}
+        for index in range(count):
+            product_id = self.uuid()
+            products.append(
+                (
+                    product_id,
+                    f"{self.rng.choice(PRODUCT_NAMES)} {index}",
+                    f"{self.rng.randint(30, 250)}x{self.rng.randint(30, 250)}",
+                    None,
+                    None,
+                    self.random_date(),
+                    1,
+                )
+            )
+            bom = [
+                (material[0], self.rng.randint(1, 20), material[8])
+                for material in self.rng.sample(
+                    materials, min(len(materials), self.rng.randint(1, 5))
+                )
+            ]
+            boms.extend((product_id, material_id, qty) for material_id, qty, _ in bom)
+
+            base = self.rng.randint(5, 100) * 100
+            bounds = ((1, 99), (100, 999), (1000, 100_000))[: self.rng.randint(2, 3)]
+            product_tiers = [
+                (start, end, int(base * (1 - 0.1 * position)) // 100 * 100)
+                for position, (start, end) in enumerate(bounds)
+            ]
+            tiers.extend((product_id, *tier) for tier in product_tiers)
+            catalog[product_id] = (product_tiers, bom)
+
+        await self.copy(
+            Product.__table__,
+            ("id", "name", "size", "detail", "description", "create_at", "status"),
+            products,
+        )
+        first = await self.reserve_ids(ProductMaterialModel.__table__, len(boms))
+        await self.copy(
+            ProductMaterialModel.__table__,
+            ("id", "product_id", "material_id", "quantity_in_one_mat_unit"),
+            [(first + index, *row) for index, row in enumerate(boms)],
+        )
+        first = await self.reserve_ids(ProductPriceTier.__table__, len(tiers))
+        await self.copy(
+            ProductPriceTier.__table__,
+            ("id", "product_id", "start", "end", "price"),
+            [(first + index, *row) for index, row in enumerate(tiers)],
+        )
+        return catalog
+
+    def status_dates(self, status: OrderStatus, created: datetime) -> tuple:
+        def after(moment: datetime) -> datetime:
+            return min(moment + timedelta(hours=self.rng.randint(1, 240)), self.now)
+
+        hiring = after(created) if status >= OrderStatus.IN_PROGRESS else None
+        ready = after(hiring) if hiring and status >= OrderStatus.READY else None
+        if status == OrderStatus.CANCELED:
+            return None, None, None, after(created)
+        completed = after(ready) if status == OrderStatus.COMPLETED else None
+        return hiring, ready, completed, None
+
+    async def seed_orders(self, count: int, catalog: dict, batch: int):
+        product_ids = list(catalog)
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        started = time.perf_counter()
+
+        for offset in range(0, count, batch):
+            size = min(batch, count - offset)
+            orders, lines, usages, costs, movements = [], [], [], [], []
+            for _ in range(size):
+                order_id = self.uuid()
+                created = self.random_date()
+                status = self.rng.choices(statuses, weights)[0]
+                dates = self.status_dates(status, created)
+                total = materials_price = 0
+                order_usage: dict[str, int] = defaultdict(int)
+
+                for product_id in self.rng.sample(
+                    product_ids, min(len(product_ids), self.rng.randint(1, 5))
+                ):
+                    tiers, bom = catalog[product_id]
+                    quantity = self.rng.randint(1, MAX_QUANTITY)
+                    price = next(
+                        (p for start, end, p in tiers if start <= quantity <= end),
+                        tiers[-1][2],
+                    )
+                    total += price * quantity
+                    lines.append([order_id, product_id, price, quantity])
+                    for material_id, qty, item_price in bom:
+                        usage = materials_count(qty, quantity)
+                        usages.append([len(lines) - 1, material_id, qty, usage, item_price])
+                        materials_price += usage * item_price
+                        order_usage[material_id] += usage
+
+                for _ in range(self.rng.choice((0, 0, 1, 2))):
+                    cost = self.rng.randint(1, 50) * 100
+                    costs.append((order_id, cost, self.rng.choice(COST_NAMES)))
+                    total -= cost
+
+                completed = status == OrderStatus.COMPLETED
+                # Журнал: завершенный заказ списал расход, открытый его держит
+                # в резерве, у отмененного резерв снят
+                if completed:
+                    for material_id, usage in order_usage.items():
+                        movements.append(
+                            (material_id, order_id, MovementKind.CONSUMPTION, usage, dates[2])
+                        )
+                        self.consumed[material_id] += usage
+                elif status != OrderStatus.CANCELED:
+                    for material_id, usage in order_usage.items():
+                        movements.append(
+                            (material_id, order_id, MovementKind.RESERVATION, usage, created)
+                        )
+                        self.reserved[material_id] += usage
+
+                share = self.rng.choice((0, 0.3, 0.5))
+                paid = total if completed else int(total * share) // 100 * 100
+                orders.append(
+                    (
+                        order_id,
+                        int(status),
+                        total,
+                        materials_price if completed else 0,
+                        f"клиент {self.rng.randint(1, count // 3 + 1)}",
+                        None,
+                        created,
+                        *dates,
+                        max(paid, 0),
+                    )
+                )
+
+            await self.copy(
+                Order.__table__,
+                (
+                    "id",
+                    "status",
+                    "total_price",
+                    "materials_price",
+                    "customer",
+                    "descriptions",
+                    "created_date",
+                    "hiring_date",
+                    "ready_date",
+                    "completed_date",
+                    "canceled_date",
+                    "paid",
+                ),
+                orders,
+            )
+            first_line = await self.reserve_ids(OrderProductModel.__table__, len(lines))
+            await self.copy(
+                OrderProductModel.__table__,
+                ("id", "order_id", "product_id", "product_price", "quantity"),
+                [(first_line + index, *line) for index, line in enumerate(lines)],
+            )
+            first = await self.reserve_ids(OrderProductMaterial.__table__, len(usages))
+            await self.copy(
+                OrderProductMaterial.__table__,
+                (
+                    "id",
+                    "order_product_id",
+                    "material_id",
+                    "qty_prod_in_mat",
+                    "budged_usage",
+                    "actual_usage",
+                    "material_price",
+                ),
+                [
+                    (first + index, first_line + line, material_id, qty, usage, usage, price)
+                    for index, (line, material_id, qty, usage, price) in enumerate(usages)
+                ],
+            )
+            first = await self.reserve_ids(OrderAddCostsModel.__table__, len(costs))
+            await self.copy(
+                OrderAddCostsModel.__table__,
+                ("id", "order_id", "cost", "description"),
+                [(first + index, *cost) for index, cost in enumerate(costs)],
+            )
+            await self.copy_movements(movements)
+            await self.session.commit()
+
+            done = offset + size
+            rate = done / (time.perf_counter() - started)
+            print(f"orders {done}/{count}  {rate:,.0f}/s", flush=True)
+
+    async def seed_expenses(self, count: int, batch: int):
+        for offset in range(0, count, batch):
+            size = min(batch, count - offset)
+            first = await self.reserve_ids(ExpenseModel.__table__, size)
+            rows = []
+            for index in range(size):
+                created = self.random_date()
+                rows.append(
+                    (
+                        first + index,
+                        self.rng.choice(EXPENSE_TYPES),
+                        self.rng.choice(PERIODICITIES),
+                        None,
+                        self.rng.randint(1, 10_000) * 1000,
+                        created,
+                        created.date(),
+                    )
+                )
+            await self.copy(
+                ExpenseModel.__table__,
+                (
+                    "id",
+                    "expense_type",
+                    "periodicity",
+                    "description",
+                    "amount",
+                    "create_at",
+                    "actual_date",
+                ),
+                rows,
+            )
+            await self.session.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Синтетические данные CRM")
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--materials", type=int, default=300)
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--expenses", type=int, default=None, help="по умолчанию orders/5")
+    parser.add_argument("--days", type=int, default=730, help="глубина истории")
+    parser.add_argument("--batch", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    async with pg_session_factory() as session:
+        seeder = Seeder(session, random.Random(args.seed), args.days)
+        materials = await seeder.seed_materials(args.materials)
+        catalog = await seeder.seed_products(args.products, materials)
+        await session.commit()
+        print(f"materials {len(materials)}, products {len(catalog)}")
+
+        await seeder.seed_orders(args.orders, catalog, args.batch)
+        await seeder.seed_stock(materials)
+        await session.commit()
+        expenses = args.expenses if args.expenses is not None else args.orders // 5
+        await seeder.seed_expenses(expenses, args.batch)
+        print(f"expenses {expenses}")
+
+        await seeder.fix_sequences()
+        days = await rebuild_daily_stats(session=session)
+        await session.commit()
+    print(f"daily_stats {days} days, done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
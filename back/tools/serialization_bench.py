@@ -0,0 +1,141 @@
+"""
+Замер сериализации страниц заказов и продуктов: старый путь (схемы pydantic
+с валидаторами -> response_model -> JSONResponse) против dump_orm + orjson.
+Страница загружается из базы один раз, замеряется только CPU на сериализацию;
+перед замером проверяется, что оба пути дают одинаковый JSON.
+
+Запуск из back/ против заполненной базы:
+    python -m tools.serialization_bench [--limit 500] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from api_v1.CRM.crm_orders.orders_schemas import OrderSchema
+from api_v1.CRM.crm_products.products_schemas import ProductSchema
+from core.ResponseModel.response_model import PaginatedResponse, paginated_json
+from core.models import (
+    Order,
+    OrderProductModel,
+    OrderProductMaterial,
+    Product,
+    ProductMaterialModel,
+)
+from core.postgres_db import pg_session_factory
+
+
+async def load_page(limit: int) -> tuple[list[Order], list[Product]]:
+    async with pg_session_factory() as session:
+        orders = (
+            await session.scalars(
+                select(Order)
+                .options(
+                    selectinload(Order.products_detail).options(
+                        selectinload(OrderProductModel.product),
+                        selectinload(OrderProductModel.materials).selectinload(
+                            OrderProductMaterial.material
+                        ),
+                    ),
+                    selectinload(Order.costs),
+                )
+                .order_by(Order.created_date.desc())
+                .limit(limit)
+            )
+        ).all()
+        products = (
+            await session.scalars(
+                select(Product)
+                .options(
+                    selectinload(Product.material_detail).selectinload(
+                        ProductMaterialModel.material
+                    ),
+                    selectinload(Product.price_tier),
+                )
+                .order_by(Product.id)
+                .limit(limit)
+            )
+        ).all()
+    return list(orders), list(products)
+
+
+async def old_path(rows, to_schema, schema) -> bytes:
+    field = create_model_field(
+        name="Response", type_=PaginatedResponse[schema], mode="serialization"
+    )
+    page = PaginatedResponse[schema](
+        items=[to_schema(row) for row in rows],
+        total=len(rows),
+        skip=0,
+        limit=max(len(rows), 1),
+        has_more=False,
+    )
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+
+async def new_path(rows, dump) -> bytes:
+    return paginated_json(
+        items=[dump(row) for row in rows],
+        total=len(rows),
+        skip=0,
+        limit=max(len(rows), 1),
+        has_more=False,
+    ).body
+
+
+async def cpu_ms(func, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        await func()
+    return (time.process_time() - start) / repeat * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Замер сериализации страниц")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    orders, products = await load_page(args.limit)
+    cases = (
+        (
+            "orders",
+            orders,
+            OrderSchema.from_orm_with_rels,
+            OrderSchema.dump_orm,
+            OrderSchema,
+        ),
+        (
+            "products",
+            products,
+            ProductSchema.from_orm_with_materials,
+            ProductSchema.dump_orm,
+            ProductSchema,
+        ),
+    )
+
+    for name, rows, to_schema, dump, schema in cases:
+        old = lambda: old_path(rows, to_schema, schema)
+        new = lambda: new_path(rows, dump)
+        if json.loads(await old()) != json.loads(await new()):
+            raise SystemExit(f"{name}: fast serializer output differs")
+
+        old_ms = await cpu_ms(old, args.repeat)
+        new_ms = await cpu_ms(new, args.repeat)
+        print(
+            f"{name:<9} rows={len(rows):<5} pydantic {old_ms:8.2f} ms/page"
+            f"   dump_orm+orjson {new_ms:8.2f} ms/page"
+            f"   x{old_ms / new_ms if new_ms else 0:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())